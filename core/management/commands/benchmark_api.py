@@ -0,0 +1,202 @@
+"""
+Management command benchmarking the user and schedule REST endpoints at growing table sizes.
+
+For every size in `--sizes` the schedules table is grown to that many rows (and the users
+table to a tenth of it) with the `seed_data` seeders. Then create, get-by-pk, list and
+delete are timed for `UserAPIView` and `ScheduleAPIView`, `--requests` requests each,
+through Django's in-process test client (the full middleware stack, no network):
+
+    python manage.py benchmark_api --sizes 10000,1000000,10000000 --output api.json
+
+With `--url` the get and list operations are load tested against a running server with
+the local load generator instead (`--concurrency`, `--duration`); creates and deletes are
+still timed in-process against the same database. The read cache is bypassed unless
+`--cache` is given, so the database work is measured. Run it with DEBUG off, since DEBUG
+adds the query budget bookkeeping to every request.
+
+Results are written as JSON (`{"meta": ..., "sizes": {size: {operation: summary}}}`), with
+the same summary fields as the other load benchmarks, so runs of two versions can be
+diffed. Tables are only ever grown; rerunning on the same database reuses the rows.
+"""
+
+import json
+import random
+import time
+from datetime import date, timedelta
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from user.management.commands.seed_data import seed_schedules, seed_users
+from user.models import EmailSchedule, User
+from utils.loadgen import LoadResult, run_load
+
+OPERATIONS = ("create", "get", "list", "delete")
+
+
+class Command(BaseCommand):
+    help = "Benchmark the user and schedule CRUD and list endpoints at growing sizes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", default="10000,1000000,10000000", help="Schedule table sizes."
+        )
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--url", help="Base URL of a running server for the reads.")
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--duration", type=float, default=10.0)
+        parser.add_argument("--cache", action="store_true", help="Keep the read cache.")
+        parser.add_argument("--label", default="", help="Stored in the results meta.")
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options["sizes"].split(",")]
+        except ValueError:
+            raise CommandError("--sizes must be a comma separated list of integers.")
+        self.client = Client()
+        self.rng = random.Random(0)
+        self.prefix = f"api{int(time.time() * 1000)}"
+        self.sequence = 0
+        results = {
+            "meta": {
+                "label": options["label"],
+                "database": connection.vendor,
+                "django": django.get_version(),
+                "requests": options["requests"],
+                "url": options["url"],
+                "cache": options["cache"],
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            },
+            "sizes": {},
+        }
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            API_CACHE_ENABLED=options["cache"] and settings.API_CACHE_ENABLED,
+        ):
+            for size in sizes:
+                self.grow(size, options["batch_size"])
+                results["sizes"][str(size)] = self.run_size(size, options)
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(results, output, indent=2)
+
+    def grow(self, size, batch_size):
+        """
+        Grow the schedules table to `size` rows and the users table to a tenth of it.
+        """
+        users = User.objects.count()
+        if users < max(size // 10, 1):
+            seed_users(max(size // 10, 1) - users, batch_size)
+        schedules = EmailSchedule.objects.count()
+        if schedules < size:
+            user_ids = list(User.objects.values_list("id", flat=True))
+            seed_schedules(user_ids, size - schedules, batch_size, seed=size)
+        self.user_ids = self.sample_ids(User.objects.all())
+        self.schedule_ids = self.sample_ids(
+            EmailSchedule.objects.filter(user__deleted_at__isnull=True)
+        )
+
+    def sample_ids(self, queryset, count=1000):
+        """
+        Ids of up to `count` random rows, without sorting the whole table.
+        """
+        max_id = queryset.aggregate(max_id=Max("id"))["max_id"] or 0
+        candidates = self.rng.sample(range(1, max_id + 1), min(count * 2, max_id))
+        return list(
+            queryset.filter(id__in=candidates).values_list("id", flat=True)[:count]
+        )
+
+    def run_size(self, size, options):
+        self.stdout.write(f"{size} schedules:")
+        results = {}
+        for resource in ("user", "schedule"):
+            created = []
+            for operation in OPERATIONS:
+                name = f"{resource}-{operation}"
+                if options["url"] and operation in ("get", "list"):
+                    path = self.read_path(resource, operation)
+                    summary = run_load(
+                        f"{options['url'].rstrip('/')}{path}",
+                        concurrency=options["concurrency"],
+                        duration=options["duration"],
+                    ).summary()
+                else:
+                    summary = self.time_requests(
+                        resource, operation, options["requests"], created
+                    )
+                results[name] = summary
+                self.stdout.write(
+                    f"  {name:<18} {summary['rps']:>9} req/s   "
+                    f"p50 {summary['p50_ms']} ms   p99 {summary['p99_ms']} ms   "
+                    f"errors {summary['errors']}"
+                )
+        return results
+
+    def read_path(self, resource, operation):
+        if operation == "list":
+            return reverse(f"user:{resource}-create")
+        pks = self.user_ids if resource == "user" else self.schedule_ids
+        return reverse(f"user:{resource}-detail", args=[self.rng.choice(pks)])
+
+    def time_requests(self, resource, operation, count, created):
+        """
+        Send `count` requests of one operation in-process and summarize them.
+
+        Parameters:
+        resource (str): "user" or "schedule".
+        operation (str): One of OPERATIONS.
+        count (int): Number of requests.
+        created (list): Ids created by the "create" run, removed by the "delete" run.
+
+        Returns:
+        dict: The LoadResult summary, where errors are responses with a 4xx/5xx status.
+        """
+        result = LoadResult()
+        if operation == "create":
+            model = User.all_objects if resource == "user" else EmailSchedule.objects
+            last_id = model.order_by("-id").values_list("id", flat=True).first() or 0
+        if operation == "delete":
+            count = len(created)
+        started = time.perf_counter()
+        for number in range(count):
+            request = self.build_request(resource, operation, number, created)
+            sent = time.perf_counter()
+            response = request()
+            result.latencies.append(time.perf_counter() - sent)
+            status = response.status_code
+            result.statuses[status] = result.statuses.get(status, 0) + 1
+            if status >= 400:
+                result.errors += 1
+        result.elapsed = time.perf_counter() - started
+        if operation == "create":
+            created.extend(model.filter(id__gt=last_id).values_list("id", flat=True))
+        return result.summary()
+
+    def build_request(self, resource, operation, number, created):
+        if operation == "create":
+            if resource == "user":
+                self.sequence += 1
+                data = {
+                    "name": f"API user {self.sequence}",
+                    "email": f"{self.prefix}.{self.sequence}@example.com",
+                }
+            else:
+                data = {
+                    "user": self.rng.choice(self.user_ids),
+                    "scheduled_date": (date.today() + timedelta(days=30)).isoformat(),
+                    "scheduled_time": "08:00:00",
+                }
+            url = reverse(f"user:{resource}-create")
+            return lambda: self.client.post(url, data, content_type="application/json")
+        if operation == "delete":
+            url = reverse(f"user:{resource}-detail", args=[created[number]])
+            return lambda: self.client.delete(url)
+        return lambda: self.client.get(self.read_path(resource, operation))
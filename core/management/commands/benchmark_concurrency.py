@@ -0,0 +1,72 @@
+"""
+Management command comparing how WSGI and ASGI deployments hold up under concurrency.
+
+Point it at running servers, e.g.
+
+    gunicorn -w 2 --threads 8 email_sender_system.wsgi -b :8000
+    uvicorn --workers 2 email_sender_system.asgi:application --port 8001
+
+    python manage.py benchmark_concurrency \\
+        --target wsgi=http://127.0.0.1:8000/api/schedule/ \\
+        --target asgi=http://127.0.0.1:8001/api/async/schedule/ \\
+        --concurrency 8,32,128 --slow-client-delay 0.5
+
+With slow clients, a WSGI worker thread stays busy until the client has read its response,
+so throughput flattens once concurrency passes the thread count; the async views only hold
+a thread for their database work.
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.loadgen import run_load
+
+
+class Command(BaseCommand):
+    help = "Load test WSGI and ASGI endpoints at increasing concurrency."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target",
+            action="append",
+            required=True,
+            help="name=url, may be given several times.",
+        )
+        parser.add_argument("--concurrency", default="8,32,128")
+        parser.add_argument("--duration", type=float, default=10.0)
+        parser.add_argument("--method", default="GET")
+        parser.add_argument("--slow-client-delay", type=float, default=0.0)
+        parser.add_argument("--timeout", type=float, default=30.0)
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        targets = {}
+        for target in options["target"]:
+            name, separator, url = target.partition("=")
+            if not separator or not url:
+                raise CommandError(f"Targets must be name=url, got {target!r}.")
+            targets[name] = url
+        levels = [int(level) for level in options["concurrency"].split(",")]
+
+        results = {}
+        for name, url in targets.items():
+            results[name] = {}
+            for concurrency in levels:
+                summary = run_load(
+                    url,
+                    concurrency=concurrency,
+                    duration=options["duration"],
+                    method=options["method"],
+                    slow_delay=options["slow_client_delay"],
+                    timeout=options["timeout"],
+                ).summary()
+                results[name][concurrency] = summary
+                self.stdout.write(
+                    f"{name:<8} c={concurrency:<5} {summary['rps']:>9} req/s  "
+                    f"p50 {summary['p50_ms']} ms  p99 {summary['p99_ms']} ms  "
+                    f"errors {summary['errors']}"
+                )
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(results, output, indent=2)
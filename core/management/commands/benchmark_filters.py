@@ -0,0 +1,116 @@
+"""
+Management command benchmarking the schedule list filters across filter combinations.
+
+Runs the same code path as `ScheduleAPIView.get` (ScheduleFilter + KeysetPaginator) for every
+combination, timing the first page and a page deep into the result set. Load data first with
+`python manage.py seed_data --users 1000000 --schedules 10000000`.
+"""
+
+import json
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from user.filters import ScheduleFilter
+from user.models import EmailSchedule, User
+from utils.pagination import KeysetPaginator
+
+
+def filter_combinations():
+    today = date.today()
+    user_ids = list(User.objects.order_by("id").values_list("id", flat=True)[:5])
+    user = ",".join(str(user_id) for user_id in user_ids)
+    return {
+        "none": {},
+        "status": {"status": "Pending"},
+        "status_list": {"status": "Pending,Failed"},
+        "date": {"date": today.isoformat()},
+        "status_date": {"status": "Pending", "date": today.isoformat()},
+        "date_range": {
+            "date_from": (today - timedelta(days=3)).isoformat(),
+            "date_to": (today + timedelta(days=3)).isoformat(),
+            "ordering": "scheduled",
+        },
+        "datetime_range": {
+            "scheduled_after": f"{today.isoformat()}T08:00:00",
+            "scheduled_before": f"{today.isoformat()}T12:00:00",
+            "ordering": "scheduled",
+        },
+        "status_range_sorted": {
+            "status": "Failed",
+            "date_from": (today - timedelta(days=7)).isoformat(),
+            "ordering": "-scheduled",
+        },
+        "user": {"user": user, "ordering": "scheduled"},
+        "email_domain": {"email_domain": "example.org"},
+    }
+
+
+class Command(BaseCommand):
+    help = "Benchmark the schedule list filters across filter combinations."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument(
+            "--depth", type=int, default=50, help="Page number timed as the deep page."
+        )
+        parser.add_argument("--explain", action="store_true")
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+
+    def request(self, params):
+        return Request(APIRequestFactory().get("/api/schedule/", params))
+
+    def time_page(self, params, repeat):
+        timings = []
+        for _ in range(repeat):
+            request = self.request(params)
+            schedule_filter = ScheduleFilter(request.query_params)
+            paginator = KeysetPaginator(ordering=schedule_filter.ordering)
+            queryset = schedule_filter.filter_queryset(
+                EmailSchedule.objects.select_related("user")
+            )
+            started = time.perf_counter()
+            rows, next_cursor = paginator.paginate(queryset, request)
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), next_cursor, paginator, queryset, request
+
+    def handle(self, *args, **options):
+        total = EmailSchedule.objects.count()
+        self.stdout.write(f"{total} schedules in the table.")
+        results = {"rows": total, "combinations": {}}
+        for name, params in filter_combinations().items():
+            params = dict(params, page_size=options["page_size"])
+            first_ms, cursor, paginator, queryset, request = self.time_page(
+                params, options["repeat"]
+            )
+            for _ in range(options["depth"] - 1):
+                if not cursor:
+                    break
+                _, cursor = paginator.paginate(
+                    queryset, self.request(dict(params, cursor=cursor))
+                )
+            deep_ms = None
+            if cursor:
+                deep_ms, *_ = self.time_page(
+                    dict(params, cursor=cursor), options["repeat"]
+                )
+            results["combinations"][name] = {
+                "params": params,
+                "first_page_ms": round(first_ms, 3),
+                "deep_page_ms": round(deep_ms, 3) if deep_ms is not None else None,
+            }
+            self.stdout.write(
+                f"{name:<22} first page {first_ms:8.2f} ms   "
+                f"page {options['depth']:<4} "
+                + (f"{deep_ms:8.2f} ms" if deep_ms is not None else "      n/a")
+            )
+            if options["explain"]:
+                self.stdout.write(paginator.page_queryset(queryset, request).explain())
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(results, output, indent=2)
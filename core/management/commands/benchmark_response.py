@@ -0,0 +1,92 @@
+"""
+Management command measuring the per-request overhead of building and rendering responses.
+
+Compares the removed stack introspection of the old `APIResponse` (two `inspect.stack()`
+calls per response) with the current builder, and DRF's `JSONRenderer` with `ORJSONRenderer`
+on a list page shaped like the schedule list endpoint.
+"""
+
+import inspect
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from utils.custom_response import APIResponse
+from utils.renderers import ORJSONRenderer
+
+
+def sample_page(rows):
+    return {
+        "results": [
+            {
+                "id": number,
+                "user": {
+                    "id": number,
+                    "name": f"User {number}",
+                    "email": f"user{number}@example.com",
+                    "phone_number": f"{9000000000 + number}",
+                    "date_of_birth": "1990-01-01",
+                },
+                "scheduled_time": "08:00:00",
+                "scheduled_date": "2030-01-01",
+                "email_status": "Pending",
+            }
+            for number in range(rows)
+        ],
+        "next_cursor": "WzEwMF0",
+    }
+
+
+def legacy_introspection():
+    # What the old builder paid on every response to learn its caller's name.
+    inspect.stack()[1].function
+    inspect.stack()[1].function
+
+
+class Command(BaseCommand):
+    help = "Benchmark response building and JSON rendering overhead per request."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--rows", type=int, default=100)
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+
+    def time_us(self, func, iterations):
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1_000_000)
+        return round(statistics.median(timings), 2)
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        data = sample_page(options["rows"])
+        envelope = APIResponse(data=data, message="Fetched Email Schedule Data").data
+        json_renderer, orjson_renderer = JSONRenderer(), ORJSONRenderer()
+        results = {
+            "rows": options["rows"],
+            "stack_introspection_us": self.time_us(legacy_introspection, iterations),
+            "build_us": self.time_us(
+                lambda: APIResponse(data=data, message="Fetched Email Schedule Data"),
+                iterations,
+            ),
+            "render_json_us": self.time_us(
+                lambda: json_renderer.render(envelope), iterations
+            ),
+            "render_orjson_us": self.time_us(
+                lambda: orjson_renderer.render(envelope), iterations
+            ),
+        }
+        before = results["stack_introspection_us"] + results["render_json_us"]
+        after = results["build_us"] + results["render_orjson_us"]
+        results["before_us"] = round(before, 2)
+        results["after_us"] = round(after, 2)
+        for name, value in results.items():
+            self.stdout.write(f"{name:<24} {value}")
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(results, output, indent=2)
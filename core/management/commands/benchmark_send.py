@@ -0,0 +1,227 @@
+"""
+Management command benchmarking the send path end to end, from trigger to Done.
+
+It seeds `--users` users and `--schedules` schedules due now (with their outbox rows),
+starts a local SMTP sink (`utils.smtpsink`) with optional latency and errors, runs the
+outbox relay and waits until every seeded schedule has left Pending. There are two modes:
+
+    python manage.py benchmark_send --schedules 5000 --latency-ms 20
+    python manage.py benchmark_send --mode worker --concurrency 8 --schedules 50000
+
+`eager` runs the send tasks inline in this process. `worker` starts a real celery worker
+pointed at the sink, which needs a broker and database shared between processes (e.g.
+Redis and PostgreSQL). The relay publishes every due outbox row, not only the seeded ones,
+so run it against a benchmark database.
+
+Reported are emails per second, the p50/p99 lateness (time from the trigger until a
+schedule was Done), the SQL queries per email (relay plus send tasks; in worker mode read
+from the worker's `celery_task_queries_total` metric) and the peak RSS of the process
+doing the sends. Seeded rows are removed afterwards unless `--keep` is given.
+"""
+
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from email_sender_system.celery import app
+from user.delivery import delivery_log
+from user.management.commands.seed_data import seed_due_schedules, seed_users
+from user.models import (
+    DeliveryAttempt,
+    EmailOutbox,
+    EmailSchedule,
+    Suppression,
+    User,
+    WebhookEvent,
+)
+from user.tasks import relay_outbox
+from utils.metrics import registry
+from utils.querybudget import count_queries
+from utils.smtpsink import SMTPSink
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = "Benchmark sending scheduled emails through a local SMTP sink."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--schedules", type=int, default=5000)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--mode", choices=("eager", "worker"), default="eager")
+        parser.add_argument(
+            "--concurrency", type=int, default=4, help="Worker processes (worker mode)."
+        )
+        parser.add_argument("--latency-ms", type=int, default=0)
+        parser.add_argument(
+            "--reject-rate", type=float, default=0.0, help="Hard bounces (550 on RCPT)."
+        )
+        parser.add_argument(
+            "--fail-rate", type=float, default=0.0, help="Transient failures (451)."
+        )
+        parser.add_argument("--timeout", type=float, default=600.0)
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded rows.")
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        if options["mode"] == "worker" and settings.CELERY_BROKER_URL.startswith(
+            "memory"
+        ):
+            raise CommandError("Worker mode needs a broker shared between processes.")
+        prefix = f"bench{int(time.time() * 1000)}"
+        user_ids = seed_users(options["users"], options["batch_size"], prefix=prefix)
+        schedule_ids = seed_due_schedules(
+            user_ids, options["schedules"], options["batch_size"]
+        )
+        self.stdout.write(
+            f"Seeded {len(user_ids)} users and {len(schedule_ids)} due schedules."
+        )
+        sink = SMTPSink(
+            latency_ms=options["latency_ms"],
+            reject_rate=options["reject_rate"],
+            fail_rate=options["fail_rate"],
+        ).start()
+        try:
+            if options["mode"] == "eager":
+                started, queries, peak_rss_kb = self.run_eager(sink)
+            else:
+                started, queries, peak_rss_kb = self.run_worker(
+                    sink, schedule_ids, options["concurrency"], options["timeout"]
+                )
+            results = self.summarize(schedule_ids, started, queries, peak_rss_kb)
+            results.update(mode=options["mode"], users=len(user_ids), sink=sink.counts)
+        finally:
+            sink.stop()
+            if not options["keep"]:
+                self.clean_up(user_ids, schedule_ids, prefix)
+        for name, value in results.items():
+            self.stdout.write(f"{name:<22} {value}")
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(results, output, indent=2)
+
+    def smtp_settings(self, sink):
+        return {
+            "EMAIL_BACKEND": "django.core.mail.backends.smtp.EmailBackend",
+            "EMAIL_HOST": sink.host,
+            "EMAIL_PORT": sink.port,
+            "EMAIL_USE_TLS": False,
+            "EMAIL_HOST_PASSWORD": "",
+        }
+
+    def run_eager(self, sink):
+        eager = app.conf.task_always_eager
+        app.conf.task_always_eager = True
+        try:
+            with override_settings(**self.smtp_settings(sink)):
+                started = time.time()
+                with count_queries() as counter:
+                    relay_outbox()
+                    delivery_log.flush()
+        finally:
+            app.conf.task_always_eager = eager
+        peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return started, counter.count, peak_rss_kb
+
+    def run_worker(self, sink, schedule_ids, concurrency, timeout):
+        metrics_dir = tempfile.mkdtemp(prefix="benchmark_send_")
+        environment = dict(
+            os.environ, QUERY_BUDGET_ENABLED="1", METRICS_DIR=metrics_dir
+        )
+        for name, value in self.smtp_settings(sink).items():
+            environment[name] = str(value or "")
+        worker = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "celery",
+                "-A",
+                "email_sender_system",
+                "worker",
+                "--loglevel=warning",
+                f"--concurrency={concurrency}",
+                "--without-gossip",
+                "--without-mingle",
+            ],
+            env=environment,
+        )
+        try:
+            deadline = time.monotonic() + timeout
+            while not app.control.ping(timeout=0.5):
+                if worker.poll() is not None or time.monotonic() > deadline:
+                    raise CommandError("The celery worker did not start.")
+            started = time.time()
+            with count_queries() as counter:
+                relay_outbox()
+            pending = EmailSchedule.objects.filter(
+                id__range=(schedule_ids[0], schedule_ids[-1]), email_status="Pending"
+            )
+            while pending.exists():
+                if time.monotonic() > deadline:
+                    raise CommandError("Timed out waiting for the sends to finish.")
+                time.sleep(0.2)
+        finally:
+            worker.terminate()
+            worker.wait(timeout=60)
+        with override_settings(METRICS_DIR=metrics_dir):
+            task_queries = registry.collect()["celery_task_queries_total"]
+        queries = counter.count + sum(task_queries.values())
+        peak_rss_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        return started, queries, peak_rss_kb
+
+    def summarize(self, schedule_ids, started, queries, peak_rss_kb):
+        outcomes = dict.fromkeys(("Done", "Failed", "Suppressed", "Pending"), 0)
+        lateness, finished = [], started
+        rows = EmailSchedule.objects.filter(
+            id__range=(schedule_ids[0], schedule_ids[-1])
+        ).values_list("email_status", "updated_at")
+        for status, updated_at in rows.iterator(chunk_size=5000):
+            outcomes[status] = outcomes.get(status, 0) + 1
+            if status == "Done":
+                lateness.append(updated_at.timestamp() - started)
+                finished = max(finished, updated_at.timestamp())
+        lateness.sort()
+        seconds = finished - started
+        to_ms = lambda value: round(value * 1000, 1) if value is not None else None
+        return {
+            "schedules": len(schedule_ids),
+            "sent": outcomes["Done"],
+            "failed": outcomes["Failed"],
+            "suppressed": outcomes["Suppressed"],
+            "seconds": round(seconds, 3),
+            "emails_per_second": (
+                round(outcomes["Done"] / seconds, 1) if seconds else None
+            ),
+            "lateness_p50_ms": to_ms(percentile(lateness, 0.50)),
+            "lateness_p99_ms": to_ms(percentile(lateness, 0.99)),
+            "queries": queries,
+            "queries_per_email": round(queries / len(schedule_ids), 3),
+            "peak_rss_mb": round(peak_rss_kb / 1024, 1),
+        }
+
+    def clean_up(self, user_ids, schedule_ids, prefix):
+        if schedule_ids:
+            first, last = schedule_ids[0], schedule_ids[-1]
+            DeliveryAttempt.objects.filter(schedule_id__range=(first, last)).delete()
+            WebhookEvent.objects.filter(schedule_id__range=(first, last)).delete()
+            EmailOutbox.objects.filter(
+                schedule_id__gte=first, schedule_id__lte=last
+            ).delete()
+            EmailSchedule.objects.filter(
+                id__range=(first, last), user__email__startswith=f"{prefix}."
+            ).delete()
+        Suppression.objects.filter(email__startswith=f"{prefix}.").delete()
+        User.all_objects.filter(email__startswith=f"{prefix}.").delete()
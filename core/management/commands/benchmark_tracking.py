@@ -0,0 +1,79 @@
+"""
+Management command measuring the open-tracking endpoint.
+
+Without `--url` it times the view in-process (token check plus buffered count, no server or
+database write) and then one flush of the aggregated counters. With `--url` it load tests a
+running server with the local load generator, e.g.
+
+    gunicorn -w 4 email_sender_system.wsgi -b :8000
+    python manage.py benchmark_tracking --url http://127.0.0.1:8000 --concurrency 64
+
+and reports how many counter rows the hits were flushed into.
+"""
+
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.urls import reverse
+
+from user.tracking import engagement_buffer, make_token
+from user.tracking_views import track_open
+from utils.loadgen import run_load
+
+
+class Command(BaseCommand):
+    help = "Benchmark the open-tracking pixel endpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--schedules", type=int, default=1000)
+        parser.add_argument("--iterations", type=int, default=20000)
+        parser.add_argument("--url", help="Base URL of a running server to load test.")
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--duration", type=float, default=10.0)
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        if options["url"]:
+            path = reverse("user:track-open", args=[make_token(1)])
+            results = run_load(
+                f"{options['url'].rstrip('/')}{path}",
+                concurrency=options["concurrency"],
+                duration=options["duration"],
+            ).summary()
+        else:
+            results = self.in_process(options["schedules"], options["iterations"])
+        for name, value in results.items():
+            self.stdout.write(f"{name:<20} {value}")
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(results, output, indent=2)
+
+    def in_process(self, schedules, iterations):
+        factory = RequestFactory()
+        requests = [
+            factory.get(reverse("user:track-open", args=[make_token(schedule_id)]))
+            for schedule_id in range(1, schedules + 1)
+        ]
+        engagement_buffer.flush_ms = (
+            0  # Time the flush below, not the background thread.
+        )
+        timings = []
+        for number in range(iterations):
+            request = requests[number % schedules]
+            started = time.perf_counter()
+            track_open(request, request.path.split("/")[-2])
+            timings.append((time.perf_counter() - started) * 1_000_000)
+        started = time.perf_counter()
+        flushed = engagement_buffer.flush()
+        flush_ms = (time.perf_counter() - started) * 1000
+        timings.sort()
+        return {
+            "hits": iterations,
+            "p50_us": round(statistics.median(timings), 2),
+            "p99_us": round(timings[int(len(timings) * 0.99)], 2),
+            "flushed_rows": flushed,
+            "flush_ms": round(flush_ms, 2),
+        }
@@ -0,0 +1,43 @@
+"""
+Management command switching the sampling profiler at runtime, see `utils.profiling`.
+
+    python manage.py profiling --rate 0.05 --ttl 600   # profile 5% for ten minutes
+    python manage.py profiling --off                    # back to PROFILING_SAMPLE_RATE
+    python manage.py profiling                          # show the current flag
+
+Running processes pick the flag up within PROFILING_FLAG_SECONDS. It is stored in the
+default cache, so it only reaches other processes with a shared backend such as Redis.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.profiling import RATE_CACHE_KEY
+
+
+class Command(BaseCommand):
+    help = "Set, clear or show the runtime sample rate of the profiler."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rate", type=float, help="Fraction of tasks/requests, 0-1."
+        )
+        parser.add_argument(
+            "--ttl", type=int, help="Seconds until the flag expires (default: never)."
+        )
+        parser.add_argument("--off", action="store_true", help="Remove the flag.")
+
+    def handle(self, *args, **options):
+        if options["off"]:
+            cache.delete(RATE_CACHE_KEY)
+        elif options["rate"] is not None:
+            if not 0 <= options["rate"] <= 1:
+                raise CommandError("The rate must be between 0 and 1.")
+            cache.set(RATE_CACHE_KEY, options["rate"], timeout=options["ttl"])
+        flag = cache.get(RATE_CACHE_KEY)
+        self.stdout.write(
+            f"rate {settings.PROFILING_SAMPLE_RATE if flag is None else flag} "
+            f"({'runtime flag' if flag is not None else 'PROFILING_SAMPLE_RATE'}), "
+            f"profiles in {settings.PROFILING_DIR}"
+        )
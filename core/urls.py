@@ -6,10 +6,11 @@ and generate the HTTP response.
 
 from django.urls import path
 
-from .views import IndexView
+from .views import IndexView, MetricsView
 
 app_name = "core"
 
 urlpatterns = [
     path("", IndexView.as_view(), name="index"),
+    path("metrics", MetricsView.as_view(), name="metrics"),
 ]
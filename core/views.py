@@ -5,9 +5,14 @@ Each view encapsulates the logic for processing requests, such as retrieving dat
 performing calculations, and rendering templates or returning data in various formats (e.g., JSON, HTML).
 """
 
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
 from django.views import View
 
+from user.metrics import queue_depth
+from utils.metrics import registry
+
 
 class IndexView(View):
     """
@@ -18,3 +23,20 @@ class IndexView(View):
 
     def get(self, *args, **kwargs):
         return render(self.request, self.template_name)
+
+
+class MetricsView(View):
+    """
+    Metrics of all processes of this host in the Prometheus text format, see `utils.metrics`.
+
+    Only clients listed in METRICS_ALLOWED_IPS may read them.
+    """
+
+    def get(self, request, *args, **kwargs):
+        allowed = settings.METRICS_ALLOWED_IPS
+        if "*" not in allowed and request.META.get("REMOTE_ADDR") not in allowed:
+            return HttpResponseForbidden()
+        return HttpResponse(
+            registry.render(extra=queue_depth()),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
@@ -15,10 +15,26 @@ app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
 
 app.conf.beat_schedule = {
-    "resend-email": {
-        "task": "user.tasks.resend_email",
+    "relay-outbox": {
+        "task": "user.tasks.relay_outbox",
         "schedule": crontab(minute=settings.SCHEDULER_FOR_RETRY_EMAIL),
     },
+    "dispatch-campaigns": {
+        "task": "user.tasks.dispatch_campaigns",
+        "schedule": crontab(),
+    },
+    "deliver-webhooks": {
+        "task": "user.tasks.deliver_webhooks",
+        "schedule": crontab(),
+    },
+    "archive-completed-schedules": {
+        "task": "user.tasks.archive_completed_schedules",
+        "schedule": crontab(minute=30, hour=3),
+    },
+    "purge-deleted-users": {
+        "task": "user.tasks.purge_deleted_users",
+        "schedule": crontab(minute=0),
+    },
 }
 
 
@@ -12,9 +12,12 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 
 import logging
 import os
+import sys
+import tempfile
 from pathlib import Path
 
-from decouple import config
+from decouple import Csv, config
+from django.core.exceptions import ImproperlyConfigured
 
 from utils.exceptions.lazy_exceptions import LazyExceptions
 
@@ -30,6 +33,8 @@ SECRET_KEY = config("SECRET_KEY")
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = bool(int(config("DEBUG")))
+
+TESTING = sys.argv[1:2] == ["test"]
 ALLOWED_HOSTS = config("ALLOWED_HOSTS").split(",")
 
 USER_TEMPLATES = os.path.join(BASE_DIR, "user/templates")
@@ -51,7 +56,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "utils.metrics.MetricsMiddleware",
+    "utils.profiling.ProfilingMiddleware",
+    "utils.querybudget.QueryBudgetMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "utils.db_router.ReplicaStickinessMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -95,6 +104,24 @@ DATABASES = {
     }
 }
 
+# Read replicas (see utils/db_router.py): comma separated hosts, or database files for
+# SQLite. Each one gets the credentials of the primary and the alias replica1, replica2, ...
+REPLICA_ALIASES = []
+for index, location in enumerate(
+    config("DATABASE_REPLICAS", default="", cast=Csv()), 1
+):
+    alias = f"replica{index}"
+    location_key = (
+        "NAME" if DATABASES["default"]["ENGINE"].endswith("sqlite3") else "HOST"
+    )
+    DATABASES[alias] = dict(
+        DATABASES["default"], **{location_key: location}, TEST={"MIRROR": "default"}
+    )
+    REPLICA_ALIASES.append(alias)
+DATABASE_ROUTERS = ["utils.db_router.ReplicaRouter"]
+# Seconds a client keeps reading from the primary after a write
+REPLICA_STICKY_SECONDS = config("REPLICA_STICKY_SECONDS", default=10, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -149,6 +176,18 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # declare lazy exceptions
 LAZY_EXCEPTIONS = LazyExceptions().lazy_exceptions
 
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "utils.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+}
+
+# Message of APIResponse(general_error=True) errors and of the async views' 500 responses
+GENERAL_ERROR_MESSAGE = config(
+    "GENERAL_ERROR_MESSAGE", default="Something went wrong. Please try again later."
+)
+
 EMAIL_LIMIT = config("EMAIL_LIMIT")
 
 # Email Backend Setting
@@ -159,9 +198,164 @@ EMAIL_USE_TLS = config("EMAIL_USE_TLS")
 EMAIL_HOST_USER = config("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = config("EMAIL_HOST_PASSWORD")
 
+# Maximum number of recipients packed into one send task / API call
+EMAIL_BATCH_SIZE = config("EMAIL_BATCH_SIZE", default=500, cast=int)
+# Minutes to wait before a failed email is relayed again, doubled per attempt
+EMAIL_RETRY_DELAY = config("EMAIL_RETRY_DELAY", default=5, cast=int)
+# Attempts (first send plus retries) before a failed email is given up on
+EMAIL_MAX_ATTEMPTS = config("EMAIL_MAX_ATTEMPTS", default=5, cast=int)
+# Number of outbox rows claimed per relay transaction
+OUTBOX_RELAY_BATCH_SIZE = config("OUTBOX_RELAY_BATCH_SIZE", default=1000, cast=int)
+
+# Delivery attempt log (see user/delivery.py): rows buffered per worker before a bulk insert
+DELIVERY_LOG_BUFFER_SIZE = config("DELIVERY_LOG_BUFFER_SIZE", default=500, cast=int)
+DELIVERY_LOG_FLUSH_MS = config("DELIVERY_LOG_FLUSH_MS", default=1000, cast=int)
+
+# Open/click tracking (see user/tracking.py)
+TRACKING_BASE_URL = config("TRACKING_BASE_URL", default="http://localhost:8000")
+TRACKING_FLUSH_MS = config("TRACKING_FLUSH_MS", default=1000, cast=int)
+TRACKING_BUFFER_MAX_KEYS = config("TRACKING_BUFFER_MAX_KEYS", default=50000, cast=int)
+
+# Webhooks (see user/webhooks.py): events per POST, coalescing delay, HTTP policy.
+# Events younger than WEBHOOK_COMMIT_LAG_MS are held back, so that transactions
+# committing out of id order land before the subscriber cursors pass them.
+WEBHOOK_BATCH_SIZE = config("WEBHOOK_BATCH_SIZE", default=500, cast=int)
+WEBHOOK_FLUSH_MS = config("WEBHOOK_FLUSH_MS", default=2000, cast=int)
+WEBHOOK_COMMIT_LAG_MS = config("WEBHOOK_COMMIT_LAG_MS", default=5000, cast=int)
+WEBHOOK_TIMEOUT = config("WEBHOOK_TIMEOUT", default=10, cast=int)
+WEBHOOK_RETRIES = config("WEBHOOK_RETRIES", default=3, cast=int)
+WEBHOOK_MAX_BACKOFF_SECONDS = config(
+    "WEBHOOK_MAX_BACKOFF_SECONDS", default=3600, cast=int
+)
+# Lease of a delivery run on one subscriber, renewed per batch; must outlast one POST
+# with its retries, or another run may post the same batch again.
+WEBHOOK_LEASE_SECONDS = config("WEBHOOK_LEASE_SECONDS", default=300, cast=int)
+
+# Metrics (see utils/metrics.py). Set METRICS_DIR to a directory shared by the web and
+# celery processes of a host so /metrics aggregates all of them.
+METRICS_DIR = config("METRICS_DIR", default="")
+METRICS_FLUSH_SECONDS = config("METRICS_FLUSH_SECONDS", default=5, cast=int)
+# Client addresses (REMOTE_ADDR) allowed to scrape /metrics; "*" allows everyone.
+METRICS_ALLOWED_IPS = config("METRICS_ALLOWED_IPS", default="127.0.0.1,::1", cast=Csv())
+
+# Sampling profiler (see utils/profiling.py). The rate can be changed at runtime with
+# `python manage.py profiling --rate 0.05`; 0 disables it.
+PROFILING_SAMPLE_RATE = config("PROFILING_SAMPLE_RATE", default=0.0, cast=float)
+PROFILING_INTERVAL_MS = config("PROFILING_INTERVAL_MS", default=5, cast=int)
+PROFILING_FLAG_SECONDS = config("PROFILING_FLAG_SECONDS", default=5, cast=int)
+PROFILING_WRITE_SECONDS = config("PROFILING_WRITE_SECONDS", default=30, cast=int)
+PROFILING_DIR = config(
+    "PROFILING_DIR",
+    default=os.path.join(tempfile.gettempdir(), "email_sender_system_profiles"),
+)
+
+# SQL query budgets of requests and celery tasks (see utils/querybudget.py). Keys are URL
+# names, "<METHOD> <URL name>" or "task <task name>"; everything else gets
+# QUERY_BUDGET_DEFAULT.
+QUERY_BUDGET_ENABLED = config(
+    "QUERY_BUDGET_ENABLED", default=DEBUG or TESTING, cast=bool
+)
+QUERY_BUDGET_DEFAULT = config("QUERY_BUDGET_DEFAULT", default=8, cast=int)
+QUERY_BUDGETS = {
+    # Expanding recurrences, claiming the outbox batch and marking it published, plus
+    # the send tasks when celery runs eagerly.
+    "user:trigger-emails": 12,
+    "user:async-trigger-emails": 12,
+    "task user.tasks.relay_outbox": 12,
+    # Claiming the batch, the suppression filter, the status updates with their retry
+    # rows and webhook events, and a delivery log flush when one is due.
+    "task user.tasks.send_scheduled_email_batch": 16,
+    # Per chunk of PURGE_CHUNK_SIZE schedules: their ids, the rows, the outbox and
+    # schedule deletes and the progress update; then the user row with its recurring
+    # schedules. Two chunks fit, a larger purge is logged.
+    "task user.tasks.purge_user": 20,
+    # The soft delete, plus the purge when celery runs eagerly.
+    "DELETE user:user-detail": 22,
+}
+
+# User ids read per transaction when a campaign is fanned out
+CAMPAIGN_CHUNK_SIZE = config("CAMPAIGN_CHUNK_SIZE", default=5000, cast=int)
+
+# Schedules deleted per transaction when a deleted user is purged; a purge that made no
+# progress for PURGE_REQUEUE_SECONDS is queued again by the hourly purge_deleted_users
+PURGE_CHUNK_SIZE = config("PURGE_CHUNK_SIZE", default=1000, cast=int)
+PURGE_REQUEUE_SECONDS = config("PURGE_REQUEUE_SECONDS", default=3600, cast=int)
+
+# Archival of Done/Suppressed schedules into email_schedule_history (see user/archive.py)
+ARCHIVE_AFTER_DAYS = config("ARCHIVE_AFTER_DAYS", default=30, cast=int)
+ARCHIVE_BATCH_SIZE = config("ARCHIVE_BATCH_SIZE", default=5000, cast=int)
+# Days of history kept; 0 keeps it forever
+HISTORY_RETENTION_DAYS = config("HISTORY_RETENTION_DAYS", default=365, cast=int)
+
+# Keyset pagination of list endpoints (see utils/pagination.py)
+API_PAGE_SIZE = config("API_PAGE_SIZE", default=100, cast=int)
+API_MAX_PAGE_SIZE = config("API_MAX_PAGE_SIZE", default=1000, cast=int)
+
+# Cache (see utils/cache.py). Set CACHE_BACKEND/CACHE_LOCATION to use Redis, e.g.
+# django_redis.cache.RedisCache and redis://127.0.0.1:6379/1.
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": config("CACHE_LOCATION", default=""),
+    }
+}
+# Generation bumps made by celery workers only reach the web processes through a cache
+# they share; with a process-local backend the read cache would serve stale payloads.
+# It is therefore off by default there and refused outside tests.
+CACHE_IS_SHARED = not CACHES["default"]["BACKEND"].endswith(
+    ("LocMemCache", "DummyCache", "FileBasedCache")
+)
+API_CACHE_ENABLED = config(
+    "API_CACHE_ENABLED", default=CACHE_IS_SHARED or TESTING, cast=bool
+)
+if API_CACHE_ENABLED and not (CACHE_IS_SHARED or TESTING):
+    raise ImproperlyConfigured(
+        "API_CACHE_ENABLED needs a cache shared by the web and worker processes "
+        "(e.g. Redis or Memcached): set CACHE_BACKEND or disable the read cache."
+    )
+API_CACHE_ALIAS = "default"
+API_CACHE_TTL = config("API_CACHE_TTL", default=300, cast=int)
+API_CACHE_L1_TTL = config("API_CACHE_L1_TTL", default=1.0, cast=float)
+API_CACHE_L1_SIZE = config("API_CACHE_L1_SIZE", default=10000, cast=int)
+API_CACHE_LOCK_TIMEOUT = config("API_CACHE_LOCK_TIMEOUT", default=2, cast=int)
+
+# Bulk import (see user/importers.py)
+IMPORT_CHUNK_SIZE = config("IMPORT_CHUNK_SIZE", default=1000, cast=int)
+IMPORT_MAX_REPORTED_ERRORS = config(
+    "IMPORT_MAX_REPORTED_ERRORS", default=1000, cast=int
+)
+
+# Streaming export (see user/exporters.py)
+EXPORT_CHUNK_SIZE = config("EXPORT_CHUNK_SIZE", default=2000, cast=int)
+
+# Suppression list Bloom filter (see user/suppression.py)
+SUPPRESSION_BLOOM_CAPACITY = config(
+    "SUPPRESSION_BLOOM_CAPACITY", default=1000000, cast=int
+)
+SUPPRESSION_REFRESH_SECONDS = config(
+    "SUPPRESSION_REFRESH_SECONDS", default=30, cast=int
+)
+# Overlap of each refresh with the previous one, covering rows that commit late
+SUPPRESSION_REFRESH_MARGIN_SECONDS = config(
+    "SUPPRESSION_REFRESH_MARGIN_SECONDS", default=300, cast=int
+)
+
+# Sharded dispatch (see user/dispatch.py)
+DISPATCH_SHARDS = config("DISPATCH_SHARDS", default=64, cast=int)
+DISPATCH_LEASE_SECONDS = config("DISPATCH_LEASE_SECONDS", default=60, cast=int)
+DISPATCH_INTERVAL_SECONDS = config("DISPATCH_INTERVAL_SECONDS", default=10, cast=int)
+
+# SendGrid (used by EMAIL_BACKEND=utils.email_backends.SendGridEmailBackend)
+SENDGRID_API_KEY = config("SENDGRID_API_KEY", default="")
+SENDGRID_API_URL = config(
+    "SENDGRID_API_URL", default="https://api.sendgrid.com/v3/mail/send"
+)
+
 # Celery Config
 CELERY_BROKER_URL = config("CELERY_BROKER_URL")
-CELERY_ACCEPT_CONTENT = config("CELERY_ACCEPT_CONTENT")
+CELERY_ACCEPT_CONTENT = config("CELERY_ACCEPT_CONTENT", cast=Csv())
 CELERY_RESULT_SERIALIZER = config("CELERY_RESULT_SERIALIZER")
 CELERY_TASK_SERIALIZER = config("CELERY_TASK_SERIALIZER")
 CELERY_TIMEZONE = config("CELERY_TIMEZONE")
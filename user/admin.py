@@ -1,11 +1,56 @@
 """
-defines how models are displayed and managed in the Django admin interface. It allows customization of admin site behavior, 
+defines how models are displayed and managed in the Django admin interface. It allows customization of admin site behavior,
 such as registering models, specifying display fields, and configuring filters
 """
 
 from django.contrib import admin
 
-from user.models import EmailSchedule, User
+from user.models import (
+    Campaign,
+    DeliveryAttempt,
+    DispatchLease,
+    DispatchNode,
+    EmailEngagement,
+    EmailOutbox,
+    EmailSchedule,
+    EmailScheduleHistory,
+    RecurringSchedule,
+    Suppression,
+    User,
+    WebhookEvent,
+    WebhookSubscription,
+)
+from utils.db_router import read_from_replica
 
-admin.site.register(User)
-admin.site.register(EmailSchedule)
+
+class ReplicaReadAdmin(admin.ModelAdmin):
+    """
+    Model admin whose changelist pages (listing, counts, filters) read from a replica.
+
+    Change forms and POSTed actions keep using the primary.
+    """
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != "GET":
+            return super().changelist_view(request, extra_context)
+        with read_from_replica():
+            response = super().changelist_view(request, extra_context)
+            # The changelist queries run while the template renders.
+            if hasattr(response, "render"):
+                response.render()
+        return response
+
+
+admin.site.register(User, ReplicaReadAdmin)
+admin.site.register(EmailSchedule, ReplicaReadAdmin)
+admin.site.register(EmailOutbox, ReplicaReadAdmin)
+admin.site.register(EmailScheduleHistory, ReplicaReadAdmin)
+admin.site.register(RecurringSchedule, ReplicaReadAdmin)
+admin.site.register(Campaign, ReplicaReadAdmin)
+admin.site.register(DeliveryAttempt, ReplicaReadAdmin)
+admin.site.register(EmailEngagement, ReplicaReadAdmin)
+admin.site.register(WebhookSubscription, ReplicaReadAdmin)
+admin.site.register(WebhookEvent, ReplicaReadAdmin)
+admin.site.register(DispatchLease, ReplicaReadAdmin)
+admin.site.register(DispatchNode, ReplicaReadAdmin)
+admin.site.register(Suppression, ReplicaReadAdmin)
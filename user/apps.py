@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class UserConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "user"
+
+    def ready(self):
+        from utils import profiling, querybudget  # noqa: F401  (connect signal hooks)
+
+        from . import signals
+
+        post_migrate.connect(signals.backfill_rows, sender=self)
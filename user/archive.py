@@ -0,0 +1,272 @@
+"""
+Module containing the archival of completed email schedules and reads across both tables.
+
+Schedules in a terminal status (Done, Suppressed) whose date is older than
+ARCHIVE_AFTER_DAYS are moved from `email_schedules` to the append-only, narrow
+`email_schedule_history` table in batches: each batch is locked, copied with one
+`INSERT ... SELECT` and removed with one `DELETE`, in one short transaction. This keeps the
+live table and the indexes the dispatch and list queries depend on small.
+
+History older than HISTORY_RETENTION_DAYS is purged. On PostgreSQL the history table can be
+partitioned by month (`setup_partitions`), in which case whole partitions are dropped
+instead of deleting rows.
+
+Classes:
+- ScheduleRecords: Queryset-like union of live and archived schedules.
+
+Functions:
+- archive_schedules: Move old terminal schedules to the history table.
+- purge_history: Remove history older than the retention period.
+- setup_partitions: Recreate the empty history table partitioned by month (PostgreSQL).
+"""
+
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connection, router, transaction
+from django.db.models import Case, CharField, Q, Value, When
+from django.utils import timezone
+
+from utils.cache import api_cache
+
+from .models import EmailOutbox, EmailSchedule, EmailScheduleHistory
+
+TERMINAL_STATUSES = tuple(EmailScheduleHistory.STATUS_CODES)
+RECORD_FIELDS = (
+    "id",
+    "user_id",
+    "scheduled_date",
+    "scheduled_time",
+    "email_status",
+    "archived",
+)
+PARTITION_PREFIX = f"{EmailScheduleHistory._meta.db_table}_y"
+
+
+def _partitioned(cursor):
+    if connection.vendor != "postgresql":
+        return False
+    cursor.execute(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass",
+        [EmailScheduleHistory._meta.db_table],
+    )
+    return cursor.fetchone() is not None
+
+
+def _month_start(day):
+    return day.replace(day=1)
+
+
+def _next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _ensure_month_partitions(cursor, first_day, last_day):
+    qn = connection.ops.quote_name
+    month = _month_start(first_day)
+    while month <= last_day:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {qn(f'{PARTITION_PREFIX}{month:%Ym%m}')} "
+            f"PARTITION OF {qn(EmailScheduleHistory._meta.db_table)} "
+            "FOR VALUES FROM (%s) TO (%s)",
+            [month, _next_month(month)],
+        )
+        month = _next_month(month)
+
+
+def archive_schedules(older_than_days=None, batch_size=None):
+    """
+    Move terminal schedules older than `older_than_days` days into the history table.
+
+    Parameters:
+    older_than_days (int, optional): Age in days, defaults to ARCHIVE_AFTER_DAYS.
+    batch_size (int, optional): Rows per transaction, defaults to ARCHIVE_BATCH_SIZE.
+
+    Returns:
+    int: The number of archived schedules.
+    """
+    if older_than_days is None:
+        older_than_days = int(settings.ARCHIVE_AFTER_DAYS)
+    batch_size = int(batch_size or settings.ARCHIVE_BATCH_SIZE)
+    cutoff = timezone.localdate() - timedelta(days=older_than_days)
+    qn = connection.ops.quote_name
+    live, history = EmailSchedule._meta.db_table, EmailScheduleHistory._meta.db_table
+    status_code = " ".join(
+        f"WHEN %s THEN {code}" for code in EmailScheduleHistory.STATUS_CODES.values()
+    )
+    archived = 0
+    last_id = 0
+    while True:
+        with transaction.atomic(using=router.db_for_write(EmailSchedule)):
+            rows = list(
+                EmailSchedule.objects.select_for_update()
+                .filter(
+                    email_status__in=TERMINAL_STATUSES,
+                    scheduled_date__lt=cutoff,
+                    id__gt=last_id,
+                )
+                .order_by("id")
+                .values_list("id", "scheduled_date")[:batch_size]
+            )
+            if not rows:
+                break
+            ids = [row_id for row_id, _ in rows]
+            placeholders = ", ".join(["%s"] * len(ids))
+            EmailOutbox.objects.filter(schedule_id__in=ids).delete()
+            with connection.cursor() as cursor:
+                if _partitioned(cursor):
+                    dates = [scheduled_date for _, scheduled_date in rows]
+                    _ensure_month_partitions(cursor, min(dates), max(dates))
+                cursor.execute(
+                    f"INSERT INTO {qn(history)} "
+                    "(id, user_id, scheduled_date, scheduled_time, status, completed_at) "
+                    "SELECT id, user_id, scheduled_date, scheduled_time, "
+                    f"CASE email_status {status_code} END, updated_at "
+                    f"FROM {qn(live)} WHERE id IN ({placeholders})",
+                    [*TERMINAL_STATUSES, *ids],
+                )
+                # One DELETE for the batch instead of fetching every row for post_delete;
+                # the outbox rows, the only ones referencing a schedule, are gone already.
+                cursor.execute(
+                    f"DELETE FROM {qn(live)} WHERE id IN ({placeholders})", ids
+                )
+        api_cache.bump("schedules", *(f"schedule:{row_id}" for row_id in ids))
+        archived += len(ids)
+        last_id = ids[-1]
+    return archived
+
+
+def purge_history(retention_days=None, batch_size=None):
+    """
+    Remove history rows scheduled more than `retention_days` days ago.
+
+    Parameters:
+    retention_days (int, optional): Defaults to HISTORY_RETENTION_DAYS; 0 keeps everything.
+    batch_size (int, optional): Rows per DELETE, defaults to ARCHIVE_BATCH_SIZE.
+
+    Returns:
+    int: The number of purged rows, or of dropped partitions on a partitioned table.
+    """
+    if retention_days is None:
+        retention_days = int(settings.HISTORY_RETENTION_DAYS)
+    if not retention_days:
+        return 0
+    batch_size = int(batch_size or settings.ARCHIVE_BATCH_SIZE)
+    cutoff = timezone.localdate() - timedelta(days=retention_days)
+    with connection.cursor() as cursor:
+        if _partitioned(cursor):
+            return _drop_partitions_before(cursor, _month_start(cutoff))
+    purged = 0
+    while True:
+        ids = list(
+            EmailScheduleHistory.objects.filter(scheduled_date__lt=cutoff).values_list(
+                "id", flat=True
+            )[:batch_size]
+        )
+        if not ids:
+            return purged
+        EmailScheduleHistory.objects.filter(id__in=ids).delete()
+        purged += len(ids)
+
+
+def _drop_partitions_before(cursor, month):
+    cursor.execute(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = %s",
+        [EmailScheduleHistory._meta.db_table],
+    )
+    dropped = 0
+    for (name,) in cursor.fetchall():
+        suffix = name[len(PARTITION_PREFIX) :]
+        if not name.startswith(PARTITION_PREFIX) or len(suffix) != 7:
+            continue
+        if _next_month(date(int(suffix[:4]), int(suffix[5:]), 1)) <= month:
+            cursor.execute(f"DROP TABLE {connection.ops.quote_name(name)}")
+            dropped += 1
+    return dropped
+
+
+def setup_partitions():
+    """
+    Recreate the history table partitioned by month of the scheduled date (PostgreSQL).
+
+    Only an empty, not yet partitioned table is replaced; partitions are then created on
+    demand by `archive_schedules`. The primary key includes the partition key, as
+    PostgreSQL requires.
+
+    Returns:
+    bool: True if the table was recreated.
+    """
+    if connection.vendor != "postgresql":
+        return False
+    qn = connection.ops.quote_name
+    table = EmailScheduleHistory._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        if _partitioned(cursor) or EmailScheduleHistory.objects.exists():
+            return False
+        cursor.execute(f"DROP TABLE {qn(table)}")
+        cursor.execute(
+            f"CREATE TABLE {qn(table)} ("
+            "id bigint NOT NULL, user_id bigint NOT NULL, scheduled_date date NOT NULL, "
+            "scheduled_time time NOT NULL, status smallint NOT NULL CHECK (status >= 0), "
+            "completed_at timestamp with time zone NULL, "
+            "PRIMARY KEY (id, scheduled_date)"
+            ") PARTITION BY RANGE (scheduled_date)"
+        )
+        for index in EmailScheduleHistory._meta.indexes:
+            columns = ", ".join(qn(field) for field in index.fields)
+            cursor.execute(f"CREATE INDEX {qn(index.name)} ON {qn(table)} ({columns})")
+    return True
+
+
+class ScheduleRecords:
+    """
+    Queryset-like union of live schedules and archived history.
+
+    Supports the subset of the QuerySet API used by `ScheduleFilter` and `KeysetPaginator`
+    (`filter`, `order_by`, slicing and iteration). Conditions may use the common fields
+    `id`, `user_id`, `scheduled_date`, `scheduled_time` and `email_status`; they are applied
+    to both sides before the UNION, so each side can use its own indexes. Rows are dicts
+    with RECORD_FIELDS.
+    """
+
+    def __init__(self, conditions=(), ordering=("id",)):
+        self.conditions = tuple(conditions)
+        self.ordering = tuple(ordering)
+
+    def filter(self, *conditions, **lookups):
+        return ScheduleRecords(
+            self.conditions + conditions + ((Q(**lookups),) if lookups else ()),
+            self.ordering,
+        )
+
+    def order_by(self, *ordering):
+        return ScheduleRecords(self.conditions, ordering)
+
+    def _sides(self):
+        live = EmailSchedule.objects.annotate(archived=Value(False))
+        history = EmailScheduleHistory.objects.annotate(
+            email_status=Case(
+                *(
+                    When(status=code, then=Value(name))
+                    for name, code in EmailScheduleHistory.STATUS_CODES.items()
+                ),
+                output_field=CharField(),
+            ),
+            archived=Value(True),
+        )
+        for condition in self.conditions:
+            live, history = live.filter(condition), history.filter(condition)
+        return live.values(*RECORD_FIELDS), history.values(*RECORD_FIELDS)
+
+    def union(self):
+        live, history = self._sides()
+        return live.union(history, all=True).order_by(*self.ordering)
+
+    def __getitem__(self, item):
+        return self.union()[item]
+
+    def __iter__(self):
+        return iter(self.union())
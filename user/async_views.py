@@ -0,0 +1,133 @@
+"""
+Module containing native async versions of the list and trigger endpoints.
+
+Served by an ASGI server (e.g. `uvicorn email_sender_system.asgi:application`), these views
+do not hold a worker thread while a request is waiting on a slow client: each request only
+borrows a thread for its database work (see `utils.async_utils.database_sync_to_async`) and
+reuses the cache, ETag and serialization code of the synchronous DRF views. The trigger hands
+the outbox relay to celery instead of running it inside the request.
+
+Functions:
+- json_response: Render the response envelope outside of DRF.
+- list_response: Serve one list page of a DRF view asynchronously.
+- async_user_list: Async keyset-paginated user list.
+- async_schedule_list: Async filtered, keyset-paginated schedule list.
+- async_send_scheduled_email: Async trigger publishing the outbox relay task.
+"""
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotAllowed
+from rest_framework import status
+from rest_framework.request import Request
+
+from user.tasks import relay_outbox
+from utils.async_utils import database_sync_to_async
+from utils.conditional import is_not_modified
+from utils.custom_response import APIResponse
+from utils.renderers import ORJSONRenderer
+
+from .views import ScheduleAPIView, UserAPIView
+
+
+def json_response(data, status_code=status.HTTP_200_OK, message="", errors=None):
+    """
+    Render the standard response envelope without going through DRF's view machinery.
+    """
+    success = status_code < status.HTTP_400_BAD_REQUEST
+    if not success:
+        data = {}
+    envelope = APIResponse.struct_response(
+        data=data, success=success, message=message, errors=errors
+    )
+    return HttpResponse(
+        ORJSONRenderer().render(envelope),
+        status=status_code,
+        content_type="application/json",
+    )
+
+
+async def list_response(request, sync_view, message):
+    """
+    Serve one list page of a DRF view asynchronously.
+
+    The ETag check, cache lookup and serialization of `sync_view` run in one worker thread;
+    a matching `If-None-Match` is answered with an empty 304.
+
+    Parameters:
+    request (HttpRequest): The incoming request.
+    sync_view (APIView): DRF view class providing `get_etag` and `get_cached_list`.
+    message (str): Success message of the response.
+
+    Returns:
+    HttpResponse: The rendered page, a 304, or an error envelope.
+    """
+
+    def fetch(drf_request):
+        view = sync_view()
+        etag = view.get_etag(drf_request)
+        if etag and is_not_modified(drf_request, etag):
+            return etag, None
+        return etag, view.get_cached_list(drf_request)
+
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    try:
+        etag, data = await database_sync_to_async(fetch)(Request(request))
+    except settings.LAZY_EXCEPTIONS as ce:
+        return json_response(
+            {}, ce.status_code, message=ce.message, errors=ce.error_data()
+        )
+    except Exception as ce:
+        return json_response(
+            {},
+            status.HTTP_500_INTERNAL_SERVER_ERROR,
+            message=settings.GENERAL_ERROR_MESSAGE,
+            errors=str(ce),
+        )
+    if data is None:
+        response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = json_response(data, message=message)
+    if etag:
+        response["ETag"] = etag
+    return response
+
+
+async def async_user_list(request):
+    """
+    Async keyset-paginated user list, see `UserAPIView.get`.
+    """
+    return await list_response(request, UserAPIView, "Fetched User Data")
+
+
+async def async_schedule_list(request):
+    """
+    Async filtered, keyset-paginated schedule list, see `ScheduleAPIView.get`.
+    """
+    return await list_response(request, ScheduleAPIView, "Fetched Email Schedule Data")
+
+
+async def async_send_scheduled_email(request):
+    """
+    Async trigger of the outbox relay.
+
+    Like `SendScheduledEmailAPIView`, it publishes one `relay_outbox` task for the EMAIL_LIMIT
+    window and answers 202 with the task id, so a long relay never ties up the request or a
+    thread.
+    """
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    window_minutes = int(settings.EMAIL_LIMIT) * 60
+    result = await database_sync_to_async(relay_outbox.apply_async)(
+        kwargs={"window_minutes": window_minutes}
+    )
+    return json_response(
+        {"task_id": result.id},
+        status.HTTP_202_ACCEPTED,
+        message="Email(s) Trigger Queued",
+    )
+
+
+# Django 3.2 dispatches only function-based views natively as coroutines, and csrf_exempt()
+# would wrap this one in a synchronous function, so the flag is set directly.
+async_send_scheduled_email.csrf_exempt = True
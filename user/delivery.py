@@ -0,0 +1,64 @@
+"""
+Module containing the buffered delivery attempt log.
+
+Every send records one `DeliveryAttempt` per recipient in `delivery_log`, an in-memory
+buffer of the worker process that is written with one `bulk_create` every
+DELIVERY_LOG_BUFFER_SIZE rows or DELIVERY_LOG_FLUSH_MS milliseconds. The send path therefore
+only builds an unsaved instance per message; the INSERT is amortised over the whole buffer.
+
+The age limit is checked whenever rows are added and after every celery task, and the buffer
+is flushed when a worker process shuts down.
+
+Functions:
+- log_attempts: Buffer the attempts of one send call.
+"""
+
+from celery.signals import task_postrun, worker_process_shutdown, worker_shutdown
+from django.conf import settings
+from django.utils import timezone
+
+from utils.buffer import BufferedBulkWriter
+
+from .models import DeliveryAttempt
+
+delivery_log = BufferedBulkWriter(
+    DeliveryAttempt,
+    max_rows=int(settings.DELIVERY_LOG_BUFFER_SIZE),
+    max_delay_ms=int(settings.DELIVERY_LOG_FLUSH_MS),
+)
+
+
+def log_attempts(results, recipients, campaign_id=None):
+    """
+    Buffer one attempt per recipient.
+
+    Parameters:
+    results (dict): Results of `user.tasks.bulk_email_handler` by key; recipients without a
+        result were suppressed before sending.
+    recipients (iterable): Tuples of (key, user_id, schedule_id).
+    campaign_id (int, optional): The campaign the emails belong to.
+    """
+    attempted_at = timezone.now()
+    delivery_log.extend(
+        [
+            DeliveryAttempt.from_result(
+                results.get(key),
+                user_id,
+                schedule_id=schedule_id,
+                campaign_id=campaign_id,
+                attempted_at=attempted_at,
+            )
+            for key, user_id, schedule_id in recipients
+        ]
+    )
+
+
+@task_postrun.connect
+def flush_delivery_log_if_due(**kwargs):
+    delivery_log.flush_if_due()
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def flush_delivery_log(**kwargs):
+    delivery_log.flush()
@@ -0,0 +1,151 @@
+"""
+Module containing the sharded dispatcher that lets several nodes relay the outbox side by side.
+
+Outbox rows are partitioned into DISPATCH_SHARDS shards by `user_id mod DISPATCH_SHARDS`. Each
+dispatcher node holds leases on a fair share of the shards and only relays rows of those shards,
+so finding and publishing due work scales with the number of nodes. Leases expire unless renewed,
+which hands the shards of a dead node over to the remaining ones. When DISPATCH_SHARDS is
+lowered, rows still carrying a shard past the new count are relayed with shard 0.
+
+Classes:
+- ShardDispatcher: Claims, renews and releases shard leases and relays the owned shards.
+"""
+
+import math
+import os
+import socket
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import DispatchLease, DispatchNode
+from .tasks import relay_outbox
+
+
+class ShardDispatcher:
+    """
+    Dispatcher node relaying the outbox rows of the shards it holds a lease on.
+
+    Attributes:
+        node_id (str): Unique name of this node, defaults to `<hostname>:<pid>`.
+        lease_seconds (int): How long a claimed lease stays valid without renewal.
+        shards (list): The shards currently leased by this node.
+
+    Methods:
+        claim: Heartbeat, renew owned leases and rebalance to a fair share.
+        release: Give up all leases held by this node.
+        run_once: Claim and relay the owned shards once.
+        run_forever: Keep running `run_once` until interrupted.
+    """
+
+    def __init__(self, node_id=None, lease_seconds=None):
+        self.node_id = node_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_seconds = int(lease_seconds or settings.DISPATCH_LEASE_SECONDS)
+        self.shards = []
+
+    def _ensure_leases(self):
+        shard_count = int(settings.DISPATCH_SHARDS)
+        # Leases of shards dropped by lowering DISPATCH_SHARDS; their rows go to shard 0.
+        DispatchLease.objects.filter(shard__gte=shard_count).delete()
+        if DispatchLease.objects.count() < shard_count:
+            DispatchLease.objects.bulk_create(
+                [
+                    DispatchLease(shard=shard, expires_at=timezone.now())
+                    for shard in range(shard_count)
+                ],
+                ignore_conflicts=True,
+            )
+
+    def _fair_share(self, now):
+        live_nodes = DispatchNode.objects.filter(
+            heartbeat_at__gte=now - timedelta(seconds=self.lease_seconds)
+        ).count()
+        return math.ceil(int(settings.DISPATCH_SHARDS) / max(live_nodes, 1))
+
+    def claim(self):
+        """
+        Heartbeat, renew owned leases and rebalance to a fair share of the shards.
+
+        Free or expired shards are taken with a conditional UPDATE, so two nodes can never
+        both win the same shard. Shards above the fair share are released so that nodes
+        joining the cluster get their part.
+
+        Returns:
+            list: The shards leased by this node after rebalancing.
+        """
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=self.lease_seconds)
+        DispatchNode.objects.update_or_create(
+            node_id=self.node_id, defaults={"heartbeat_at": now}
+        )
+        self._ensure_leases()
+        share = self._fair_share(now)
+
+        DispatchLease.objects.filter(owner=self.node_id).update(expires_at=expires_at)
+        owned = list(
+            DispatchLease.objects.filter(owner=self.node_id)
+            .order_by("shard")
+            .values_list("shard", flat=True)
+        )
+        if len(owned) > share:
+            DispatchLease.objects.filter(
+                owner=self.node_id, shard__in=owned[share:]
+            ).update(owner="", expires_at=now)
+            owned = owned[:share]
+
+        if len(owned) < share:
+            candidates = (
+                DispatchLease.objects.filter(Q(owner="") | Q(expires_at__lt=now))
+                .order_by("shard")
+                .values_list("shard", flat=True)
+            )
+            for shard in candidates[: share - len(owned)]:
+                taken = (
+                    DispatchLease.objects.filter(shard=shard)
+                    .filter(Q(owner="") | Q(expires_at__lt=now))
+                    .update(owner=self.node_id, expires_at=expires_at)
+                )
+                if taken:
+                    owned.append(shard)
+
+        self.shards = sorted(owned)
+        return self.shards
+
+    def release(self):
+        """
+        Give up all leases and the heartbeat of this node, e.g. on a clean shutdown.
+        """
+        now = timezone.now()
+        DispatchLease.objects.filter(owner=self.node_id).update(
+            owner="", expires_at=now
+        )
+        DispatchNode.objects.filter(node_id=self.node_id).delete()
+        self.shards = []
+
+    def run_once(self, window_minutes=0):
+        """
+        Claim leases and relay the due outbox rows of the owned shards.
+
+        Returns:
+            int: The number of outbox rows published.
+        """
+        shards = self.claim()
+        if not shards:
+            return 0
+        return relay_outbox(window_minutes=window_minutes, shards=shards)
+
+    def run_forever(self, interval=None, window_minutes=0):
+        """
+        Keep running `run_once` every `interval` seconds until interrupted.
+        """
+        interval = float(interval or settings.DISPATCH_INTERVAL_SECONDS)
+        try:
+            while True:
+                started = time.monotonic()
+                self.run_once(window_minutes=window_minutes)
+                time.sleep(max(interval - (time.monotonic() - started), 0))
+        finally:
+            self.release()
@@ -0,0 +1,119 @@
+"""
+Module containing the streaming CSV / NDJSON exporters for users and email schedules.
+
+Exports read flat `values_list()` rows through `.iterator(chunk_size=...)`, which uses a
+server-side cursor on PostgreSQL, and render them into text chunks as they arrive. Nothing
+is serialized through DRF and no row is held after it has been written, so an export runs in
+constant memory and the first bytes leave as soon as the first chunk has been read.
+
+Functions:
+- export_users: Stream all users.
+- export_schedules: Stream email schedules joined with their user.
+"""
+
+import csv
+import io
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+USER_EXPORT_FIELDS = (
+    "id",
+    "name",
+    "email",
+    "phone_number",
+    "date_of_birth",
+    "created_at",
+    "updated_at",
+)
+SCHEDULE_EXPORT_FIELDS = (
+    "id",
+    "user_id",
+    "user__name",
+    "user__email",
+    "scheduled_date",
+    "scheduled_time",
+    "email_status",
+    "created_at",
+    "updated_at",
+)
+CONTENT_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def _render_csv(rows, header, chunk_rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _render_ndjson(rows, header, chunk_rows):
+    encoder = DjangoJSONEncoder(separators=(",", ":"))
+    lines = []
+    for row in rows:
+        lines.append(encoder.encode(dict(zip(header, row))))
+        if len(lines) == chunk_rows:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def stream_response(queryset, fields, header, file_format, filename):
+    """
+    Build a StreamingHttpResponse rendering `queryset.values_list(*fields)` lazily.
+
+    Parameters:
+    queryset (QuerySet): The rows to export.
+    fields (tuple): The fields read with `values_list`.
+    header (tuple): Column names written to the output.
+    file_format (str): "csv" or "ndjson".
+    filename (str): Download name without extension.
+
+    Returns:
+    StreamingHttpResponse: The streaming download.
+    """
+    chunk_size = int(settings.EXPORT_CHUNK_SIZE)
+    rows = queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+    render = _render_csv if file_format == "csv" else _render_ndjson
+    response = StreamingHttpResponse(
+        render(rows, header, chunk_size), content_type=CONTENT_TYPES[file_format]
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{file_format}"'
+    return response
+
+
+def export_users(queryset, file_format):
+    """
+    Stream the given users as CSV or NDJSON.
+    """
+    return stream_response(
+        queryset.order_by("id"),
+        USER_EXPORT_FIELDS,
+        USER_EXPORT_FIELDS,
+        file_format,
+        "users",
+    )
+
+
+def export_schedules(queryset, file_format):
+    """
+    Stream the given email schedules with their delivery status as CSV or NDJSON.
+
+    The user name and email come from a join, not from one query per row.
+    """
+    header = tuple(field.replace("__", "_") for field in SCHEDULE_EXPORT_FIELDS)
+    return stream_response(
+        queryset.order_by("id"),
+        SCHEDULE_EXPORT_FIELDS,
+        header,
+        file_format,
+        "email_schedules",
+    )
@@ -0,0 +1,246 @@
+"""
+Module containing the streaming bulk importers for users and email schedules.
+
+Uploaded CSV or NDJSON files are read line by line and processed in chunks of IMPORT_CHUNK_SIZE
+rows. Every chunk is validated with one `IN` query per lookup (duplicate emails, existing users)
+instead of one query per row, and the valid rows are written with `bulk_create`. Only the current
+chunk and a capped error report are held in memory, whatever the size of the upload.
+
+Functions:
+- iter_rows: Stream dictionaries out of an uploaded CSV or NDJSON file.
+- import_users: Validate and bulk insert user rows.
+- import_schedules: Validate and bulk insert email schedule rows together with their outbox rows.
+"""
+
+import codecs
+import csv
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+
+from utils.cache import api_cache
+
+from .models import EmailOutbox, EmailSchedule, User
+from .serializers import EmailScheduleImportSerializer, UserImportSerializer
+
+OPTIONAL_FIELDS = ("phone_number", "date_of_birth")
+DUPLICATE_EMAIL = "This email is already in use."
+
+
+def detect_format(upload, requested=None):
+    """
+    Return "csv" or "ndjson" from the explicit request, the file name or the content type.
+    """
+    if requested:
+        return requested.lower()
+    name = (upload.name or "").lower()
+    content_type = (getattr(upload, "content_type", "") or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in content_type:
+        return "ndjson"
+    return "csv"
+
+
+def iter_rows(upload, file_format):
+    """
+    Stream (row_number, row) tuples out of an uploaded file.
+
+    Rows that cannot be parsed are yielded as (row_number, Exception) so that they show
+    up in the error report instead of aborting the import.
+    """
+    lines = codecs.iterdecode(upload, "utf-8-sig")
+    if file_format == "csv":
+        for row_number, row in enumerate(csv.DictReader(lines), start=1):
+            yield row_number, row
+    elif file_format == "ndjson":
+        row_number = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                row = json.loads(line)
+                if not isinstance(row, dict):
+                    raise ValueError("Each line must be a JSON object.")
+                yield row_number, row
+            except ValueError as e:
+                yield row_number, e
+    else:
+        raise ValueError(f"Unsupported import format: {file_format}")
+
+
+def chunked(iterable, size):
+    """
+    Yield lists of at most `size` items from an iterable without materialising it.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ImportReport:
+    """
+    Per-row outcome of an import, keeping at most IMPORT_MAX_REPORTED_ERRORS error rows.
+    """
+
+    def __init__(self):
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.max_errors = int(settings.IMPORT_MAX_REPORTED_ERRORS)
+
+    def add_error(self, row_number, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row_number, "errors": errors})
+
+    def as_dict(self):
+        return {
+            "created": self.created,
+            "failed": self.failed,
+            "errors": sorted(self.errors, key=lambda error: error["row"]),
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def _clean(row):
+    row = {key.strip(): value for key, value in row.items() if key}
+    for field in OPTIONAL_FIELDS:
+        if row.get(field) == "":
+            row[field] = None
+    return row
+
+
+def _validate_chunk(chunk, serializer_class, report):
+    valid = []
+    for row_number, row in chunk:
+        if isinstance(row, Exception):
+            report.add_error(row_number, {"non_field_errors": [str(row)]})
+            continue
+        serializer = serializer_class(data=_clean(row))
+        if serializer.is_valid():
+            valid.append((row_number, serializer.validated_data))
+        else:
+            report.add_error(row_number, serializer.errors)
+    return valid
+
+
+def import_users(rows):
+    """
+    Validate and bulk insert user rows.
+
+    Duplicate emails are detected with one `IN` query per chunk plus a check within the
+    chunk itself; rows of earlier chunks are already stored and are caught by the query.
+    Emails stored by another writer between the check and the insert are reported the
+    same way (see `_insert_users`).
+
+    Parameters:
+    rows (iterable): (row_number, row) tuples as yielded by `iter_rows`.
+
+    Returns:
+    dict: The import report.
+    """
+    report = ImportReport()
+    for chunk in chunked(rows, int(settings.IMPORT_CHUNK_SIZE)):
+        valid = _validate_chunk(chunk, UserImportSerializer, report)
+        existing = _taken_emails(data["email"] for _, data in valid)
+        users = []
+        for row_number, data in valid:
+            if data["email"] in existing:
+                report.add_error(row_number, {"email": [DUPLICATE_EMAIL]})
+                continue
+            existing.add(data["email"])
+            users.append((row_number, User(**data)))
+        report.created += _insert_users(users, report)
+    api_cache.bump("users")
+    return report.as_dict()
+
+
+def _taken_emails(emails):
+    return set(
+        User.all_objects.filter(email__in=list(emails)).values_list("email", flat=True)
+    )
+
+
+def _insert_users(users, report):
+    """
+    Bulk insert (row_number, user) pairs and return how many were stored.
+
+    Another writer can store one of the emails between the duplicate check and the
+    insert. The unique constraint then fails the whole chunk; the emails taken in the
+    meantime are reported as duplicates and the rest of the chunk is inserted again.
+    """
+    while users:
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create([user for _, user in users])
+            return len(users)
+        except IntegrityError:
+            taken = _taken_emails(user.email for _, user in users)
+            if not taken:
+                raise
+            for row_number, user in users:
+                if user.email in taken:
+                    report.add_error(row_number, {"email": [DUPLICATE_EMAIL]})
+            users = [
+                (row_number, user)
+                for row_number, user in users
+                if user.email not in taken
+            ]
+    return 0
+
+
+def import_schedules(rows):
+    """
+    Validate and bulk insert email schedule rows together with their outbox rows.
+
+    Referenced users are checked with one `IN` query per chunk. Schedules and outbox rows
+    of a chunk are written in one transaction.
+
+    Parameters:
+    rows (iterable): (row_number, row) tuples as yielded by `iter_rows`.
+
+    Returns:
+    dict: The import report.
+    """
+    report = ImportReport()
+    for chunk in chunked(rows, int(settings.IMPORT_CHUNK_SIZE)):
+        valid = _validate_chunk(chunk, EmailScheduleImportSerializer, report)
+        known_users = set(
+            User.objects.filter(id__in=[data["user"] for _, data in valid]).values_list(
+                "id", flat=True
+            )
+        )
+        schedules = []
+        for row_number, data in valid:
+            if data["user"] not in known_users:
+                report.add_error(
+                    row_number,
+                    {"user": [f'Invalid pk "{data["user"]}" - object does not exist.']},
+                )
+                continue
+            schedules.append(
+                EmailSchedule(
+                    user_id=data["user"],
+                    scheduled_time=data["scheduled_time"],
+                    scheduled_date=data["scheduled_date"],
+                    shard=EmailSchedule.shard_for(data["user"]),
+                )
+            )
+        with transaction.atomic():
+            if connection.features.can_return_rows_from_bulk_insert:
+                EmailSchedule.objects.bulk_create(schedules)
+                EmailOutbox.objects.bulk_create(
+                    EmailOutbox.for_schedule(schedule) for schedule in schedules
+                )
+            else:
+                # save() writes the outbox row of each schedule.
+                for schedule in schedules:
+                    schedule.save()
+        report.created += len(schedules)
+    api_cache.bump("schedules")
+    return report.as_dict()
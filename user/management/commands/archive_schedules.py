@@ -0,0 +1,35 @@
+"""
+Management command archiving completed email schedules and applying the history retention.
+
+Runs the same code as the nightly `archive_completed_schedules` task. With
+`--setup-partitions` it first recreates the (empty) history table partitioned by month on
+PostgreSQL.
+"""
+
+from django.core.management.base import BaseCommand
+
+from user.archive import archive_schedules, purge_history, setup_partitions
+
+
+class Command(BaseCommand):
+    help = "Move old completed schedules to the history table and purge old history."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than", type=int, default=None, help="Days.")
+        parser.add_argument("--retention", type=int, default=None, help="Days.")
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--setup-partitions", action="store_true")
+
+    def handle(self, *args, **options):
+        if options["setup_partitions"]:
+            if setup_partitions():
+                self.stdout.write("History table recreated with monthly partitions.")
+            else:
+                self.stdout.write(
+                    "History table left as is "
+                    "(not PostgreSQL, not empty or already partitioned)."
+                )
+        archived = archive_schedules(options["older_than"], options["batch_size"])
+        self.stdout.write(f"Archived {archived} schedule(s).")
+        purged = purge_history(options["retention"], options["batch_size"])
+        self.stdout.write(f"Purged {purged} history row(s)/partition(s).")
@@ -0,0 +1,21 @@
+"""
+Management command writing the missing outbox rows of Pending and Failed schedules.
+
+`migrate` runs the same backfill, so this is only needed when schedules were written
+around the outbox (e.g. with raw SQL) or to backfill in smaller batches.
+"""
+
+from django.core.management.base import BaseCommand
+
+from user.models import EmailOutbox
+
+
+class Command(BaseCommand):
+    help = "Write the outbox rows of Pending and Failed schedules that have none."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        written = EmailOutbox.backfill(batch_size=options["batch_size"])
+        self.stdout.write(f"Wrote {written} outbox row(s).")
@@ -0,0 +1,47 @@
+"""
+Management command running one sharded dispatcher node.
+
+Start one instance per dispatcher host; the nodes split the DISPATCH_SHARDS shards between them
+and take over the shards of nodes that stop heartbeating.
+"""
+
+from django.core.management.base import BaseCommand
+
+from user.dispatch import ShardDispatcher
+
+
+class Command(BaseCommand):
+    help = "Run a dispatcher node that relays the outbox rows of its leased shards."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--node-id", help="Unique node name (default host:pid).")
+        parser.add_argument(
+            "--interval", type=float, help="Seconds between relay rounds."
+        )
+        parser.add_argument(
+            "--window",
+            type=int,
+            default=0,
+            help="Also relay rows that become available within this many minutes.",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Run a single round and exit."
+        )
+
+    def handle(self, *args, **options):
+        dispatcher = ShardDispatcher(node_id=options["node_id"])
+        self.stdout.write(f"Dispatcher node {dispatcher.node_id} starting.")
+        if options["once"]:
+            try:
+                relayed = dispatcher.run_once(window_minutes=options["window"])
+            finally:
+                shards = dispatcher.shards
+                dispatcher.release()
+            self.stdout.write(f"Relayed {relayed} row(s) from shards {shards}.")
+            return
+        try:
+            dispatcher.run_forever(
+                interval=options["interval"], window_minutes=options["window"]
+            )
+        except KeyboardInterrupt:
+            self.stdout.write(f"Dispatcher node {dispatcher.node_id} stopped.")
@@ -0,0 +1,166 @@
+"""
+Management command generating synthetic users and email schedules with `bulk_create`.
+
+Used to load realistic table sizes for the benchmarks in `core/management/commands`.
+"""
+
+import random
+import time
+from datetime import date
+from datetime import time as dt_time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from user.models import EmailOutbox, EmailSchedule, User
+from utils.cache import api_cache
+
+STATUS_WEIGHTS = (("Pending", 60), ("Done", 35), ("Failed", 4), ("Suppressed", 1))
+DOMAINS = ("example.com", "example.org", "mail.test", "corp.test")
+
+
+def seed_users(count, batch_size=5000, prefix=None):
+    """
+    Insert `count` users in batches and return their ids.
+
+    Parameters:
+    count (int): Number of users to create.
+    batch_size (int): Number of rows per INSERT.
+    prefix (str, optional): Email prefix keeping repeated seeds unique.
+
+    Returns:
+    list: The ids of the created users.
+    """
+    prefix = prefix or f"seed{int(time.time() * 1000)}"
+    start_id = (User.objects.order_by("-id").values_list("id", flat=True).first()) or 0
+    for start in range(0, count, batch_size):
+        User.objects.bulk_create(
+            [
+                User(
+                    name=f"User {number}",
+                    email=f"{prefix}.{number}@{DOMAINS[number % len(DOMAINS)]}",
+                    phone_number=f"{9000000000 + number}",
+                )
+                for number in range(start, min(start + batch_size, count))
+            ],
+            batch_size=batch_size,
+        )
+    return list(
+        User.objects.filter(id__gt=start_id, email__startswith=f"{prefix}.")
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+
+
+def seed_schedules(user_ids, count, batch_size=5000, days=30, seed=None):
+    """
+    Insert `count` schedules spread over +/- `days` days for random users.
+
+    Parameters:
+    user_ids (list): Users to attach the schedules to.
+    count (int): Number of schedules to create.
+    batch_size (int): Number of rows per INSERT.
+    days (int): Half-width of the scheduled date range around today.
+    seed (int, optional): Random seed for repeatable data.
+    """
+    rng = random.Random(seed)
+    statuses = [status for status, _ in STATUS_WEIGHTS]
+    weights = [weight for _, weight in STATUS_WEIGHTS]
+    today = date.today()
+    for start in range(0, count, batch_size):
+        size = min(batch_size, count - start)
+        schedules = []
+        for user_id, status in zip(
+            (rng.choice(user_ids) for _ in range(size)),
+            rng.choices(statuses, weights, k=size),
+        ):
+            schedules.append(
+                EmailSchedule(
+                    user_id=user_id,
+                    shard=EmailSchedule.shard_for(user_id),
+                    scheduled_date=today + timedelta(days=rng.randint(-days, days)),
+                    scheduled_time=dt_time(rng.randrange(24), rng.randrange(60)),
+                    email_status=status,
+                )
+            )
+        EmailSchedule.objects.bulk_create(schedules, batch_size=batch_size)
+
+
+def seed_due_schedules(user_ids, count, batch_size=5000):
+    """
+    Insert `count` pending schedules due now, with their outbox rows, round robin over users.
+
+    Parameters:
+    user_ids (list): Users to attach the schedules to.
+    count (int): Number of schedules to create.
+    batch_size (int): Number of rows per INSERT.
+
+    Returns:
+    list: The ids of the created schedules.
+    """
+    due_at = timezone.localtime().replace(microsecond=0)
+    start_id = (
+        EmailSchedule.objects.order_by("-id").values_list("id", flat=True).first()
+    ) or 0
+    for start in range(0, count, batch_size):
+        EmailSchedule.objects.bulk_create(
+            [
+                EmailSchedule(
+                    user_id=user_ids[number % len(user_ids)],
+                    shard=EmailSchedule.shard_for(user_ids[number % len(user_ids)]),
+                    scheduled_date=due_at.date(),
+                    scheduled_time=due_at.time().replace(tzinfo=None),
+                )
+                for number in range(start, min(start + batch_size, count))
+            ],
+            batch_size=batch_size,
+        )
+    # Read the ids back: bulk_create does not return them on every backend.
+    schedules = list(
+        EmailSchedule.objects.filter(
+            id__gt=start_id, user_id__gte=min(user_ids), user_id__lte=max(user_ids)
+        )
+        .order_by("id")
+        .values_list("id", "shard")
+    )
+    EmailOutbox.objects.bulk_create(
+        (
+            EmailOutbox(schedule_id=schedule_id, shard=shard, available_at=due_at)
+            for schedule_id, shard in schedules
+        ),
+        batch_size=batch_size,
+    )
+    return [schedule_id for schedule_id, _ in schedules]
+
+
+class Command(BaseCommand):
+    help = "Generate synthetic users and email schedules for benchmarks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--schedules", type=int, default=10000)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--days", type=int, default=30)
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        user_ids = seed_users(options["users"], options["batch_size"])
+        self.stdout.write(
+            f"Created {len(user_ids)} users in {time.perf_counter() - started:.1f}s."
+        )
+        api_cache.bump("users")
+        started = time.perf_counter()
+        seed_schedules(
+            user_ids,
+            options["schedules"],
+            options["batch_size"],
+            options["days"],
+            options["seed"],
+        )
+        api_cache.bump("schedules")
+        self.stdout.write(
+            f"Created {options['schedules']} schedules in "
+            f"{time.perf_counter() - started:.1f}s."
+        )
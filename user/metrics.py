@@ -0,0 +1,97 @@
+"""
+Module declaring the metrics of the send path and the broker/outbox queue depth gauges.
+
+Recorded from `user.tasks` and from the celery task signals below; exposed together with the
+HTTP request latencies of `utils.metrics.MetricsMiddleware` at `/metrics`.
+
+Functions:
+- queue_depth: Scrape-time gauges of the broker queue and the pending outbox.
+"""
+
+import time
+
+from celery.signals import task_postrun, task_prerun, worker_process_shutdown
+
+from email_sender_system.celery import app
+from utils.metrics import registry
+
+from .models import EmailOutbox
+
+LATENESS_BUCKETS = (1, 5, 15, 30, 60, 300, 900, 1800, 3600, 14400, 86400)
+
+email_send_seconds = registry.histogram(
+    "email_send_seconds",
+    "Time spent handing emails to the backend, per message (smtp) or call (api).",
+    ("backend",),
+)
+smtp_connect_seconds = registry.histogram(
+    "smtp_connect_seconds", "Time to open a connection to the email backend."
+)
+emails_total = registry.counter("emails_total", "Email send outcomes.", ("result",))
+email_failures_total = registry.counter(
+    "email_failures_total", "Failed email sends by reason.", ("reason",)
+)
+send_lateness_seconds = registry.histogram(
+    "email_send_lateness_seconds",
+    "Delay between a schedule's scheduled time and its send attempt.",
+    buckets=LATENESS_BUCKETS,
+)
+outbox_relayed_total = registry.counter(
+    "outbox_relayed_total", "Outbox rows published to the broker."
+)
+celery_tasks_total = registry.counter(
+    "celery_tasks_total", "Finished celery tasks.", ("task", "state")
+)
+celery_task_seconds = registry.histogram(
+    "celery_task_seconds", "Run time of celery tasks.", ("task",)
+)
+
+_task_started = {}
+
+
+@task_prerun.connect
+def start_task_timer(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def record_task(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    name = getattr(task, "name", "unknown")
+    celery_tasks_total.inc(name, state or "UNKNOWN")
+    if started is not None:
+        celery_task_seconds.observe(time.perf_counter() - started, name)
+
+
+@worker_process_shutdown.connect
+def dump_metrics(**kwargs):
+    # Prefork children leave through os._exit, which skips the atexit dump.
+    registry.dump()
+
+
+def queue_depth():
+    """
+    Scrape-time gauges of the broker queue length and the unpublished outbox rows.
+
+    Returns:
+    list: (name, documentation, value) tuples; a value is None if it cannot be read.
+    """
+    try:
+        with app.connection_for_read() as connection:
+            broker_depth = connection.default_channel.queue_declare(
+                queue=app.conf.task_default_queue, passive=True
+            ).message_count
+    except Exception:
+        broker_depth = None
+    return [
+        (
+            "celery_queue_depth",
+            "Messages waiting in the default broker queue.",
+            broker_depth,
+        ),
+        (
+            "outbox_pending",
+            "Outbox rows not yet published to the broker.",
+            EmailOutbox.objects.filter(published_at__isnull=True).count(),
+        ),
+    ]
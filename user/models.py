@@ -1,6 +1,13 @@
+import secrets
 import uuid
+from datetime import datetime
+from zoneinfo import ZoneInfo
 
-from django.db import models
+from dateutil.rrule import rrulestr
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models.functions import Lower, StrIndex, Substr
+from django.utils import timezone
 
 
 class Activity(models.Model):
@@ -15,6 +22,27 @@ class Activity(models.Model):
         abstract = True
 
 
+class UserQuerySet(models.QuerySet):
+    """
+    Queryset filling `User.email_domain` on bulk inserts, which skip `User.save`.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for user in objs:
+            user.email_domain = User.domain_of(user.email)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
+class ActiveUserManager(models.Manager.from_queryset(UserQuerySet)):
+    """
+    Manager returning only users that have not been soft-deleted.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class User(Activity):
     """
     Model representing a user with basic personal information.
@@ -24,6 +52,16 @@ class User(Activity):
     email (str): The user's email address, unique.
     phone_number (str, optional): The user's phone number, limited to 15 characters, can be blank.
     date_of_birth (datetime.date, optional): The user's date of birth, can be blank.
+    deleted_at (datetime, optional): When the user was soft-deleted; its rows are then purged
+        in the background by `user.tasks.purge_user`.
+    purge_queued_at (datetime, optional): When the purge was queued or last made progress,
+        so `user.tasks.purge_deleted_users` does not queue a running purge again.
+    email_domain (str): Lowercased domain part of the email, kept in sync on save and bulk
+        inserts, so domain filters are index lookups instead of suffix scans.
+
+    Managers:
+    objects: Users that are not soft-deleted.
+    all_objects: Every user, the default manager (uniqueness checks, admin).
 
     Meta:
     verbose_name (str): Singular name for the model.
@@ -35,14 +73,195 @@ class User(Activity):
     email = models.EmailField(unique=True)
     phone_number = models.CharField(max_length=15, blank=True, null=True)
     date_of_birth = models.DateField(blank=True, null=True)
+    deleted_at = models.DateTimeField(blank=True, null=True, db_index=True)
+    purge_queued_at = models.DateTimeField(blank=True, null=True)
+    email_domain = models.CharField(
+        max_length=254, blank=True, default="", editable=False, db_index=True
+    )
+
+    objects = ActiveUserManager()
+    all_objects = UserQuerySet.as_manager()
 
     def __str__(self):
         return str(self.name)
 
+    @staticmethod
+    def domain_of(email):
+        return email.rpartition("@")[2].lower()
+
+    def save(self, *args, **kwargs):
+        self.email_domain = self.domain_of(self.email)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "email" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "email_domain"}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def backfill_email_domains(cls, batch_size=5000, using=None):
+        """
+        Fill `email_domain` of the users stored before the column existed.
+
+        Returns:
+        int: The number of users updated.
+        """
+        users = cls.all_objects.db_manager(using)
+        domain = Lower(Substr("email", StrIndex("email", models.Value("@")) + 1))
+        updated, last_id = 0, 0
+        while True:
+            ids = list(
+                users.filter(email_domain="", id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                return updated
+            updated += users.filter(id__in=ids).update(email_domain=domain)
+            last_id = ids[-1]
+
     class Meta:
         verbose_name = "User"
         verbose_name_plural = "Users"
         db_table = "users"
+        default_manager_name = "all_objects"
+
+
+class RecurringSchedule(Activity):
+    """
+    Model representing an email sent repeatedly to a user according to a recurrence rule.
+
+    No row is stored per future occurrence: only `next_run_at` is kept, and the dispatcher
+    (`user.recurrence.expand_recurring`) turns the occurrences that fall into its window into
+    `EmailSchedule` rows, then advances `next_run_at` past the window.
+
+    Attributes:
+    user (User): The user receiving the emails.
+    rule (str): An RFC 5545 recurrence rule, e.g. "FREQ=DAILY;BYHOUR=8;BYMINUTE=0".
+    timezone (str): IANA time zone the rule is evaluated in, e.g. "Asia/Kolkata".
+    starts_at (datetime): First possible occurrence (DTSTART).
+    next_run_at (datetime, optional): The next occurrence not yet dispatched; null once the
+        rule is exhausted.
+    active (bool): False once the rule is exhausted or the recurrence was cancelled.
+    shard (int): The dispatch partition of the recurrence, derived from the user id.
+
+    Meta:
+    verbose_name (str): Singular name for the model.
+    verbose_name_plural (str): Plural name for the model.
+    db_table (str): Database table name for the model.
+    indexes (list): Partial indexes on the due, active recurrences, unsharded and by shard.
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="recurring_schedules"
+    )
+    rule = models.CharField(max_length=500)
+    timezone = models.CharField(max_length=64, default="UTC")
+    starts_at = models.DateTimeField()
+    next_run_at = models.DateTimeField(blank=True, null=True)
+    active = models.BooleanField(default=True)
+    shard = models.PositiveSmallIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.rule}"
+
+    def save(self, *args, **kwargs):
+        self.shard = EmailSchedule.shard_for(self.user_id)
+        super().save(*args, **kwargs)
+
+    def get_rrule(self):
+        """
+        The parsed rule, yielding aware occurrences in the schedule's time zone.
+        """
+        return rrulestr(
+            self.rule, dtstart=self.starts_at.astimezone(ZoneInfo(self.timezone))
+        )
+
+    def occurrence_after(self, moment, inclusive=False):
+        """
+        The first occurrence after `moment` (or at it, if inclusive), or None.
+        """
+        return self.get_rrule().after(moment, inc=inclusive)
+
+    class Meta:
+        verbose_name = "RecurringSchedule"
+        verbose_name_plural = "RecurringSchedules"
+        db_table = "recurring_schedules"
+        indexes = [
+            models.Index(
+                fields=["next_run_at", "id"],
+                name="recur_next_run_idx",
+                condition=models.Q(active=True),
+            ),
+            models.Index(
+                fields=["shard", "next_run_at", "id"],
+                name="recur_due_idx",
+                condition=models.Q(active=True),
+            ),
+        ]
+
+
+class Campaign(Activity):
+    """
+    Model representing one email sent at a single time to every user of a segment.
+
+    Creating a campaign stores only the segment definition. At `send_at` the dispatcher
+    (`user.tasks.dispatch_campaigns`) pages through the ids of the matching users by keyset,
+    chunk by chunk, and publishes batched send tasks; `last_user_id` is the keyset cursor,
+    so an interrupted fan-out resumes where it stopped.
+
+    Attributes:
+    name (str): The campaign's name.
+    segment (dict): Filters over `User` fields, see `user.filters.UserSegment`.
+    send_at (datetime): When the campaign is sent.
+    status (str): Scheduled, Dispatching, Dispatched or Cancelled.
+    last_user_id (int): Id of the last user the campaign was fanned out to.
+    total_recipients (int, optional): Users in the segment when the fan-out started.
+    dispatched_count (int): Recipients handed to send tasks so far.
+    sent_count / failed_count / suppressed_count (int): Outcome of the sends so far.
+    dispatched_at (datetime, optional): When the fan-out completed.
+
+    Meta:
+    verbose_name (str): Singular name for the model.
+    verbose_name_plural (str): Plural name for the model.
+    db_table (str): Database table name for the model.
+    indexes (list): Partial index on the campaigns still to be fanned out.
+    """
+
+    STATUS_CHOICES = (
+        ("Scheduled", "Scheduled"),
+        ("Dispatching", "Dispatching"),
+        ("Dispatched", "Dispatched"),
+        ("Cancelled", "Cancelled"),
+    )
+    PENDING_STATUSES = ("Scheduled", "Dispatching")
+
+    name = models.CharField(max_length=200)
+    segment = models.JSONField(default=dict, blank=True)
+    send_at = models.DateTimeField()
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default="Scheduled"
+    )
+    last_user_id = models.BigIntegerField(default=0)
+    total_recipients = models.PositiveIntegerField(blank=True, null=True)
+    dispatched_count = models.PositiveIntegerField(default=0)
+    sent_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    suppressed_count = models.PositiveIntegerField(default=0)
+    dispatched_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return str(self.name)
+
+    class Meta:
+        verbose_name = "Campaign"
+        verbose_name_plural = "Campaigns"
+        db_table = "campaigns"
+        indexes = [
+            models.Index(
+                fields=["send_at", "id"],
+                name="campaign_due_idx",
+                condition=models.Q(status__in=["Scheduled", "Dispatching"]),
+            ),
+        ]
 
 
 class EmailSchedule(Activity):
@@ -54,11 +273,15 @@ class EmailSchedule(Activity):
     scheduled_time (datetime.time): The time at which the email is scheduled to be sent.
     scheduled_date (datetime.date): The date on which the email is scheduled to be sent.
     email_status (str): The status of the email schedule, chosen from predefined choices.
+    shard (int): The dispatch partition of the schedule, derived from the user id.
+    recurring (RecurringSchedule, optional): The recurrence this occurrence was expanded from.
 
     Meta:
     verbose_name (str): Singular name for the model.
     verbose_name_plural (str): Plural name for the model.
     db_table (str): Database table name for the model.
+    indexes (list): Composite indexes backing the filters in `user.filters`.
+    constraints (list): At most one schedule per occurrence of a recurrence.
 
     Example usage:
     email_schedule = EmailSchedule.objects.get(pk=1)
@@ -69,6 +292,7 @@ class EmailSchedule(Activity):
         ("Pending", "Pending"),
         ("Done", "Done"),
         ("Failed", "Failed"),
+        ("Suppressed", "Suppressed"),
     )
     user = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name="email_schedules"
@@ -78,11 +302,529 @@ class EmailSchedule(Activity):
     email_status = models.CharField(
         max_length=50, choices=STATUS_CHOICES, default="Pending"
     )
+    shard = models.PositiveSmallIntegerField(default=0)
+    recurring = models.ForeignKey(
+        RecurringSchedule,
+        on_delete=models.SET_NULL,
+        related_name="occurrences",
+        blank=True,
+        null=True,
+    )
 
     def __str__(self):
         return str(self.user.name)
 
+    @staticmethod
+    def shard_for(user_id):
+        """
+        The dispatch partition of a user: `user_id mod DISPATCH_SHARDS`.
+        """
+        return int(user_id) % int(settings.DISPATCH_SHARDS)
+
+    @staticmethod
+    def shard_filter(shards):
+        """
+        Q matching the rows of the given dispatch shards.
+
+        Rows written before DISPATCH_SHARDS was lowered can carry a shard no lease covers
+        any more; they are handed to the holder of shard 0 instead of being stranded.
+        """
+        shard_filter = models.Q(shard__in=shards)
+        if 0 in shards:
+            shard_filter |= models.Q(shard__gte=int(settings.DISPATCH_SHARDS))
+        return shard_filter
+
+    def save(self, *args, **kwargs):
+        """
+        Save the schedule. A new Pending schedule gets its outbox row in the same
+        transaction, whether it is created through the API, the admin or the ORM.
+        """
+        self.shard = self.shard_for(self.user_id)
+        if not self._state.adding or self.email_status != "Pending":
+            return super().save(*args, **kwargs)
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+            EmailOutbox.for_schedule(self).save(using=self._state.db)
+
+    @property
+    def scheduled_at(self):
+        """
+        The scheduled date and time combined into an aware datetime.
+
+        Values assigned as strings (e.g. `objects.create(scheduled_date="2030-01-01")`)
+        are parsed the way the fields would store them.
+        """
+        return timezone.make_aware(
+            datetime.combine(
+                self._meta.get_field("scheduled_date").to_python(self.scheduled_date),
+                self._meta.get_field("scheduled_time").to_python(self.scheduled_time),
+            )
+        )
+
     class Meta:
         verbose_name = "EmailSchedule"
         verbose_name_plural = "EmailSchedules"
         db_table = "email_schedules"
+        indexes = [
+            models.Index(
+                fields=["email_status", "scheduled_date", "scheduled_time", "id"],
+                name="sched_status_when_idx",
+            ),
+            models.Index(fields=["email_status", "id"], name="sched_status_id_idx"),
+            models.Index(
+                fields=["scheduled_date", "scheduled_time", "id"],
+                name="sched_when_idx",
+            ),
+            models.Index(
+                fields=["user", "scheduled_date", "scheduled_time", "id"],
+                name="sched_user_when_idx",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recurring", "scheduled_date", "scheduled_time"],
+                name="sched_recurring_run_uniq",
+            ),
+        ]
+
+
+class EmailScheduleHistory(models.Model):
+    """
+    Model representing an archived email schedule in a terminal state.
+
+    Append-only: rows are moved here in bulk by `user.archive.archive_schedules` and only
+    ever removed again by the retention purge. Columns are kept narrow (no foreign key, the
+    status as a small code) and on PostgreSQL the table can be partitioned by month of the
+    scheduled date, see `user.archive.setup_partitions`.
+
+    Attributes:
+    id (int): The id the schedule had in `email_schedules`.
+    user_id (int): The id of the schedule's user (not a foreign key, users may be purged).
+    scheduled_date (datetime.date): The date the email was scheduled for.
+    scheduled_time (datetime.time): The time the email was scheduled for.
+    status (int): The terminal status, a key of STATUS_CODES.
+    completed_at (datetime, optional): When the schedule reached its terminal status.
+
+    Meta:
+    verbose_name (str): Singular name for the model.
+    verbose_name_plural (str): Plural name for the model.
+    db_table (str): Database table name for the model.
+    indexes (list): Indexes mirroring the user and date lookups of the live table.
+    """
+
+    STATUS_CODES = {"Done": 1, "Suppressed": 2}
+    STATUS_CHOICES = tuple((code, name) for name, code in STATUS_CODES.items())
+
+    id = models.BigIntegerField(primary_key=True)
+    user_id = models.BigIntegerField()
+    scheduled_date = models.DateField()
+    scheduled_time = models.TimeField()
+    status = models.PositiveSmallIntegerField(choices=STATUS_CHOICES)
+    completed_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.id} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name = "EmailScheduleHistory"
+        verbose_name_plural = "EmailScheduleHistory"
+        db_table = "email_schedule_history"
+        indexes = [
+            models.Index(
+                fields=["user_id", "scheduled_date", "scheduled_time", "id"],
+                name="hist_user_when_idx",
+            ),
+            models.Index(
+                fields=["scheduled_date", "scheduled_time", "id"],
+                name="hist_when_idx",
+            ),
+        ]
+
+
+class DeliveryAttempt(models.Model):
+    """
+    Model representing one attempt to deliver an email.
+
+    Append-only and narrow: ids are plain integers (no foreign key is fetched or checked on
+    write) and the status is a small code. Rows are buffered by the workers and written in
+    bulk, see `user.delivery`.
+
+    Attributes:
+    schedule_id (int, optional): The attempted email schedule.
+    campaign_id (int, optional): The campaign the email belongs to.
+    user_id (int): The recipient.
+    status (int): The outcome, a value of STATUS_CODES.
+    response_code (int, optional): SMTP reply code or HTTP status reported by the relay.
+    latency_ms (int): Time spent in the relay call that carried the message.
+    relay_id (str): Message id assigned by the relay, if any.
+    attempted_at (datetime): When the attempt finished.
+
+    Meta:
+    verbose_name (str): Singular name for the model.
+    verbose_name_plural (str): Plural name for the model.
+    db_table (str): Database table name for the model.
+    indexes (list): Indexes for the per-schedule and time range lookups.
+    """
+
+    STATUS_CODES = {"Sent": 1, "Failed": 2, "Bounced": 3, "Suppressed": 4}
+    STATUS_CHOICES = tuple((code, name) for name, code in STATUS_CODES.items())
+
+    id = models.BigAutoField(primary_key=True)
+    schedule_id = models.BigIntegerField(blank=True, null=True)
+    campaign_id = models.IntegerField(blank=True, null=True)
+    user_id = models.BigIntegerField()
+    status = models.PositiveSmallIntegerField(choices=STATUS_CHOICES)
+    response_code = models.PositiveSmallIntegerField(blank=True, null=True)
+    latency_ms = models.PositiveIntegerField(default=0)
+    relay_id = models.CharField(max_length=100, blank=True, default="")
+    attempted_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.schedule_id or self.campaign_id}: {self.get_status_display()}"
+
+    @classmethod
+    def from_result(
+        cls, result, user_id, schedule_id=None, campaign_id=None, attempted_at=None
+    ):
+        """
+        Build an attempt from a result of `user.tasks.bulk_email_handler`; a missing
+        result means the recipient was suppressed before sending.
+        """
+        if result is None:
+            status = "Suppressed"
+        elif result.get("status"):
+            status = "Sent"
+        else:
+            status = "Bounced" if result.get("bounced") else "Failed"
+        result = result or {}
+        return cls(
+            schedule_id=schedule_id,
+            campaign_id=campaign_id,
+            user_id=user_id,
+            status=cls.STATUS_CODES[status],
+            response_code=result.get("code"),
+            latency_ms=result.get("latency_ms", 0),
+            relay_id=result.get("relay_id", "")[:100],
+            attempted_at=attempted_at or timezone.now(),
+        )
+
+    class Meta:
+        verbose_name = "DeliveryAttempt"
+        verbose_name_plural = "DeliveryAttempts"
+        db_table = "delivery_attempts"
+        indexes = [
+            models.Index(
+                fields=["schedule_id", "attempted_at"], name="attempt_sched_idx"
+            ),
+            models.Index(fields=["attempted_at"], name="attempt_when_idx"),
+        ]
+
+
+class EmailEngagement(models.Model):
+    """
+    Model holding the open and click counters of one email schedule.
+
+    Tracking hits are counted in memory first and added to these rows in bulk by
+    `user.tracking.EngagementBuffer`; the table is never written per hit.
+
+    Attributes:
+    schedule_id (int): The tracked email schedule (not a foreign key, schedules are archived).
+    opens (int): Number of times the open pixel was loaded.
+    clicks (int): Number of tracked link clicks.
+    first_opened_at (datetime, optional): First flushed open.
+    last_event_at (datetime, optional): Latest flushed open or click.
+
+    Meta:
+    verbose_name (str): Singular name for the model.
+    verbose_name_plural (str): Plural name for the model.
+    db_table (str): Database table name for the model.
+    """
+
+    schedule_id = models.BigIntegerField(primary_key=True)
+    opens = models.PositiveIntegerField(default=0)
+    clicks = models.PositiveIntegerField(default=0)
+    first_opened_at = models.DateTimeField(blank=True, null=True)
+    last_event_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.schedule_id}: {self.opens} opens, {self.clicks} clicks"
+
+    class Meta:
+        verbose_name = "EmailEngagement"
+        verbose_name_plural = "EmailEngagement"
+        db_table = "email_engagement"
+
+
+def _webhook_secret():
+    return secrets.token_urlsafe(32)
+
+
+def _webhook_events():
+    return ["Done", "Failed"]
+
+
+class WebhookSubscription(Activity):
+    """
+    Model representing a downstream system notified of schedule status changes.
+
+    Events are delivered in batches (see `user.webhooks`); `last_event_id` is the cursor
+    into `webhook_events` up to which this subscriber has acknowledged them.
+
+    Attributes:
+    url (str): Endpoint receiving the batched POSTs.
+    secret (str): Key of the HMAC-SHA256 signature sent in `X-Webhook-Signature`.
+    events (list): Statuses the subscriber wants, e.g. ["Done", "Failed"].
+    active (bool): False once the subscription was cancelled.
+    last_event_id (int): Id of the last event delivered to the subscriber.
+    failures (int): Consecutive failed deliveries, drives the backoff.
+    retry_at (datetime, optional): No delivery is attempted before this time.
+    claimed_until (datetime, optional): Lease of the delivery run posting to the
+        subscriber; the cursor is only stored while the lease is held.
+    delivery_scheduled_at (datetime, optional): When a delivery task was last published,
+        coalesces the scheduling across processes.
+
+    Meta:
+    verbose_name (str): Singular name for the model.
+    verbose_name_plural (str): Plural name for the model.
+    db_table (str): Database table name for the model.
+    """
+
+    url = models.URLField(max_length=500)
+    secret = models.CharField(max_length=100, default=_webhook_secret)
+    events = models.JSONField(default=_webhook_events)
+    active = models.BooleanField(default=True)
+    last_event_id = models.BigIntegerField(default=0)
+    failures = models.PositiveIntegerField(default=0)
+    retry_at = models.DateTimeField(blank=True, null=True)
+    claimed_until = models.DateTimeField(blank=True, null=True)
+    delivery_scheduled_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return str(self.url)
+
+    class Meta:
+        verbose_name = "WebhookSubscription"
+        verbose_name_plural = "WebhookSubscriptions"
+        db_table = "webhook_subscriptions"
+
+
+class WebhookEvent(models.Model):
+    """
+    Model representing one schedule status change waiting to be pushed to subscribers.
+
+    Append-only and shared by all subscribers, each of which reads it through its own
+    cursor; rows every active subscriber has received are purged.
+
+    Attributes:
+    schedule_id (int): The schedule whose status changed.
+    status (int): The new status, a value of STATUS_CODES.
+    occurred_at (datetime): When the status changed.
+
+    Meta:
+    verbose_name (str): Singular name for the model.
+    verbose_name_plural (str): Plural name for the model.
+    db_table (str): Database table name for the model.
+    """
+
+    STATUS_CODES = {"Done": 1, "Failed": 2, "Suppressed": 3}
+    STATUS_CHOICES = tuple((code, name) for name, code in STATUS_CODES.items())
+
+    id = models.BigAutoField(primary_key=True)
+    schedule_id = models.BigIntegerField()
+    status = models.PositiveSmallIntegerField(choices=STATUS_CHOICES)
+    occurred_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.schedule_id}: {self.get_status_display()}"
+
+    class Meta:
+        verbose_name = "WebhookEvent"
+        verbose_name_plural = "WebhookEvents"
+        db_table = "webhook_events"
+
+
+class Suppression(Activity):
+    """
+    Model representing an email address that must not receive any more emails.
+
+    Attributes:
+    email (str): The suppressed email address, stored lower-cased.
+    reason (str): Why the address is suppressed, chosen from predefined choices.
+
+    Meta:
+    verbose_name (str): Singular name for the model.
+    verbose_name_plural (str): Plural name for the model.
+    db_table (str): Database table name for the model.
+    indexes (list): Index on the creation time read by incremental filter refreshes.
+    """
+
+    REASON_CHOICES = (
+        ("Bounce", "Bounce"),
+        ("Unsubscribe", "Unsubscribe"),
+        ("Complaint", "Complaint"),
+        ("Manual", "Manual"),
+    )
+    email = models.EmailField(unique=True)
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES, default="Manual")
+
+    def __str__(self):
+        return self.email
+
+    def save(self, *args, **kwargs):
+        self.email = self.email.lower()
+        super().save(*args, **kwargs)
+
+    class Meta:
+        verbose_name = "Suppression"
+        verbose_name_plural = "Suppressions"
+        db_table = "email_suppressions"
+        indexes = [
+            models.Index(fields=["created_at"], name="suppression_created_idx"),
+        ]
+
+
+class EmailOutbox(Activity):
+    """
+    Model representing a pending publication of an email schedule to the broker.
+
+    Rows are written in the same transaction as the schedule change that makes an email
+    due (creation in `EmailSchedule.save`, or a failed attempt that needs a retry; bulk
+    inserts write theirs explicitly), and are relayed to Celery in
+    batches by `user.tasks.relay_outbox`. A row is never lost: if the process dies before
+    publishing, the row is still unpublished and the next relay run picks it up.
+
+    Attributes:
+    schedule (EmailSchedule): The email schedule to be sent.
+    shard (int): Copy of the schedule's dispatch partition, used by sharded relays.
+    available_at (datetime.datetime): The earliest time at which the row may be relayed.
+    published_at (datetime.datetime, optional): When the row was published to the broker.
+
+    Meta:
+    verbose_name (str): Singular name for the model.
+    verbose_name_plural (str): Plural name for the model.
+    db_table (str): Database table name for the model.
+    indexes (list): Partial indexes covering the unpublished rows scanned by the unsharded
+        relay (beat) and by the sharded dispatcher nodes.
+    """
+
+    schedule = models.ForeignKey(
+        EmailSchedule, on_delete=models.CASCADE, related_name="outbox_entries"
+    )
+    shard = models.PositiveSmallIntegerField(default=0)
+    available_at = models.DateTimeField()
+    published_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.schedule_id} @ {self.available_at}"
+
+    @classmethod
+    def for_schedule(cls, schedule, available_at=None):
+        """
+        Build (without saving) the outbox row for the given schedule.
+        """
+        return cls(
+            schedule_id=schedule.pk,
+            shard=schedule.shard,
+            available_at=available_at or schedule.scheduled_at,
+        )
+
+    @classmethod
+    def backfill(cls, batch_size=5000, using=None):
+        """
+        Write the missing outbox rows of Pending and Failed schedules.
+
+        Schedules stored before the outbox existed have no row and would never be
+        relayed. Schedules with any row, published or not, are left alone, so running
+        it again inserts nothing.
+
+        Returns:
+        int: The number of rows written.
+        """
+        missing = (
+            EmailSchedule.objects.db_manager(using)
+            .filter(email_status__in=("Pending", "Failed"))
+            .filter(
+                ~models.Exists(cls.objects.filter(schedule_id=models.OuterRef("pk")))
+            )
+        )
+        written, last_id = 0, 0
+        while True:
+            batch = list(
+                missing.filter(id__gt=last_id)
+                .order_by("id")
+                .only("id", "shard", "scheduled_date", "scheduled_time")[:batch_size]
+            )
+            if not batch:
+                return written
+            cls.objects.db_manager(using).bulk_create(
+                cls.for_schedule(schedule) for schedule in batch
+            )
+            written += len(batch)
+            last_id = batch[-1].id
+
+    class Meta:
+        verbose_name = "EmailOutbox"
+        verbose_name_plural = "EmailOutbox"
+        db_table = "email_outbox"
+        indexes = [
+            models.Index(
+                fields=["available_at", "id"],
+                name="email_outbox_unpublished_idx",
+                condition=models.Q(published_at__isnull=True),
+            ),
+            models.Index(
+                fields=["shard", "available_at", "id"],
+                name="email_outbox_shard_pending_idx",
+                condition=models.Q(published_at__isnull=True),
+            ),
+        ]
+
+
+class DispatchNode(models.Model):
+    """
+    Model representing a live dispatcher node.
+
+    Nodes heartbeat while running; the number of nodes with a recent heartbeat decides
+    how many shards each node may hold.
+
+    Attributes:
+    node_id (str): Unique name of the dispatcher node.
+    heartbeat_at (datetime.datetime): Last time the node reported itself alive.
+    """
+
+    node_id = models.CharField(max_length=255, unique=True)
+    heartbeat_at = models.DateTimeField()
+
+    def __str__(self):
+        return self.node_id
+
+    class Meta:
+        verbose_name = "DispatchNode"
+        verbose_name_plural = "DispatchNodes"
+        db_table = "dispatch_nodes"
+
+
+class DispatchLease(models.Model):
+    """
+    Model representing the lease of one dispatch shard by a dispatcher node.
+
+    A node only relays outbox rows of the shards it holds. Leases expire unless they are
+    renewed, so the shards of a dead node are taken over by the remaining nodes.
+
+    Attributes:
+    shard (int): The leased dispatch partition.
+    owner (str): The node_id of the current holder, empty when free.
+    expires_at (datetime.datetime): When the lease lapses unless renewed.
+    """
+
+    shard = models.PositiveSmallIntegerField(unique=True)
+    owner = models.CharField(max_length=255, blank=True, default="")
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.shard}: {self.owner}"
+
+    class Meta:
+        verbose_name = "DispatchLease"
+        verbose_name_plural = "DispatchLeases"
+        db_table = "dispatch_leases"
@@ -0,0 +1,128 @@
+"""
+Module containing the lazy expansion of recurring schedules.
+
+A `RecurringSchedule` stores its rule and the next occurrence only. Every relay run calls
+`expand_recurring` for its window: the recurrences due within the window are read through
+the partial `recur_due_idx` index, their occurrences in the window become ordinary
+`EmailSchedule` rows with outbox entries, and `next_run_at` moves past the window. Storage
+and scan cost therefore follow the work that is actually due, not the length of the
+subscription.
+
+Occurrences missed while no dispatcher was running are coalesced: only the latest missed
+one is sent, so a recurrence never fires a burst of stale emails.
+
+Functions:
+- validate_rule: Check a recurrence rule and time zone.
+- expand_recurring: Turn due occurrences into email schedules and advance the recurrences.
+"""
+
+from datetime import timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from dateutil.rrule import rrulestr
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from utils.cache import api_cache
+
+from .models import EmailOutbox, EmailSchedule, RecurringSchedule
+
+DISALLOWED_FREQUENCIES = ("FREQ=SECONDLY", "FREQ=MINUTELY")
+
+
+def validate_rule(rule, tz_name):
+    """
+    Check a recurrence rule and time zone.
+
+    Parameters:
+    rule (str): An RFC 5545 RRULE, with or without the "RRULE:" prefix.
+    tz_name (str): An IANA time zone name.
+
+    Returns:
+    str: An error message, or None if both are valid.
+    """
+    try:
+        ZoneInfo(tz_name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return f"Unknown time zone: {tz_name}."
+    if any(frequency in rule.upper() for frequency in DISALLOWED_FREQUENCIES):
+        return "Recurrences may repeat at most hourly."
+    try:
+        rrulestr(rule, dtstart=timezone.now())
+    except (ValueError, TypeError) as error:
+        return f"Invalid recurrence rule: {error}."
+    return None
+
+
+def _local_parts(moment):
+    local = timezone.localtime(moment)
+    return local.date(), local.time().replace(tzinfo=None)
+
+
+def expand_recurring(window_minutes=0, shards=None, now=None, batch_size=None):
+    """
+    Create the email schedules of every occurrence due within the window.
+
+    Recurrences are claimed with `SELECT ... FOR UPDATE SKIP LOCKED`, so relays of
+    different nodes can expand side by side; the schedules, their outbox rows and the
+    advanced `next_run_at` are written in the same transaction.
+
+    Parameters:
+    window_minutes (int): How far ahead of now occurrences are expanded.
+    shards (list, optional): Only expand recurrences of these dispatch shards.
+    now (datetime, optional): The current time, for tests.
+    batch_size (int, optional): Recurrences per transaction, defaults to OUTBOX_RELAY_BATCH_SIZE.
+
+    Returns:
+    int: The number of email schedules created.
+    """
+    now = now or timezone.now()
+    horizon = now + timedelta(minutes=window_minutes)
+    batch_size = int(batch_size or settings.OUTBOX_RELAY_BATCH_SIZE)
+    created = 0
+    while True:
+        with transaction.atomic():
+            due = RecurringSchedule.objects.select_for_update(skip_locked=True).filter(
+                active=True, next_run_at__lte=horizon
+            )
+            if shards is not None:
+                due = due.filter(EmailSchedule.shard_filter(shards))
+            recurrences = list(due.order_by("next_run_at", "id")[:batch_size])
+            if not recurrences:
+                break
+            schedules = []
+            for recurring in recurrences:
+                rule = recurring.get_rrule()
+                runs = rule.between(recurring.next_run_at, horizon, inc=True)
+                missed = [run for run in runs if run < now]
+                for run in missed[-1:] + [run for run in runs if run >= now]:
+                    scheduled_date, scheduled_time = _local_parts(run)
+                    schedules.append(
+                        EmailSchedule(
+                            user_id=recurring.user_id,
+                            recurring=recurring,
+                            scheduled_date=scheduled_date,
+                            scheduled_time=scheduled_time,
+                            shard=recurring.shard,
+                        )
+                    )
+                recurring.next_run_at = rule.after(horizon)
+                recurring.active = recurring.next_run_at is not None
+                recurring.updated_at = now
+            if connection.features.can_return_rows_from_bulk_insert:
+                EmailSchedule.objects.bulk_create(schedules)
+                EmailOutbox.objects.bulk_create(
+                    EmailOutbox.for_schedule(schedule) for schedule in schedules
+                )
+            else:
+                # save() writes the outbox row of each schedule.
+                for schedule in schedules:
+                    schedule.save()
+            RecurringSchedule.objects.bulk_update(
+                recurrences, ["next_run_at", "active", "updated_at"]
+            )
+        created += len(schedules)
+    if created:
+        api_cache.bump("schedules")
+    return created
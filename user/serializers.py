@@ -3,7 +3,18 @@ from datetime import date
 from django.utils import timezone
 from rest_framework import serializers
 
-from .models import EmailSchedule, User
+from utils.exceptions.exception import InvalidFilterException
+
+from .filters import UserSegment
+from .models import (
+    Campaign,
+    EmailSchedule,
+    RecurringSchedule,
+    User,
+    WebhookEvent,
+    WebhookSubscription,
+)
+from .recurrence import validate_rule
 
 
 class UserCreateSerializer(serializers.ModelSerializer):
@@ -28,7 +39,8 @@ class UserCreateSerializer(serializers.ModelSerializer):
         """
         Check that the email is not already in use.
         """
-        if User.objects.filter(email=value).exists():
+        # Soft-deleted users keep their email until they are purged.
+        if User.all_objects.filter(email=value).exists():
             raise serializers.ValidationError("This email is already in use.")
         return value
 
@@ -36,6 +48,8 @@ class UserCreateSerializer(serializers.ModelSerializer):
         """
         Check that the phone number is valid.
         """
+        if not value:
+            return value
         if not value.isdigit():
             raise serializers.ValidationError("Phone number must contain only digits.")
         if len(value) < 10:
@@ -48,7 +62,7 @@ class UserCreateSerializer(serializers.ModelSerializer):
         """
         Perform additional validation on the entire set of data.
         """
-        if data["date_of_birth"] > date.today():
+        if data.get("date_of_birth") and data["date_of_birth"] > date.today():
             raise serializers.ValidationError("Date of birth cannot be in the future.")
         return data
 
@@ -80,6 +94,8 @@ class EmailScheduleCreateSerializer(serializers.ModelSerializer):
         validate_scheduled_date: Check that the scheduled date is in the future.
     """
 
+    user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
+
     class Meta:
         model = EmailSchedule
         fields = ["user", "scheduled_time", "scheduled_date"]
@@ -88,7 +104,7 @@ class EmailScheduleCreateSerializer(serializers.ModelSerializer):
         """
         Check that the scheduled time is in the future.
         """
-        if self.initial_data["scheduled_date"] == str(timezone.now().date()):
+        if self.initial_data.get("scheduled_date") == str(timezone.now().date()):
             if value <= timezone.now().time():
                 raise serializers.ValidationError(
                     "The scheduled time must be in the future."
@@ -106,6 +122,35 @@ class EmailScheduleCreateSerializer(serializers.ModelSerializer):
         return value
 
 
+class UserImportSerializer(UserCreateSerializer):
+    """
+    Serializer validating one row of a bulk user import.
+
+    The per-row uniqueness query of `UserCreateSerializer` is disabled; duplicate emails are
+    checked for a whole chunk at once by `user.importers.import_users`.
+    """
+
+    class Meta(UserCreateSerializer.Meta):
+        extra_kwargs = {"email": {"validators": []}}
+
+    def validate_email(self, value):
+        """
+        Skip the per-row uniqueness query, see `user.importers.import_users`.
+        """
+        return value
+
+
+class EmailScheduleImportSerializer(EmailScheduleCreateSerializer):
+    """
+    Serializer validating one row of a bulk email schedule import.
+
+    The user is validated as a plain id; existence is checked for a whole chunk at once by
+    `user.importers.import_schedules`.
+    """
+
+    user = serializers.IntegerField(min_value=1)
+
+
 class EmailScheduleDetailSerializer(serializers.ModelSerializer):
     """
     Serializer for displaying detailed information about an email schedule instance.
@@ -120,3 +165,151 @@ class EmailScheduleDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = EmailSchedule
         fields = ["id", "user", "scheduled_time", "scheduled_date", "email_status"]
+
+
+class RecurringScheduleSerializer(serializers.ModelSerializer):
+    """
+    Serializer for creating and displaying recurring email schedules.
+
+    Attributes:
+        model: The RecurringSchedule model class.
+        fields: The fields to include in the serialized output.
+
+    Methods:
+        validate: Check the rule and time zone and compute the first occurrence.
+    """
+
+    user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
+    starts_at = serializers.DateTimeField(required=False)
+
+    class Meta:
+        model = RecurringSchedule
+        fields = [
+            "id",
+            "user",
+            "rule",
+            "timezone",
+            "starts_at",
+            "next_run_at",
+            "active",
+        ]
+        read_only_fields = ["next_run_at", "active"]
+
+    def validate(self, data):
+        """
+        Check the rule and time zone and compute the first occurrence from now on.
+        """
+        data.setdefault("starts_at", timezone.now())
+        data.setdefault("timezone", "UTC")
+        error = validate_rule(data["rule"], data["timezone"])
+        if error:
+            raise serializers.ValidationError({"rule": [error]})
+        first_run = RecurringSchedule(**data).occurrence_after(
+            max(data["starts_at"], timezone.now()), inclusive=True
+        )
+        if first_run is None:
+            raise serializers.ValidationError(
+                {"rule": ["The rule has no future occurrences."]}
+            )
+        data["next_run_at"] = first_run
+        return data
+
+
+class CampaignSerializer(serializers.ModelSerializer):
+    """
+    Serializer for creating campaigns and displaying their progress.
+
+    Attributes:
+        model: The Campaign model class.
+        fields: The fields to include in the serialized output.
+
+    Methods:
+        validate_segment: Check the segment against the whitelisted user filters.
+    """
+
+    class Meta:
+        model = Campaign
+        fields = [
+            "id",
+            "name",
+            "segment",
+            "send_at",
+            "status",
+            "total_recipients",
+            "dispatched_count",
+            "sent_count",
+            "failed_count",
+            "suppressed_count",
+            "dispatched_at",
+        ]
+        read_only_fields = [
+            "status",
+            "total_recipients",
+            "dispatched_count",
+            "sent_count",
+            "failed_count",
+            "suppressed_count",
+            "dispatched_at",
+        ]
+
+    def validate_segment(self, value):
+        """
+        Check the segment against the whitelisted user filters.
+        """
+        try:
+            UserSegment(value)
+        except InvalidFilterException as error:
+            raise serializers.ValidationError(f"{error.item}: {error.message}")
+        return value
+
+
+class WebhookSubscriptionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for creating and displaying webhook subscriptions.
+
+    The signing secret is not part of the output; only the create view returns it.
+
+    Attributes:
+        model: The WebhookSubscription model class.
+        fields: The fields to include in the serialized output.
+
+    Methods:
+        validate_events: Check that only known statuses are subscribed to.
+        create: Start the new subscriber after the events already queued.
+    """
+
+    class Meta:
+        model = WebhookSubscription
+        fields = [
+            "id",
+            "url",
+            "events",
+            "active",
+            "last_event_id",
+            "failures",
+            "retry_at",
+        ]
+        read_only_fields = ["active", "last_event_id", "failures", "retry_at"]
+
+    def validate_events(self, value):
+        """
+        Check that only known statuses are subscribed to.
+        """
+        if not isinstance(value, list) or not value:
+            raise serializers.ValidationError("Events must be a non-empty list.")
+        unknown = set(value) - set(WebhookEvent.STATUS_CODES)
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown event: {', '.join(sorted(map(str, unknown)))}."
+            )
+        return value
+
+    def create(self, validated_data):
+        """
+        Start the new subscriber after the events already queued.
+        """
+        validated_data["last_event_id"] = (
+            WebhookEvent.objects.order_by("-id").values_list("id", flat=True).first()
+            or 0
+        )
+        return super().create(validated_data)
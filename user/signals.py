@@ -0,0 +1,45 @@
+"""
+Module containing the model signal handlers that keep the API read cache precise.
+
+Saving or deleting a user or an email schedule bumps the generation of the object itself and
+of the list namespace it appears in, so only the cached payloads that contain it are rebuilt.
+Bulk writes (`bulk_create`, `update`) do not send signals and call `api_cache.bump` directly.
+
+After `migrate`, the outbox rows missing for schedules stored before the outbox existed
+are written, so those schedules are relayed like new ones, and the `email_domain` of users
+stored before that column existed is filled in.
+"""
+
+from django.db import router
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from utils.cache import api_cache
+
+from .models import EmailOutbox, EmailSchedule, User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user(sender, instance, created=False, **kwargs):
+    namespaces = [f"user:{instance.pk}", "users"]
+    if not created:
+        # Schedule payloads embed their user.
+        namespaces.append("schedules")
+    api_cache.bump(*namespaces)
+
+
+@receiver(post_save, sender=EmailSchedule)
+@receiver(post_delete, sender=EmailSchedule)
+def invalidate_schedule(sender, instance, **kwargs):
+    api_cache.bump(f"schedule:{instance.pk}", "schedules")
+
+
+def backfill_rows(sender, using="default", **kwargs):
+    """
+    Connected to `post_migrate` of the user app in `UserConfig.ready`.
+    """
+    # Replicas are not migrated, they get the rows through replication.
+    if router.allow_migrate_model(using, EmailOutbox):
+        User.backfill_email_domains(using=using)
+        EmailOutbox.backfill(using=using)
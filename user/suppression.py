@@ -0,0 +1,129 @@
+"""
+Module containing the per-process suppression check used by the send tasks.
+
+Suppressed addresses are mirrored into an in-memory Bloom filter. The filter is refreshed
+incrementally by reading only the suppression rows created since the last refresh (minus an
+overlap margin, see `SuppressionFilter.refresh`), and only Bloom hits are confirmed against
+the database, so the common "not suppressed" answer costs microseconds and no query.
+
+Classes:
+- SuppressionFilter: Incrementally refreshed Bloom filter over the suppression list.
+
+Functions:
+- get_suppression_filter: Return the SuppressionFilter of the current process.
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from utils.bloom import BloomFilter
+
+from .models import Suppression
+
+
+class SuppressionFilter:
+    """
+    Bloom filter mirror of the `Suppression` table.
+
+    Attributes:
+        refresh_seconds (float): Maximum age of the filter before it pulls new rows.
+        margin (timedelta): Overlap of each refresh with the previous one.
+        loaded_at (datetime): Start of the last refresh; None before the first one.
+
+    Methods:
+        refresh: Load the suppression rows added since the last refresh.
+        suppressed: Return which of the given emails are suppressed.
+        is_suppressed: Check a single email.
+    """
+
+    def __init__(self, capacity=None, refresh_seconds=None, margin_seconds=None):
+        self.capacity = int(capacity or settings.SUPPRESSION_BLOOM_CAPACITY)
+        self.refresh_seconds = float(
+            settings.SUPPRESSION_REFRESH_SECONDS
+            if refresh_seconds is None
+            else refresh_seconds
+        )
+        self.margin = timedelta(
+            seconds=float(
+                settings.SUPPRESSION_REFRESH_MARGIN_SECONDS
+                if margin_seconds is None
+                else margin_seconds
+            )
+        )
+        self.bloom = BloomFilter(self.capacity)
+        self.loaded_at = None
+        self.refreshed_at = None
+
+    def refresh(self, force=False):
+        """
+        Load the suppression rows created since the last refresh.
+
+        Rows are selected by `created_at`, going back `margin` before the start of the
+        previous refresh. An id or timestamp high-water mark alone would miss rows whose
+        transaction committed after a later row had been read; the overlap catches them
+        as long as they commit within the margin. Rows read twice are not added again.
+        When the filter outgrows its capacity it is rebuilt once at double the size to
+        keep the false positive rate bounded.
+        """
+        now = time.monotonic()
+        if (
+            not force
+            and self.refreshed_at is not None
+            and now - self.refreshed_at < self.refresh_seconds
+        ):
+            return
+        started = timezone.now()
+        rows = Suppression.objects.all()
+        if self.loaded_at is not None:
+            rows = rows.filter(created_at__gte=self.loaded_at - self.margin)
+        for email in rows.values_list("email", flat=True).iterator(chunk_size=5000):
+            if email not in self.bloom:
+                self.bloom.add(email)
+        if self.bloom.is_full:
+            self.capacity *= 2
+            self.bloom = BloomFilter(self.capacity)
+            self.loaded_at = None
+            self.refreshed_at = None
+            return self.refresh(force=True)
+        self.loaded_at = started
+        self.refreshed_at = now
+
+    def suppressed(self, emails):
+        """
+        Return the subset of the given emails that is suppressed.
+
+        Emails missing from the Bloom filter are cleared without a query; the hits are
+        confirmed with one `IN` query.
+        """
+        self.refresh()
+        candidates = {email.lower() for email in emails}
+        candidates = {email for email in candidates if email in self.bloom}
+        if not candidates:
+            return set()
+        return set(
+            Suppression.objects.filter(email__in=candidates).values_list(
+                "email", flat=True
+            )
+        )
+
+    def is_suppressed(self, email):
+        """
+        Check whether a single email is suppressed.
+        """
+        return bool(self.suppressed([email]))
+
+
+_filter = None
+
+
+def get_suppression_filter():
+    """
+    Return the SuppressionFilter of the current process, creating it on first use.
+    """
+    global _filter
+    if _filter is None:
+        _filter = SuppressionFilter()
+    return _filter
@@ -1,12 +1,41 @@
-from datetime import datetime
+import time
+from datetime import timedelta
+from smtplib import SMTPRecipientsRefused, SMTPResponseException
 
 from celery import shared_task
 from django.conf import settings
-from django.core.mail import send_mail
-from django.db.models import Q
+from django.core.mail import EmailMultiAlternatives, get_connection, send_mail
+from django.db import transaction
+from django.db.models import Count, F, Q
 from django.http import BadHeaderError
+from django.utils import timezone
 
-from .models import EmailSchedule
+from utils.cache import api_cache
+from utils.metrics import timed
+
+from .archive import archive_schedules, purge_history
+from .delivery import log_attempts
+from .filters import UserSegment
+from .metrics import (
+    email_failures_total,
+    email_send_seconds,
+    emails_total,
+    outbox_relayed_total,
+    send_lateness_seconds,
+    smtp_connect_seconds,
+)
+from .models import (
+    Campaign,
+    EmailOutbox,
+    EmailSchedule,
+    Suppression,
+    User,
+    WebhookSubscription,
+)
+from .recurrence import expand_recurring
+from .suppression import get_suppression_filter
+from .tracking import fill_placeholders, tracked_html, tracking_substitutions
+from .webhooks import claim, deliver, purge_delivered_events, queue_events
 
 
 @shared_task
@@ -24,9 +53,26 @@ def send_scheduled_email(email_schedule_id):
     Exception: If an error occurs during the email sending process.
     """
 
-    schedule = EmailSchedule.objects.get(id=email_schedule_id)
+    schedule = EmailSchedule.objects.select_related("user").get(id=email_schedule_id)
+    if schedule.email_status == "Done":
+        return "Email already sent."
+    if schedule.email_status == "Suppressed":
+        return "Email address is suppressed."
+    if schedule.user.deleted_at:
+        return "User is deleted."
+    recipient = [(schedule.id, schedule.user_id, schedule.id)]
+    send_lateness_seconds.observe(
+        max((timezone.now() - schedule.scheduled_at).total_seconds(), 0)
+    )
+    if get_suppression_filter().is_suppressed(schedule.user.email):
+        log_attempts({}, recipient)
+        record_send_results([], [], [schedule.id])
+        return "Email address is suppressed."
     try:
-        email_response = email_handler(schedule.user.email)
+        started = time.perf_counter()
+        email_response = email_handler(schedule.user.email, schedule_id=schedule.id)
+        email_response["latency_ms"] = int((time.perf_counter() - started) * 1000)
+        log_attempts({schedule.id: email_response}, recipient)
         if email_response.get("status"):
             schedule.email_status = "Done"
             return "Email sent sucessfully."
@@ -44,7 +90,273 @@ def send_scheduled_email(email_schedule_id):
         )
 
     finally:
-        schedule.save()
+        if schedule.email_status == "Done":
+            record_send_results([schedule.id], [])
+        else:
+            record_send_results([], [schedule.id])
+
+
+@shared_task
+def send_scheduled_email_batch(email_schedule_ids):
+    """
+    Function to send a batch of scheduled emails through a single email connection.
+
+    With an HTTP API backend the whole batch goes out in one API call; the per-message
+    result reported by the backend is mapped back to each schedule's status. Recipients
+    on the suppression list are skipped and hard bounces are added to it.
+
+    Parameters:
+    email_schedule_ids (list): The IDs of the email schedules to be processed.
+
+    Returns:
+    str: A message indicating how many emails were sent, failed and were suppressed.
+    """
+
+    schedules = list(
+        EmailSchedule.objects.select_related("user").filter(
+            id__in=email_schedule_ids, user__deleted_at__isnull=True
+        )
+        # Redelivered or retried batches never send a final schedule again.
+        .exclude(email_status__in=("Done", "Suppressed"))
+    )
+    now = timezone.now()
+    for schedule in schedules:
+        send_lateness_seconds.observe(
+            max((now - schedule.scheduled_at).total_seconds(), 0)
+        )
+    suppressed_emails = get_suppression_filter().suppressed(
+        schedule.user.email for schedule in schedules
+    )
+    suppressed = [
+        schedule.id
+        for schedule in schedules
+        if schedule.user.email.lower() in suppressed_emails
+    ]
+    results = bulk_email_handler(
+        [
+            (schedule.id, schedule.user.email, {"-name-": schedule.user.name})
+            for schedule in schedules
+            if schedule.user.email.lower() not in suppressed_emails
+        ],
+        track=True,
+    )
+    log_attempts(
+        results,
+        [(schedule.id, schedule.user_id, schedule.id) for schedule in schedules],
+    )
+    sent = [key for key, result in results.items() if result.get("status")]
+    bounced = [key for key, result in results.items() if result.get("bounced")]
+    failed = [
+        key
+        for key, result in results.items()
+        if not result.get("status") and not result.get("bounced")
+    ]
+    if bounced:
+        bounced_ids = set(bounced)
+        bounced_emails = {
+            schedule.user.email.lower()
+            for schedule in schedules
+            if schedule.id in bounced_ids
+        }
+        Suppression.objects.bulk_create(
+            [Suppression(email=email, reason="Bounce") for email in bounced_emails],
+            ignore_conflicts=True,
+        )
+    record_send_results(sent, failed, suppressed + bounced)
+    return (
+        f"{len(sent)} email(s) sent, {len(failed)} failed, "
+        f"{len(suppressed) + len(bounced)} suppressed."
+    )
+
+
+@shared_task
+def send_campaign_batch(campaign_id, user_ids):
+    """
+    Function to send a campaign to one batch of users through a single email connection.
+
+    Users deleted since the fan-out are skipped, suppressed recipients are counted as
+    suppressed and hard bounces are added to the suppression list. The outcome is added
+    to the campaign's counters with one UPDATE.
+
+    Parameters:
+    campaign_id (int): The ID of the campaign.
+    user_ids (list): The IDs of the recipients of this batch.
+
+    Returns:
+    str: A message indicating how many emails were sent, failed and were suppressed.
+    """
+
+    users = list(
+        User.objects.filter(id__in=user_ids).values_list("id", "email", "name")
+    )
+    suppressed_emails = get_suppression_filter().suppressed(
+        email for _, email, _ in users
+    )
+    results = bulk_email_handler(
+        [
+            (user_id, email, {"-name-": name})
+            for user_id, email, name in users
+            if email.lower() not in suppressed_emails
+        ]
+    )
+    log_attempts(
+        results,
+        [(user_id, user_id, None) for user_id, _, _ in users],
+        campaign_id=campaign_id,
+    )
+    sent = sum(1 for result in results.values() if result.get("status"))
+    bounced = {
+        email.lower()
+        for user_id, email, _ in users
+        if results.get(user_id, {}).get("bounced")
+    }
+    suppressed = len(users) - len(results) + len(bounced)
+    failed = len(results) - sent - len(bounced)
+    if bounced:
+        Suppression.objects.bulk_create(
+            [Suppression(email=email, reason="Bounce") for email in bounced],
+            ignore_conflicts=True,
+        )
+    emails_total.inc("sent", amount=sent)
+    emails_total.inc("failed", amount=failed)
+    emails_total.inc("suppressed", amount=suppressed)
+    Campaign.objects.filter(pk=campaign_id).update(
+        sent_count=F("sent_count") + sent,
+        failed_count=F("failed_count") + failed,
+        suppressed_count=F("suppressed_count") + suppressed,
+        updated_at=timezone.now(),
+    )
+    return f"{sent} email(s) sent, {failed} failed, {suppressed} suppressed."
+
+
+@shared_task
+def dispatch_campaigns(chunk_size=None):
+    """
+    Function to fan out every campaign whose send time has come.
+
+    The ids of the segment's users are read by keyset (`id > last_user_id`),
+    CAMPAIGN_CHUNK_SIZE at a time and never all at once, and published as `send_campaign_batch` tasks of
+    EMAIL_BATCH_SIZE users. Each chunk is one transaction that claims the campaign with
+    `SELECT ... FOR UPDATE SKIP LOCKED`, publishes and advances the cursor, so several
+    dispatchers can share a campaign and a crash resumes at the last committed chunk.
+
+    Parameters:
+    chunk_size (int, optional): User ids per transaction, defaults to CAMPAIGN_CHUNK_SIZE.
+
+    Returns:
+    int: The number of recipients dispatched.
+    """
+
+    chunk_size = int(chunk_size or settings.CAMPAIGN_CHUNK_SIZE)
+    email_batch_size = int(settings.EMAIL_BATCH_SIZE)
+    dispatched = 0
+    while True:
+        with transaction.atomic():
+            campaign = (
+                Campaign.objects.select_for_update(skip_locked=True)
+                .filter(
+                    status__in=Campaign.PENDING_STATUSES, send_at__lte=timezone.now()
+                )
+                .order_by("send_at", "id")
+                .first()
+            )
+            if campaign is None:
+                break
+            recipients = UserSegment(campaign.segment).filter_queryset(
+                User.objects.all()
+            )
+            if campaign.status == "Scheduled":
+                campaign.status = "Dispatching"
+                campaign.total_recipients = recipients.count()
+            user_ids = list(
+                recipients.filter(id__gt=campaign.last_user_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:chunk_size]
+            )
+            if user_ids:
+                with send_campaign_batch.app.producer_or_acquire() as producer:
+                    for start in range(0, len(user_ids), email_batch_size):
+                        send_campaign_batch.apply_async(
+                            args=[
+                                campaign.id,
+                                user_ids[start : start + email_batch_size],
+                            ],
+                            producer=producer,
+                        )
+                campaign.last_user_id = user_ids[-1]
+                campaign.dispatched_count += len(user_ids)
+            if len(user_ids) < chunk_size:
+                campaign.status = "Dispatched"
+                campaign.dispatched_at = timezone.now()
+            # Only the dispatch fields: the send counters are incremented concurrently.
+            campaign.save(
+                update_fields=[
+                    "status",
+                    "total_recipients",
+                    "last_user_id",
+                    "dispatched_count",
+                    "dispatched_at",
+                    "updated_at",
+                ]
+            )
+        dispatched += len(user_ids)
+    return dispatched
+
+
+@shared_task
+def relay_outbox(window_minutes=0, shards=None):
+    """
+    Function to relay unpublished outbox rows to the broker in batches.
+
+    Each batch is claimed with `SELECT ... FOR UPDATE SKIP LOCKED`, so several relays can
+    run side by side without publishing the same row twice. The batch is published as
+    `send_scheduled_email_batch` tasks over a single producer connection and marked as
+    published in the same transaction; if publishing fails the transaction rolls back
+    and the rows are picked up again by the next run. Occurrences of recurring schedules
+    that fall into the window are expanded into schedules first (see `user.recurrence`).
+
+    Parameters:
+    window_minutes (int): Also relay rows that become available within this many minutes.
+    shards (list, optional): Only relay rows of these dispatch shards (see `user.dispatch`).
+
+    Returns:
+    int: The number of outbox rows published.
+    """
+
+    expand_recurring(window_minutes=int(window_minutes), shards=shards)
+    cutoff = timezone.now() + timedelta(minutes=int(window_minutes))
+    relay_batch_size = int(settings.OUTBOX_RELAY_BATCH_SIZE)
+    email_batch_size = int(settings.EMAIL_BATCH_SIZE)
+    pending = EmailOutbox.objects.filter(
+        published_at__isnull=True, available_at__lt=cutoff
+    )
+    if shards is not None:
+        pending = pending.filter(EmailSchedule.shard_filter(shards))
+    published = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                pending.select_for_update(skip_locked=True)
+                .order_by("available_at", "id")
+                .values_list("id", "schedule_id")[:relay_batch_size]
+            )
+            if not rows:
+                break
+            schedule_ids = list(dict.fromkeys(schedule_id for _, schedule_id in rows))
+            with send_scheduled_email_batch.app.producer_or_acquire() as producer:
+                for start in range(0, len(schedule_ids), email_batch_size):
+                    send_scheduled_email_batch.apply_async(
+                        args=[schedule_ids[start : start + email_batch_size]],
+                        producer=producer,
+                    )
+            EmailOutbox.objects.filter(id__in=[row_id for row_id, _ in rows]).update(
+                published_at=timezone.now()
+            )
+        published += len(rows)
+        outbox_relayed_total.inc(amount=len(rows))
+        if len(rows) < relay_batch_size:
+            break
+    return published
 
 
 @shared_task
@@ -52,45 +364,168 @@ def resend_email():
     """
     Function to resend emails for failed or pending email schedules.
 
+    Failed sends and missed schedules are tracked through the outbox, so this no longer
+    scans the whole schedule table; it is kept for existing beat entries and simply runs
+    the outbox relay.
+
     Returns:
         str: A message indicating the result of the email resending process.
+    """
 
-    Raises:
-        Exception: If an error occurs during the email resending process.
+    return f"{relay_outbox()} email schedule(s) relayed."
+
+
+def record_send_results(sent_ids, failed_ids, suppressed_ids=()):
     """
+    Function to store the outcome of a send attempt.
 
-    try:
-        now = datetime.now()
-        current_date = now.date()
-        schedule = None
-        email_schedules = EmailSchedule.objects.filter(
-            Q(email_status="Failed")  # Condition 1: Records where status is 'Failed'
-            | (
-                Q(scheduled_date__lt=current_date)
-                & (Q(email_status="Failed") | Q(email_status="Pending"))
-            )  # Condition 2: Records where date is in past and status is 'Failed' or 'Pending'
+    Failed schedules get a retry row in the outbox in the same transaction as their
+    status change, so a failure can never be forgotten. Every outbox row of a schedule
+    is one attempt: the retry after attempt n waits EMAIL_RETRY_DELAY * 2 ** (n - 1)
+    minutes, and a schedule that failed EMAIL_MAX_ATTEMPTS times stays Failed.
+    Suppressed schedules are final and are not retried. Every change is also queued for
+    the webhook subscribers.
+
+    Parameters:
+    sent_ids (list): The IDs of the schedules that were sent.
+    failed_ids (list): The IDs of the schedules that failed.
+    suppressed_ids (list): The IDs of the schedules skipped due to the suppression list.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        if sent_ids:
+            EmailSchedule.objects.filter(id__in=sent_ids).update(
+                email_status="Done", updated_at=now
+            )
+        if failed_ids:
+            EmailSchedule.objects.filter(id__in=failed_ids).update(
+                email_status="Failed", updated_at=now
+            )
+            EmailOutbox.objects.bulk_create(retry_rows(failed_ids, now))
+        if suppressed_ids:
+            EmailSchedule.objects.filter(id__in=suppressed_ids).update(
+                email_status="Suppressed", updated_at=now
+            )
+        queued = queue_events(
+            [
+                *((schedule_id, "Done") for schedule_id in sent_ids),
+                *((schedule_id, "Failed") for schedule_id in failed_ids),
+                *((schedule_id, "Suppressed") for schedule_id in suppressed_ids),
+            ]
         )
-        for schedule in email_schedules:
-            email_response = email_handler(schedule.user.email)
-            if email_response.get("status"):
-                schedule.email_status = "Done"
-                return "Email sent sucessfully."
-            else:
-                schedule.email_status = "Failed"
-                return "Email sent failed."
-    except Exception as e:
-        return "Failed to resend email:" + str(e)
-    finally:
-        if schedule:
-            schedule.save()
+        if queued:
+            transaction.on_commit(lambda: schedule_webhook_delivery(queued))
+    emails_total.inc("sent", amount=len(sent_ids))
+    emails_total.inc("failed", amount=len(failed_ids))
+    emails_total.inc("suppressed", amount=len(suppressed_ids))
+    api_cache.bump(
+        "schedules",
+        *(
+            f"schedule:{schedule_id}"
+            for schedule_id in (*sent_ids, *failed_ids, *suppressed_ids)
+        ),
+    )
+
+
+def retry_rows(failed_ids, now):
+    """
+    Build the outbox rows retrying the given failed schedules, with exponential backoff.
+
+    Returns:
+    list: Unsaved EmailOutbox rows, none for schedules out of attempts.
+    """
+    attempts = dict(
+        EmailOutbox.objects.filter(schedule_id__in=failed_ids)
+        .values("schedule_id")
+        .annotate(attempts=Count("id"))
+        .values_list("schedule_id", "attempts")
+    )
+    rows = []
+    for schedule_id, shard in EmailSchedule.objects.filter(
+        id__in=failed_ids
+    ).values_list("id", "shard"):
+        attempt = max(attempts.get(schedule_id, 0), 1)
+        if attempt >= int(settings.EMAIL_MAX_ATTEMPTS):
+            continue
+        delay = int(settings.EMAIL_RETRY_DELAY) * 2 ** (attempt - 1)
+        rows.append(
+            EmailOutbox(
+                schedule_id=schedule_id,
+                shard=shard,
+                available_at=now + timedelta(minutes=delay),
+            )
+        )
+    return rows
 
 
-def email_handler(email):
+def schedule_webhook_delivery(queued):
+    """
+    Function to ask for a webhook delivery once the events just queued have settled.
+
+    The delivery runs WEBHOOK_FLUSH_MS plus WEBHOOK_COMMIT_LAG_MS later. Only the first
+    call within WEBHOOK_FLUSH_MS publishes a task, so the events queued meanwhile are
+    coalesced into the same batches; a full batch does not wait for the flush delay.
+    The first call is picked with a conditional UPDATE of `delivery_scheduled_at`, which
+    holds across processes whatever the cache backend.
+
+    Parameters:
+    queued (int): The number of events just queued.
+    """
+    lag = int(settings.WEBHOOK_COMMIT_LAG_MS) / 1000
+    if queued >= int(settings.WEBHOOK_BATCH_SIZE):
+        deliver_webhooks.apply_async(countdown=lag)
+        return
+    flush = int(settings.WEBHOOK_FLUSH_MS) / 1000
+    now = timezone.now()
+    scheduled = (
+        WebhookSubscription.objects.filter(active=True)
+        .filter(
+            Q(delivery_scheduled_at__isnull=True)
+            | Q(delivery_scheduled_at__lte=now - timedelta(seconds=flush))
+        )
+        .update(delivery_scheduled_at=now)
+    )
+    if scheduled:
+        deliver_webhooks.apply_async(countdown=flush + lag)
+
+
+@shared_task
+def deliver_webhooks():
+    """
+    Function to push the pending status change events to every due subscriber.
+
+    Each subscriber is leased with `user.webhooks.claim` and posted to outside any
+    transaction, so concurrent runs never post to the same subscriber and a slow
+    subscriber does not hold the others back. Subscribers in backoff are skipped until
+    `retry_at`.
+
+    Returns:
+    int: The number of events delivered.
+    """
+
+    now = timezone.now()
+    subscription_ids = list(
+        WebhookSubscription.objects.filter(active=True)
+        .filter(Q(retry_at__isnull=True) | Q(retry_at__lte=now))
+        .values_list("id", flat=True)
+    )
+    delivered = 0
+    for subscription_id in subscription_ids:
+        subscription = claim(subscription_id)
+        if subscription is not None:
+            delivered += deliver(subscription)
+    purge_delivered_events()
+    return delivered
+
+
+def email_handler(email, schedule_id=None):
     """
     Function to handle sending email using Django's send_mail function.
 
     Parameters:
     email (str): The email address of the recipient.
+    schedule_id (int, optional): The schedule being sent; its HTML alternative then
+        carries the open pixel and tracked links (see `user.tracking`).
 
     Returns:
     dict: A dictionary containing the status of the email sending process.
@@ -106,15 +541,232 @@ def email_handler(email):
         user_email = email
         mail_subject = "Email Sender System"
         mail_content = "This is a mail send from Email Sender System"
-        send_mail(
-            subject=mail_subject,
-            message=mail_content,
-            from_email=host_email,
-            recipient_list=[user_email],
-            fail_silently=False,
-        )
+        html_message = None
+        if schedule_id is not None:
+            html, links = tracked_html(mail_content)
+            html_message = fill_placeholders(
+                html, tracking_substitutions(schedule_id, links)
+            )
+        with timed(email_send_seconds, "single"):
+            send_mail(
+                subject=mail_subject,
+                message=mail_content,
+                from_email=host_email,
+                recipient_list=[user_email],
+                fail_silently=False,
+                html_message=html_message,
+            )
         return {"status": True, "message": "Email sent sucessfully"}
     except BadHeaderError:
+        email_failures_total.inc("bad_header")
         return {"status": False, "message": "Error while sending email"}
     except Exception as e:
+        email_failures_total.inc(type(e).__name__)
         return {"status": False, "message": "Error while sending email"}
+
+
+def bulk_email_handler(recipients, track=False):
+    """
+    Function to send one email per recipient over a single backend connection.
+
+    Backends that report a per-message status (such as the HTTP API backends in
+    `utils.email_backends`) receive all messages at once so they can pack them into
+    batched calls. Other backends, such as SMTP, send the messages one by one over
+    the same open connection so that a failure only affects its own recipient.
+
+    With `track`, the keys are schedule ids and every message gets the HTML alternative
+    of `user.tracking.tracked_html`. Its placeholders are sent as substitutions to
+    backends that report a per-message status, and filled in here for the others.
+
+    Parameters:
+    recipients (list): Tuples of (key, email, substitutions) for every recipient.
+    track (bool): Add the open pixel and tracked links, keyed by schedule id.
+
+    Returns:
+    dict: A mapping of key to a dict with the same shape as `email_handler` returns,
+        plus `bounced` (bool) when the server permanently refused the recipient and, for
+        the delivery log, `latency_ms`, the SMTP reply `code` and the API's `relay_id`.
+    """
+    host_email = settings.EMAIL_HOST_USER
+    mail_subject = "Email Sender System"
+    mail_content = "This is a mail send from Email Sender System"
+    results = {}
+    messages = []
+    connection = get_connection(fail_silently=True)
+    substitutes = getattr(connection, "reports_message_status", False)
+    if track:
+        html, links = tracked_html(mail_content)
+    for key, email, substitutions in recipients:
+        message = EmailMultiAlternatives(
+            subject=mail_subject,
+            body=mail_content,
+            from_email=host_email,
+            to=[email],
+        )
+        if track:
+            substitutions = {**substitutions, **tracking_substitutions(key, links)}
+            message.attach_alternative(
+                html if substitutes else fill_placeholders(html, substitutions),
+                "text/html",
+            )
+        message.key = key
+        message.substitutions = substitutions
+        messages.append(message)
+    if not messages:
+        return results
+
+    if substitutes:
+        started = time.perf_counter()
+        connection.send_messages(messages)
+        elapsed = time.perf_counter() - started
+        email_send_seconds.observe(elapsed, "api")
+        latency_ms = int(elapsed * 1000)
+        for message in messages:
+            status = getattr(message, "send_status", False)
+            response = getattr(message, "send_response", "Error while sending email")
+            results[message.key] = {
+                "status": status,
+                "message": "Email sent sucessfully" if status else response,
+                "latency_ms": latency_ms,
+                "relay_id": response if status else "",
+            }
+        return results
+
+    connection.fail_silently = False
+    try:
+        with timed(smtp_connect_seconds):
+            connection.open()
+    except Exception as e:
+        email_failures_total.inc(f"connect_{type(e).__name__}", amount=len(messages))
+        return {
+            message.key: {"status": False, "message": "Error while sending email"}
+            for message in messages
+        }
+    try:
+        for message in messages:
+            started = time.perf_counter()
+            try:
+                connection.send_messages([message])
+                results[message.key] = {
+                    "status": True,
+                    "message": "Email sent sucessfully",
+                    "code": 250,
+                }
+            except SMTPRecipientsRefused as e:
+                codes = [code for code, _ in e.recipients.values()]
+                results[message.key] = {
+                    "status": False,
+                    "bounced": all(code >= 500 for code in codes),
+                    "message": "Recipient refused",
+                    "code": codes[0] if codes else None,
+                }
+                email_failures_total.inc(
+                    "bounced" if results[message.key]["bounced"] else "refused"
+                )
+            except SMTPResponseException as e:
+                results[message.key] = {
+                    "status": False,
+                    "message": "Error while sending email",
+                    "code": e.smtp_code,
+                }
+                email_failures_total.inc(f"smtp_{e.smtp_code}")
+            except Exception as e:
+                results[message.key] = {
+                    "status": False,
+                    "message": "Error while sending email",
+                }
+                email_failures_total.inc(type(e).__name__)
+            elapsed = time.perf_counter() - started
+            email_send_seconds.observe(elapsed, "smtp")
+            results[message.key]["latency_ms"] = int(elapsed * 1000)
+    finally:
+        connection.close()
+    return results
+
+
+@shared_task(bind=True)
+def purge_user(self, user_id):
+    """
+    Function to remove a soft-deleted user and its schedules in bounded chunks.
+
+    Schedules are deleted PURGE_CHUNK_SIZE at a time, each chunk in its own short
+    transaction, so no long transaction holds locks and at most one chunk is loaded into
+    memory. Progress is reported as the PROGRESS state of the task and recorded in the
+    user's `purge_queued_at`, so the purge is not queued again while it runs. Users that are
+    not soft-deleted are left alone.
+
+    Parameters:
+    user_id (int): The ID of the soft-deleted user.
+
+    Returns:
+    dict: The number of deleted schedules and whether the user row was deleted.
+    """
+
+    if not User.all_objects.filter(pk=user_id, deleted_at__isnull=False).exists():
+        return {"deleted_schedules": 0, "user_deleted": False}
+    chunk_size = int(settings.PURGE_CHUNK_SIZE)
+    deleted, last_id = 0, 0
+    while True:
+        ids = list(
+            EmailSchedule.objects.filter(user_id=user_id, id__gt=last_id)
+            .order_by("id")
+            .values_list("id", flat=True)[:chunk_size]
+        )
+        if not ids:
+            break
+        # A regular delete of the chunk, so the outbox rows cascade and post_delete
+        # bumps the cache of every schedule; the chunk bounds what it loads.
+        with transaction.atomic():
+            EmailSchedule.objects.filter(pk__in=ids).delete()
+            User.all_objects.filter(pk=user_id).update(purge_queued_at=timezone.now())
+        deleted += len(ids)
+        last_id = ids[-1]
+        self.update_state(state="PROGRESS", meta={"deleted_schedules": deleted})
+        if len(ids) < chunk_size:
+            break
+    User.all_objects.filter(pk=user_id, deleted_at__isnull=False).delete()
+    return {"deleted_schedules": deleted, "user_deleted": True}
+
+
+@shared_task
+def purge_deleted_users():
+    """
+    Function to queue `purge_user` for every soft-deleted user that is still present,
+    e.g. because its purge task was lost.
+
+    A purge that was queued or made progress within PURGE_REQUEUE_SECONDS is left alone,
+    and each user is claimed with a conditional UPDATE of `purge_queued_at`, so running
+    or queued purges never get a second job competing for the same chunks.
+
+    Returns:
+    int: The number of purge tasks queued.
+    """
+
+    now = timezone.now()
+    idle = Q(purge_queued_at__isnull=True) | Q(
+        purge_queued_at__lt=now - timedelta(seconds=int(settings.PURGE_REQUEUE_SECONDS))
+    )
+    deleted_users = User.all_objects.filter(idle, deleted_at__isnull=False)
+    queued = 0
+    for user_id in list(deleted_users.values_list("id", flat=True)):
+        if deleted_users.filter(pk=user_id).update(purge_queued_at=now):
+            purge_user.delay(user_id)
+            queued += 1
+    return queued
+
+
+@shared_task
+def archive_completed_schedules():
+    """
+    Function to move old completed schedules to the history table and apply the
+    history retention, see `user.archive`.
+
+    Returns:
+    str: A message with the number of archived and purged rows.
+    """
+
+    archived = archive_schedules()
+    purged = purge_history()
+    return (
+        f"{archived} schedule(s) archived, {purged} history row(s)/partition(s) purged."
+    )
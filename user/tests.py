@@ -1,3 +1,1709 @@
-from django.test import TestCase
+import asyncio
+import contextvars
+import csv
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time as clock
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models.signals import post_delete
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+
+from email_sender_system.celery import app
+from utils.cache import api_cache
+from utils.custom_response import APIResponse
+from utils.db_router import (
+    ReplicaStickinessMiddleware,
+    pin_primary,
+    read_from_replica,
+)
+from utils.metrics import (
+    MetricsMiddleware,
+    http_request_seconds,
+    parse_identity,
+    registry,
+)
+from utils.profiling import RATE_CACHE_KEY, ProfilingMiddleware, profiler
+from utils.querybudget import QueryBudgetMiddleware, budget_for, count_queries
+from utils.renderers import ORJSONRenderer
+
+from .archive import archive_schedules, purge_history
+from .delivery import delivery_log
+from .dispatch import ShardDispatcher
+from .importers import _taken_emails, import_users, iter_rows
+from .metrics import email_send_seconds, emails_total
+from .models import (
+    Campaign,
+    DeliveryAttempt,
+    DispatchLease,
+    DispatchNode,
+    EmailEngagement,
+    EmailOutbox,
+    EmailSchedule,
+    EmailScheduleHistory,
+    RecurringSchedule,
+    Suppression,
+    User,
+    WebhookEvent,
+    WebhookSubscription,
+)
+from .recurrence import expand_recurring
+from .suppression import SuppressionFilter
+from .tasks import (
+    deliver_webhooks,
+    dispatch_campaigns,
+    purge_deleted_users,
+    purge_user,
+    record_send_results,
+    relay_outbox,
+    schedule_webhook_delivery,
+    send_scheduled_email,
+    send_scheduled_email_batch,
+)
+from .tracking import (
+    click_url,
+    engagement_buffer,
+    fill_placeholders,
+    make_token,
+    open_pixel_url,
+    tracked_html,
+    tracking_substitutions,
+    upsert_engagement,
+)
+from .urls import urlpatterns
+from .webhooks import sign
+
+
+def tearDownModule():
+    # Write the attempts and tracking hits still buffered by the tests while the test
+    # database exists, instead of at exit.
+    delivery_log.flush()
+    engagement_buffer.flush()
+
+
+class MockSendGridHandler(BaseHTTPRequestHandler):
+    """
+    Minimal stand-in for the SendGrid `mail/send` endpoint that records every payload.
+    """
+
+    protocol_version = "HTTP/1.1"
+    payloads = []
+    # Statuses answered to the next calls, 202 once exhausted.
+    statuses = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.payloads.append(json.loads(body))
+        self.send_response(self.statuses.pop(0) if self.statuses else 202)
+        self.send_header("X-Message-Id", "mock-id")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class SendGridBackendTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), MockSendGridHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.api_url = f"http://127.0.0.1:{cls.server.server_port}/v3/mail/send"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def test_batch_is_packed_into_api_calls(self):
+        MockSendGridHandler.payloads = []
+        User.objects.bulk_create(
+            User(name=f"user{i}", email=f"user{i}@example.com") for i in range(5)
+        )
+        users = User.objects.order_by("id")
+        schedules = [
+            EmailSchedule.objects.create(
+                user=user, scheduled_time="08:00", scheduled_date="2030-01-01"
+            )
+            for user in users
+        ]
+        with override_settings(
+            EMAIL_BACKEND="utils.email_backends.SendGridEmailBackend",
+            SENDGRID_API_URL=self.api_url,
+            EMAIL_BATCH_SIZE=3,
+        ):
+            send_scheduled_email_batch([schedule.id for schedule in schedules])
+
+        self.assertEqual(len(MockSendGridHandler.payloads), 2)
+        self.assertEqual(
+            [len(p["personalizations"]) for p in MockSendGridHandler.payloads], [3, 2]
+        )
+        # The tracking URLs travel as substitutions of one shared HTML template.
+        substitutions = MockSendGridHandler.payloads[0]["personalizations"][0][
+            "substitutions"
+        ]
+        self.assertEqual(
+            substitutions,
+            {"-name-": "user0", "-open_pixel-": open_pixel_url(schedules[0].id)},
+        )
+        self.assertIn(
+            '<img src="-open_pixel-"',
+            MockSendGridHandler.payloads[0]["content"][1]["value"],
+        )
+        self.assertEqual(
+            EmailSchedule.objects.filter(email_status="Done").count(), len(schedules)
+        )
+
+        delivery_log.flush()
+        attempts = DeliveryAttempt.objects.filter(
+            schedule_id__in=[schedule.id for schedule in schedules]
+        )
+        self.assertEqual(
+            sorted(attempts.values_list("status", "relay_id")),
+            [(DeliveryAttempt.STATUS_CODES["Sent"], "mock-id")] * len(schedules),
+        )
+
+    def send_one(self, *statuses):
+        MockSendGridHandler.payloads = []
+        MockSendGridHandler.statuses = list(statuses)
+        user = User.objects.create(name="retry", email="retry@example.com")
+        schedule = EmailSchedule.objects.create(
+            user=user, scheduled_time="08:00", scheduled_date="2030-01-01"
+        )
+        with override_settings(
+            EMAIL_BACKEND="utils.email_backends.SendGridEmailBackend",
+            SENDGRID_API_URL=self.api_url,
+        ):
+            send_scheduled_email_batch([schedule.id])
+        schedule.refresh_from_db()
+        return schedule
+
+    def test_throttled_batch_is_retried(self):
+        schedule = self.send_one(429)
+        self.assertEqual(len(MockSendGridHandler.payloads), 2)
+        self.assertEqual(schedule.email_status, "Done")
+
+    def test_server_error_is_not_posted_again(self):
+        # A 5xx may come after the batch was accepted; re-posting could send it twice.
+        schedule = self.send_one(503)
+        self.assertEqual(len(MockSendGridHandler.payloads), 1)
+        self.assertEqual(schedule.email_status, "Failed")
+
+
+class OutboxTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(name="user", email="user@example.com")
+
+    def create_schedule(self, scheduled_date=date(2020, 1, 1)):
+        return EmailSchedule.objects.create(
+            user=self.user, scheduled_time=time(8), scheduled_date=scheduled_date
+        )
+
+    def test_orm_created_schedule_gets_its_outbox_row(self):
+        schedule = self.create_schedule()
+        row = EmailOutbox.objects.get()
+        self.assertEqual(
+            (row.schedule_id, row.shard, row.available_at),
+            (schedule.id, schedule.shard, schedule.scheduled_at),
+        )
+        schedule.save()
+        self.assertEqual(EmailOutbox.objects.count(), 1)
+
+    def test_schedules_without_outbox_rows_are_backfilled(self):
+        pending, failed, done = (self.create_schedule() for _ in range(3))
+        EmailOutbox.objects.all().delete()
+        EmailSchedule.objects.filter(pk=failed.pk).update(email_status="Failed")
+        EmailSchedule.objects.filter(pk=done.pk).update(email_status="Done")
+
+        call_command("backfill_outbox", batch_size=1, stdout=io.StringIO())
+        call_command("backfill_outbox", stdout=io.StringIO())
+        self.assertEqual(
+            sorted(EmailOutbox.objects.values_list("schedule_id", flat=True)),
+            [pending.id, failed.id],
+        )
+
+    def test_schedule_is_not_stored_without_its_outbox_row(self):
+        with mock.patch.object(EmailOutbox, "save", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.create_schedule()
+        self.assertFalse(EmailSchedule.objects.exists())
+
+    def test_relay_publishes_due_rows_once(self):
+        due = self.create_schedule()
+        self.create_schedule(scheduled_date=date(2999, 1, 1))
+        with mock.patch.object(send_scheduled_email_batch, "apply_async") as publish:
+            self.assertEqual(relay_outbox(), 1)
+            self.assertEqual(relay_outbox(), 0)
+        self.assertEqual(publish.call_count, 1)
+        self.assertEqual(publish.call_args.kwargs["args"], [[due.id]])
+        self.assertEqual(
+            EmailOutbox.objects.filter(published_at__isnull=True).count(), 1
+        )
+
+    @override_settings(EMAIL_LIMIT=2)
+    def test_trigger_queues_the_relay(self):
+        self.create_schedule()
+        with mock.patch.object(relay_outbox, "apply_async") as queue:
+            queue.return_value.id = "relay-task"
+            response = self.client.post(reverse("user:trigger-emails"))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["data"], {"task_id": "relay-task"})
+        self.assertEqual(queue.call_args.kwargs["kwargs"], {"window_minutes": 120})
+        self.assertEqual(
+            EmailOutbox.objects.filter(published_at__isnull=True).count(), 1
+        )
+
+    @override_settings(EMAIL_MAX_ATTEMPTS=3, EMAIL_RETRY_DELAY=5)
+    def test_failed_sends_back_off_until_out_of_attempts(self):
+        schedule = self.create_schedule()
+        delays = []
+        for _ in range(3):
+            before = datetime.now(timezone.utc)
+            record_send_results([], [schedule.id])
+            latest = EmailOutbox.objects.latest("id")
+            delays.append(round((latest.available_at - before).total_seconds() / 60))
+        self.assertEqual(EmailOutbox.objects.count(), 3)
+        self.assertEqual(delays, [5, 10, 10])
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.email_status, "Failed")
+
+
+@override_settings(DISPATCH_SHARDS=4)
+class ShardDispatcherTest(TestCase):
+    def test_nodes_rebalance_to_a_fair_share(self):
+        first, second = ShardDispatcher("first"), ShardDispatcher("second")
+        self.assertEqual(first.claim(), [0, 1, 2, 3])
+        # The leases of the first node are still valid, so the second one waits...
+        self.assertEqual(second.claim(), [])
+        # ...until the first node sees it and gives up the shards above its share.
+        self.assertEqual(first.claim(), [0, 1])
+        self.assertEqual(second.claim(), [2, 3])
+        second.release()
+        self.assertEqual(first.claim(), [0, 1, 2, 3])
+
+    def test_expired_leases_are_taken_over(self):
+        dead, alive = ShardDispatcher("dead"), ShardDispatcher("alive")
+        dead.claim()
+        self.assertEqual(alive.claim(), [])
+        past = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        DispatchLease.objects.update(expires_at=past)
+        DispatchNode.objects.filter(node_id="dead").update(heartbeat_at=past)
+        self.assertEqual(alive.claim(), [0, 1, 2, 3])
+        self.assertEqual(
+            set(DispatchLease.objects.values_list("owner", flat=True)), {"alive"}
+        )
+
+    def test_rows_of_dropped_shards_are_relayed_with_shard_zero(self):
+        user = User.objects.create(name="user", email="user@example.com")
+        EmailSchedule.objects.create(
+            user=user, scheduled_time=time(8), scheduled_date=date(2020, 1, 1)
+        )
+        # Written while DISPATCH_SHARDS was 8.
+        EmailOutbox.objects.update(shard=6)
+        DispatchLease.objects.create(shard=6, owner="", expires_at="2020-01-01T00:00Z")
+        dispatcher = ShardDispatcher("node")
+        with mock.patch.object(send_scheduled_email_batch, "apply_async"):
+            self.assertEqual(dispatcher.run_once(), 1)
+        self.assertEqual(dispatcher.shards, [0, 1, 2, 3])
+        self.assertFalse(DispatchLease.objects.filter(shard=6).exists())
+
+
+class SuppressionTest(TestCase):
+    def test_rows_committed_out_of_order_are_loaded(self):
+        suppression = SuppressionFilter(refresh_seconds=0, margin_seconds=300)
+        Suppression.objects.create(id=10, email="first@example.com")
+        self.assertEqual(
+            suppression.suppressed(["first@example.com"]), {"first@example.com"}
+        )
+        # A row with a lower id and an earlier timestamp whose transaction only
+        # committed after the last refresh.
+        late = Suppression.objects.create(id=5, email="Late@example.com")
+        Suppression.objects.filter(pk=late.pk).update(
+            created_at=suppression.loaded_at - timedelta(seconds=60)
+        )
+        self.assertEqual(
+            suppression.suppressed(["late@example.com", "other@example.com"]),
+            {"late@example.com"},
+        )
+        # Rows read again by the overlapping refreshes are not counted twice.
+        self.assertEqual(len(suppression.bloom), 2)
+
+    def test_suppressed_recipients_are_not_sent(self):
+        Suppression.objects.create(email="blocked@example.com", reason="Unsubscribe")
+        blocked = User.objects.create(name="blocked", email="Blocked@example.com")
+        allowed = User.objects.create(name="allowed", email="allowed@example.com")
+        ids = [
+            EmailSchedule.objects.create(
+                user=user, scheduled_time=time(8), scheduled_date=date(2030, 1, 1)
+            ).id
+            for user in (blocked, allowed)
+        ]
+        with mock.patch("user.suppression._filter", None), self.settings(
+            EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend"
+        ):
+            send_scheduled_email_batch(ids)
+        self.assertEqual(
+            dict(EmailSchedule.objects.values_list("user_id", "email_status")),
+            {blocked.id: "Suppressed", allowed.id: "Done"},
+        )
+        self.assertEqual(
+            [message.to for message in mail.outbox], [["allowed@example.com"]]
+        )
+        # Suppressed schedules are final and get no retry row.
+        self.assertEqual(EmailOutbox.objects.count(), 2)
+
+        # A redelivered batch does not send them once the address is unsuppressed.
+        Suppression.objects.all().delete()
+        with mock.patch("user.suppression._filter", None), self.settings(
+            EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend"
+        ):
+            send_scheduled_email_batch(ids)
+            send_scheduled_email(ids[0])
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(
+            EmailSchedule.objects.get(user=blocked).email_status, "Suppressed"
+        )
+
+
+class ImportTest(TestCase):
+    def setUp(self):
+        api_cache.clear()
+        self.user = User.objects.create(name="taken", email="taken@example.com")
+
+    def test_user_import_reports_rejected_rows(self):
+        rows = [
+            {"name": "a", "email": "a@example.com"},
+            {"name": "taken", "email": "taken@example.com"},
+            {"name": "again", "email": "a@example.com"},
+            {"name": "b", "email": "not-an-email"},
+            "not json",
+            {"name": "c", "email": "c@example.com", "phone_number": ""},
+        ]
+        body = "\n".join(
+            row if isinstance(row, str) else json.dumps(row) for row in rows
+        )
+        # The name says nothing about the format; file_format does.
+        response = self.client.post(
+            reverse("user:user-import") + "?file_format=ndjson",
+            {"file": ContentFile(body.encode(), name="users.txt")},
+        )
+        self.assertEqual(response.status_code, 200)
+        report = response.json()["data"]
+        self.assertEqual((report["created"], report["failed"]), (2, 4))
+        self.assertEqual([error["row"] for error in report["errors"]], [2, 3, 4, 5])
+        self.assertEqual(
+            sorted(User.objects.values_list("email", flat=True)),
+            ["a@example.com", "c@example.com", "taken@example.com"],
+        )
+
+    def test_emails_stored_during_the_import_are_reported(self):
+        def racing(emails):
+            # Another writer stores the email right after the duplicate check.
+            if not User.objects.filter(email="raced@example.com").exists():
+                User.objects.create(name="other", email="raced@example.com")
+                return set()
+            return _taken_emails(emails)
+
+        upload = ContentFile(
+            b"name,email\nraced,raced@example.com\nok,ok@example.com\n"
+        )
+        with mock.patch("user.importers._taken_emails", side_effect=racing):
+            report = import_users(iter_rows(upload, "csv"))
+        self.assertEqual((report["created"], report["failed"]), (1, 1))
+        self.assertEqual(report["errors"][0]["row"], 1)
+        self.assertEqual(User.objects.filter(name="ok").count(), 1)
+
+    def test_schedule_import_writes_outbox_rows(self):
+        body = (
+            "user,scheduled_date,scheduled_time\n"
+            f"{self.user.pk},2030-01-02,09:00\n"
+            "999999,2030-01-02,09:00\n"
+        )
+        response = self.client.post(
+            reverse("user:schedule-import"),
+            {"file": ContentFile(body.encode(), name="schedules.csv")},
+        )
+        report = response.json()["data"]
+        self.assertEqual((report["created"], report["failed"]), (1, 1))
+        self.assertEqual(report["errors"][0]["row"], 2)
+        self.assertEqual(
+            list(EmailOutbox.objects.values_list("schedule__user_id", flat=True)),
+            [self.user.pk],
+        )
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class ExportTest(TestCase):
+    def setUp(self):
+        User.objects.bulk_create(
+            User(name=f"user{i}", email=f"user{i}@example.com") for i in range(5)
+        )
+        for index, user in enumerate(User.objects.order_by("id")):
+            EmailSchedule.objects.create(
+                user=user,
+                scheduled_time=time(8),
+                scheduled_date=date(2030, 1, 1),
+                email_status="Done" if index % 2 else "Pending",
+            )
+
+    def download(self, name, **params):
+        response = self.client.get(reverse(f"user:{name}"), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_users_csv(self):
+        response, body = self.download("user-export")
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn('filename="users.csv"', response["Content-Disposition"])
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(
+            rows[0],
+            [
+                "id",
+                "name",
+                "email",
+                "phone_number",
+                "date_of_birth",
+                "created_at",
+                "updated_at",
+            ],
+        )
+        self.assertEqual(
+            [row[2] for row in rows[1:]], [f"user{i}@example.com" for i in range(5)]
+        )
+
+    def test_schedules_ndjson(self):
+        response, body = self.download(
+            "schedule-export", file_format="ndjson", status="Done"
+        )
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(
+            [(row["user_email"], row["email_status"]) for row in rows],
+            [("user1@example.com", "Done"), ("user3@example.com", "Done")],
+        )
+        self.assertEqual(rows[0]["scheduled_date"], "2030-01-01")
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.get(reverse("user:user-export"), {"file_format": "xml"})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(API_CACHE_ENABLED=False)
+class KeysetPaginationTest(TestCase):
+    def seed(self, users, schedules_per_user):
+        User.objects.bulk_create(
+            User(name=f"user{i}", email=f"user{i}@example.com") for i in range(users)
+        )
+        EmailSchedule.objects.bulk_create(
+            EmailSchedule(
+                user=user, scheduled_time="08:00", scheduled_date="2030-01-01"
+            )
+            for user in User.objects.all()
+            for _ in range(schedules_per_user)
+        )
+
+    def walk(self, url, page_size):
+        rows, cursor = [], None
+        while True:
+            params = {"page_size": page_size}
+            if cursor:
+                params["cursor"] = cursor
+            with self.assertNumQueries(1):
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()["data"]
+            self.assertLessEqual(len(data["results"]), page_size)
+            rows.extend(data["results"])
+            cursor = data["next_cursor"]
+            if not cursor:
+                return rows
+
+    @override_settings(API_MAX_PAGE_SIZE=50)
+    def test_pages_cost_one_query_at_any_size(self):
+        for users, schedules_per_user in ((3, 1), (20, 3)):
+            with self.subTest(users=users, schedules_per_user=schedules_per_user):
+                EmailSchedule.objects.all().delete()
+                User.objects.all().delete()
+                self.seed(users, schedules_per_user)
+
+                listed_users = self.walk(reverse("user:user-create"), page_size=7)
+                self.assertEqual(
+                    [row["id"] for row in listed_users],
+                    list(User.objects.order_by("id").values_list("id", flat=True)),
+                )
+                listed_schedules = self.walk(
+                    reverse("user:schedule-create"), page_size=7
+                )
+                self.assertEqual(len(listed_schedules), users * schedules_per_user)
+                self.assertIn("email", listed_schedules[0]["user"])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse("user:user-create"), {"cursor": "garbage"})
+        self.assertEqual(response.status_code, 400)
+
+
+class ScheduleFilterTest(TestCase):
+    def setUp(self):
+        api_cache.clear()
+        user = User.objects.create(name="user", email="user@example.org")
+        for email_status, scheduled_date in (
+            ("Pending", "2030-01-01"),
+            ("Done", "2030-01-01"),
+            ("Pending", "2030-01-02"),
+        ):
+            EmailSchedule.objects.create(
+                user=user,
+                scheduled_time="08:00",
+                scheduled_date=scheduled_date,
+                email_status=email_status,
+            )
+
+    def list(self, **params):
+        return self.client.get(reverse("user:schedule-create"), params)
+
+    def test_single_filter_does_not_match_other_rows(self):
+        results = self.list(status="Pending").json()["data"]["results"]
+        self.assertEqual({row["email_status"] for row in results}, {"Pending"})
+        self.assertEqual(len(results), 2)
+        results = self.list(date="2030-01-02").json()["data"]["results"]
+        self.assertEqual(len(results), 1)
+
+    def test_combined_filters_and_ordering(self):
+        results = self.list(
+            status="Pending,Done",
+            scheduled_after="2030-01-01T07:00:00",
+            email_domain="example.org",
+            ordering="-scheduled",
+        ).json()["data"]["results"]
+        self.assertEqual(
+            [row["scheduled_date"] for row in results],
+            ["2030-01-02", "2030-01-01", "2030-01-01"],
+        )
+
+    def test_email_domain_is_an_equality_on_the_stored_domain(self):
+        User.objects.bulk_create([User(name="bulk", email="Bulk@Example.ORG")])
+        self.assertEqual(User.objects.get(name="bulk").email_domain, "example.org")
+        # Users stored before the column existed.
+        User.all_objects.update(email_domain="")
+        self.assertEqual(User.backfill_email_domains(batch_size=1), 2)
+        self.assertEqual(
+            set(User.objects.values_list("email_domain", flat=True)), {"example.org"}
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            results = self.list(email_domain="EXAMPLE.org").json()["data"]["results"]
+        self.assertEqual(len(results), 3)
+        self.assertIn('"email_domain" =', queries[0]["sql"])
+        self.assertNotIn("LIKE", queries[0]["sql"])
+
+    def test_invalid_filters_are_rejected(self):
+        self.assertEqual(self.list(status="Unknown").status_code, 400)
+        self.assertEqual(self.list(date="yesterday").status_code, 400)
+        self.assertEqual(self.list(ordering="name").status_code, 400)
+
+
+class ReadThroughCacheTest(TestCase):
+    def setUp(self):
+        api_cache.clear()
+        self.user = User.objects.create(name="user", email="user@example.com")
+        self.schedule = EmailSchedule.objects.create(
+            user=self.user, scheduled_time="08:00", scheduled_date="2030-01-01"
+        )
+
+    def test_repeated_reads_skip_the_database(self):
+        url = reverse("user:schedule-detail", args=[self.schedule.pk])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        # Only the primary key lookup of the ETag versions remains.
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.get(reverse("user:schedule-create"))
+        with self.assertNumQueries(0):
+            self.client.get(reverse("user:schedule-create"))
+        self.assertGreater(api_cache.get_stats()["hit_ratio"], 0)
+
+    def test_pinned_list_reads_skip_the_cache(self):
+        listing = reverse("user:user-create")
+        self.client.get(listing)
+        # A change the cache does not know about, like a replica lagging behind it.
+        User.objects.update(name="renamed")
+        names = lambda: [
+            row["name"] for row in self.client.get(listing).json()["data"]["results"]
+        ]
+        self.assertEqual(names(), ["user"])
+        self.client.cookies["db_pin_primary"] = "1"
+        self.assertEqual(names(), ["renamed"])
+
+    def test_cached_list_pages_are_built_from_the_primary(self):
+        for listing in (reverse("user:user-create"), reverse("user:schedule-create")):
+            with mock.patch(
+                "user.views.read_from_replica", wraps=read_from_replica
+            ) as replica:
+                self.client.get(listing)
+                self.assertFalse(replica.called)
+                with override_settings(API_CACHE_ENABLED=False):
+                    self.client.get(listing)
+                self.assertTrue(replica.called)
+
+    def test_writes_invalidate_dependent_entries(self):
+        detail = reverse("user:schedule-detail", args=[self.schedule.pk])
+        listing = reverse("user:schedule-create")
+        self.client.get(detail)
+        self.client.get(listing)
+        self.user.name = "renamed"
+        self.user.save()
+        self.assertEqual(
+            self.client.get(detail).json()["data"]["user"]["name"], "renamed"
+        )
+        self.assertEqual(
+            self.client.get(listing).json()["data"]["results"][0]["user"]["name"],
+            "renamed",
+        )
+        EmailSchedule.objects.filter(pk=self.schedule.pk).update(email_status="Done")
+        api_cache.bump(f"schedule:{self.schedule.pk}", "schedules")
+        self.assertEqual(self.client.get(detail).json()["data"]["email_status"], "Done")
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        api_cache.clear()
+        self.user = User.objects.create(name="user", email="user@example.com")
+        self.schedule = EmailSchedule.objects.create(
+            user=self.user, scheduled_time="08:00", scheduled_date="2030-01-01"
+        )
+
+    def test_matching_etag_returns_not_modified(self):
+        for url in (
+            reverse("user:user-detail", args=[self.user.pk]),
+            reverse("user:user-create"),
+            reverse("user:schedule-detail", args=[self.schedule.pk]),
+            reverse("user:schedule-create"),
+        ):
+            with self.subTest(url=url):
+                etag = self.client.get(url)["ETag"]
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b"")
+
+    @override_settings(API_CACHE_ENABLED=False)
+    def test_lists_have_no_etag_without_the_shared_cache(self):
+        for url in (reverse("user:user-create"), reverse("user:schedule-create")):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH="*")
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(response.has_header("ETag"))
+        detail = reverse("user:user-detail", args=[self.user.pk])
+        self.assertTrue(self.client.get(detail).has_header("ETag"))
+
+    def test_writes_change_the_etag(self):
+        detail = reverse("user:schedule-detail", args=[self.schedule.pk])
+        listing = reverse("user:schedule-create")
+        etags = {url: self.client.get(url)["ETag"] for url in (detail, listing)}
+        self.user.name = "renamed"
+        self.user.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response["ETag"], etag)
+
+
+class ResponseEnvelopeTest(TestCase):
+    payload = {
+        "aware": datetime(2030, 1, 1, 8, 30, 15, 250000, tzinfo=timezone.utc),
+        "naive": datetime(2030, 1, 1, 8, 30),
+        "day": date(2030, 1, 1),
+        "at": time(8, 30),
+        "amount": Decimal("12.50"),
+        "nested": {1: [Decimal("0.1")]},
+    }
+
+    def test_orjson_matches_the_drf_encoder(self):
+        self.assertEqual(
+            json.loads(ORJSONRenderer().render(self.payload)),
+            json.loads(JSONRenderer().render(self.payload)),
+        )
+        self.assertIn(
+            b'"aware":"2030-01-01T08:30:15.250000Z"',
+            ORJSONRenderer().render(self.payload),
+        )
+
+    def test_success_and_failure_envelopes(self):
+        response = APIResponse(data=self.payload, status_code=201, message="Created")
+        self.assertEqual(response.status_code, 201)
+        body = json.loads(ORJSONRenderer().render(response.data))
+        self.assertEqual(set(body), {"success", "message", "data"})
+        self.assertEqual((body["success"], body["message"]), (True, "Created"))
+        self.assertEqual(body["data"]["amount"], 12.5)
+        self.assertEqual(
+            APIResponse(action="create_user").data["message"], "Create-User Successful."
+        )
+
+        response = APIResponse(
+            status_code=400,
+            for_error=True,
+            message={"email": ["Invalid email."]},
+            errors={"email": ["Invalid email."]},
+        )
+        self.assertEqual(
+            response.data,
+            {
+                "success": False,
+                "message": "Invalid email.",
+                "data": {},
+                "errors": {"email": ["Invalid email."]},
+            },
+        )
+        response = APIResponse(status_code=500, for_error=True, general_error=True)
+        self.assertEqual(response.data["message"], settings.GENERAL_ERROR_MESSAGE)
+        self.assertNotIn("errors", response.data)
+
+    def test_api_responses_are_rendered_by_orjson(self):
+        response = self.client.get(reverse("user:user-detail", args=[999]))
+        self.assertEqual(response["Content-Type"], "application/json")
+        body = response.json()
+        self.assertEqual((body["success"], body["data"]), (False, {}))
+
+
+class AsyncListViewTest(TransactionTestCase):
+    # The async views run their queries on worker thread connections, which cannot see
+    # the uncommitted data of a TestCase transaction.
+    def setUp(self):
+        api_cache.clear()
+        user = User.objects.create(name="user", email="user@example.com")
+        EmailSchedule.objects.create(
+            user=user, scheduled_time="08:00", scheduled_date="2030-01-01"
+        )
+
+    def test_async_list_matches_sync_list(self):
+        sync = self.client.get(reverse("user:schedule-create"), {"status": "Pending"})
+        response = self.client.get(
+            reverse("user:async-schedule-list"), {"status": "Pending"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), sync.json())
+        response = self.client.get(
+            reverse("user:async-schedule-list"),
+            {"status": "Pending"},
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(reverse("user:async-user-list"), {"cursor": "x"})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(REPLICA_ALIASES=["replica1"])
+class ReplicaRouterTest(TestCase):
+    def test_reads_use_the_replica_until_a_write(self):
+        def scenario():
+            self.assertEqual(User.objects.all().db, "default")
+            with read_from_replica():
+                self.assertEqual(User.objects.all().db, "replica1")
+                User.objects.create(name="user", email="user@example.com")
+                self.assertEqual(User.objects.all().db, "default")
+
+        contextvars.Context().run(scenario)
+
+    def test_writes_set_the_sticky_primary_cookie(self):
+        response = self.client.get(reverse("user:user-create"))
+        self.assertNotIn("db_pin_primary", response.cookies)
+        response = self.client.post(
+            reverse("user:user-create"),
+            {"name": "user", "email": "user@example.com", "phone_number": "9999999999"},
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.cookies["db_pin_primary"]["max-age"], 10)
+
+    def test_stickiness_middleware_stays_async_under_asgi(self):
+        async def view(request):
+            # What a write in a sync_to_async thread does through the router.
+            await sync_to_async(pin_primary)()
+            return HttpResponse()
+
+        middleware = ReplicaStickinessMiddleware(view)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        response = asyncio.run(middleware(RequestFactory().post("/")))
+        self.assertEqual(response.cookies["db_pin_primary"]["max-age"], 10)
+
+
+@override_settings(PURGE_CHUNK_SIZE=3)
+class UserDeletionTest(TestCase):
+    def setUp(self):
+        api_cache.clear()
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, "task_always_eager", False)
+        self.user = User.objects.create(name="user", email="user@example.com")
+        self.other = User.objects.create(name="other", email="other@example.com")
+        for user in (self.user, self.user, self.user, self.user, self.other):
+            EmailSchedule.objects.create(
+                user=user, scheduled_time=time(8), scheduled_date=date(2030, 1, 1)
+            )
+
+    def test_delete_hides_the_user_and_purges_in_chunks(self):
+        detail = reverse("user:user-detail", args=[self.user.pk])
+        self.client.get(reverse("user:schedule-create"))
+        response = self.client.delete(detail)
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(response.json()["data"]["job_id"])
+        self.assertNotEqual(self.client.get(detail).status_code, 200)
+        self.assertFalse(User.all_objects.filter(pk=self.user.pk).exists())
+        self.assertEqual(EmailSchedule.objects.count(), 1)
+        self.assertEqual(EmailOutbox.objects.count(), 1)
+        results = self.client.get(reverse("user:schedule-create")).json()["data"]
+        self.assertEqual(
+            [row["user"]["id"] for row in results["results"]], [self.other.pk]
+        )
+        self.assertEqual(self.client.delete(detail).status_code, 404)
+
+    def test_purge_deletes_through_the_orm(self):
+        deleted = []
+        receiver = lambda instance, **kwargs: deleted.append(instance.pk)
+        post_delete.connect(receiver, sender=EmailSchedule)
+        self.addCleanup(post_delete.disconnect, receiver, sender=EmailSchedule)
+        ids = set(self.user.email_schedules.values_list("id", flat=True))
+        User.objects.filter(pk=self.user.pk).update(deleted_at="2030-01-01T00:00:00Z")
+        result = purge_user.apply(args=[self.user.pk]).get()
+        self.assertEqual(result, {"deleted_schedules": 4, "user_deleted": True})
+        self.assertEqual(set(deleted), ids)
+        self.assertFalse(EmailOutbox.objects.filter(schedule_id__in=ids).exists())
+
+    @override_settings(PURGE_REQUEUE_SECONDS=600)
+    def test_queued_or_running_purges_are_not_queued_again(self):
+        now = datetime.now(timezone.utc)
+        User.objects.filter(pk=self.user.pk).update(deleted_at=now, purge_queued_at=now)
+        User.objects.filter(pk=self.other.pk).update(deleted_at=now)
+        with mock.patch.object(purge_user, "delay") as queue:
+            self.assertEqual(purge_deleted_users(), 1)
+            self.assertEqual(purge_deleted_users(), 0)
+        queue.assert_called_once_with(self.other.pk)
+
+        # A purge that stopped making progress is queued again.
+        User.all_objects.filter(pk=self.user.pk).update(
+            purge_queued_at=now - timedelta(seconds=601)
+        )
+        with mock.patch.object(purge_user, "delay") as queue:
+            self.assertEqual(purge_deleted_users(), 1)
+        queue.assert_called_once_with(self.user.pk)
+
+    def test_soft_deleted_user_is_not_dispatched(self):
+        User.objects.filter(pk=self.user.pk).update(deleted_at="2030-01-01T00:00:00Z")
+        ids = list(EmailSchedule.objects.values_list("id", flat=True))
+        with self.settings(
+            EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend"
+        ):
+            send_scheduled_email_batch(ids)
+        self.assertEqual(
+            set(EmailSchedule.objects.values_list("user_id", "email_status")),
+            {(self.user.pk, "Pending"), (self.other.pk, "Done")},
+        )
+
+
+class ArchiveTest(TestCase):
+    def setUp(self):
+        api_cache.clear()
+        self.user = User.objects.create(name="user", email="user@example.com")
+        for email_status, scheduled_date in (
+            ("Done", date(2020, 1, 1)),
+            ("Suppressed", date(2020, 2, 1)),
+            ("Failed", date(2020, 1, 1)),
+            ("Done", date(2999, 1, 1)),
+        ):
+            schedule = EmailSchedule.objects.create(
+                user=self.user,
+                scheduled_time=time(8),
+                scheduled_date=scheduled_date,
+                email_status=email_status,
+            )
+            EmailOutbox.for_schedule(schedule).save()
+
+    def test_old_terminal_rows_move_to_history(self):
+        self.assertEqual(archive_schedules(older_than_days=30, batch_size=1), 2)
+        self.assertEqual(
+            sorted(EmailSchedule.objects.values_list("email_status", flat=True)),
+            ["Done", "Failed"],
+        )
+        self.assertEqual(
+            sorted(EmailScheduleHistory.objects.values_list("status", flat=True)),
+            [1, 2],
+        )
+        self.assertEqual(EmailOutbox.objects.count(), 2)
+
+        rows = self.client.get(
+            reverse("user:schedule-history"), {"ordering": "scheduled", "page_size": 3}
+        ).json()["data"]
+        self.assertEqual(
+            [(row["email_status"], row["archived"]) for row in rows["results"]],
+            [("Done", True), ("Failed", False), ("Suppressed", True)],
+        )
+        rows = self.client.get(
+            reverse("user:schedule-history"),
+            {"ordering": "scheduled", "page_size": 3, "cursor": rows["next_cursor"]},
+        ).json()["data"]
+        self.assertEqual(
+            [row["scheduled_date"] for row in rows["results"]], ["2999-01-01"]
+        )
+        rows = self.client.get(
+            reverse("user:schedule-history"), {"status": "Suppressed"}
+        ).json()["data"]
+        self.assertEqual(len(rows["results"]), 1)
+
+        self.assertEqual(purge_history(retention_days=30), 2)
+        self.assertFalse(EmailScheduleHistory.objects.exists())
+
+
+class RecurringScheduleTest(TestCase):
+    def setUp(self):
+        api_cache.clear()
+        self.user = User.objects.create(name="user", email="user@example.com")
+        response = self.client.post(
+            reverse("user:recurring-create"),
+            {
+                "user": self.user.pk,
+                "rule": "FREQ=HOURLY;BYMINUTE=0",
+                "timezone": "UTC",
+                "starts_at": "2030-01-01T00:00:00Z",
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.recurring = RecurringSchedule.objects.get()
+
+    def test_rejects_sub_hourly_rules(self):
+        response = self.client.post(
+            reverse("user:recurring-create"),
+            {"user": self.user.pk, "rule": "FREQ=MINUTELY"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_expands_only_the_window_and_coalesces_missed_runs(self):
+        now = datetime(2030, 1, 1, 5, 30, tzinfo=timezone.utc)
+        self.assertEqual(expand_recurring(window_minutes=60, now=now), 2)
+        self.assertEqual(expand_recurring(window_minutes=60, now=now), 0)
+        self.assertEqual(
+            sorted(
+                schedule.scheduled_time.hour
+                for schedule in EmailSchedule.objects.filter(recurring=self.recurring)
+            ),
+            [10, 11],  # 05:00 UTC (latest missed run) and 06:00 UTC in Asia/Kolkata.
+        )
+        self.assertEqual(EmailOutbox.objects.count(), 2)
+        self.recurring.refresh_from_db()
+        self.assertEqual(
+            self.recurring.next_run_at, datetime(2030, 1, 1, 7, tzinfo=timezone.utc)
+        )
+
+        self.client.delete(reverse("user:recurring-detail", args=[self.recurring.pk]))
+        self.assertEqual(expand_recurring(window_minutes=600, now=now), 0)
+
+
+class CampaignTest(TestCase):
+    def setUp(self):
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, "task_always_eager", False)
+        for index in range(5):
+            User.objects.create(name=f"user{index}", email=f"user{index}@example.com")
+        User.objects.create(name="other", email="other@example.org")
+
+    def test_rejects_unknown_segment_filters(self):
+        response = self.client.post(
+            reverse("user:campaign-create"),
+            {
+                "name": "news",
+                "send_at": "2020-01-01T00:00:00Z",
+                "segment": {"id__gt": 0},
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(EMAIL_BATCH_SIZE=2)
+    def test_fans_out_the_segment_in_chunks(self):
+        response = self.client.post(
+            reverse("user:campaign-create"),
+            {
+                "name": "news",
+                "send_at": "2020-01-01T00:00:00Z",
+                "segment": {"email_domain": "example.com"},
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(dispatch_campaigns(chunk_size=2), 5)
+        self.assertEqual(dispatch_campaigns(chunk_size=2), 0)
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            [f"user{index}@example.com" for index in range(5)],
+        )
+        campaign = self.client.get(
+            reverse("user:campaign-detail", args=[Campaign.objects.get().pk])
+        ).json()["data"]
+        self.assertEqual(campaign["status"], "Dispatched")
+        self.assertEqual(
+            (campaign["total_recipients"], campaign["dispatched_count"]), (5, 5)
+        )
+        self.assertEqual(campaign["sent_count"], 5)
+
+
+@override_settings(TRACKING_FLUSH_MS=0)
+class TrackingTest(TestCase):
+    def test_hits_are_counted_in_memory_and_flushed_in_bulk(self):
+        for _ in range(3):
+            response = self.client.get(open_pixel_url(7))
+            self.assertEqual(response["Content-Type"], "image/gif")
+        response = self.client.get(click_url(7, "https://example.com/offer"))
+        self.assertRedirects(
+            response, "https://example.com/offer", fetch_redirect_response=False
+        )
+        self.assertEqual(
+            self.client.get(open_pixel_url(8)[:-3] + "x/").status_code, 200
+        )
+        self.assertEqual(
+            self.client.get(
+                click_url(7, "https://example.com")[:-3] + "x/"
+            ).status_code,
+            404,
+        )
+        self.assertFalse(EmailEngagement.objects.exists())
+
+        self.assertEqual(engagement_buffer.flush(), 1)
+        self.client.get(open_pixel_url(7))
+        engagement_buffer.flush()
+        engagement = EmailEngagement.objects.get()
+        self.assertEqual((engagement.opens, engagement.clicks), (4, 1))
+
+    def test_sent_emails_carry_the_pixel_and_tracked_links(self):
+        user = User.objects.create(name="user", email="user@example.com")
+        schedules = [
+            EmailSchedule.objects.create(
+                user=user, scheduled_time=time(8), scheduled_date=date(2030, 1, 1)
+            )
+            for _ in range(2)
+        ]
+        with self.settings(
+            EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend"
+        ):
+            send_scheduled_email_batch([schedules[0].id])
+            send_scheduled_email(schedules[1].id)
+        for message, schedule in zip(mail.outbox, schedules):
+            ((html, mimetype),) = message.alternatives
+            self.assertEqual(mimetype, "text/html")
+            pixel = re.search(r'<img src="([^"]+)"', html).group(1)
+            self.assertEqual(pixel, open_pixel_url(schedule.id))
+            self.assertEqual(self.client.get(pixel).status_code, 200)
+        engagement_buffer.flush()
+        self.assertEqual(
+            sorted(EmailEngagement.objects.values_list("schedule_id", "opens")),
+            [(schedule.id, 1) for schedule in schedules],
+        )
+
+        html, links = tracked_html("Read https://example.com/a?b=1&c=2 today")
+        self.assertEqual(links, ["https://example.com/a?b=1&c=2"])
+        self.assertIn('<a href="-click1-">', html)
+        self.assertIn(
+            escape(click_url(7, links[0])),
+            fill_placeholders(html, tracking_substitutions(7, links)),
+        )
+
+    def test_fallback_upsert_keeps_the_first_open(self):
+        first = datetime(2030, 1, 1, 8, tzinfo=timezone.utc)
+        later = datetime(2030, 1, 2, 8, tzinfo=timezone.utc)
+        with mock.patch.object(connection, "vendor", "mysql"):
+            upsert_engagement([(7, 0, 1, None, first)])
+            upsert_engagement([(7, 1, 0, first, first)])
+            upsert_engagement([(7, 1, 0, later, later)])
+        engagement = EmailEngagement.objects.get()
+        self.assertEqual((engagement.opens, engagement.clicks), (2, 1))
+        self.assertEqual(
+            (engagement.first_opened_at, engagement.last_event_at), (first, later)
+        )
+
+
+class WebhookReceiver(BaseHTTPRequestHandler):
+    requests = []
+    status_code = 200
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        type(self).requests.append((self.headers["X-Webhook-Signature"], body))
+        self.send_response(self.status_code)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(WEBHOOK_RETRIES=0, WEBHOOK_COMMIT_LAG_MS=0)
+class WebhookTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), WebhookReceiver)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_port}/hook"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        WebhookReceiver.requests, WebhookReceiver.status_code = [], 200
+        user = User.objects.create(name="user", email="user@example.com")
+        self.schedules = [
+            EmailSchedule.objects.create(
+                user=user, scheduled_time=time(8), scheduled_date=date(2030, 1, 1)
+            )
+            for _ in range(3)
+        ]
+        response = self.client.post(
+            reverse("user:webhook-create"),
+            {"url": self.url, "events": ["Done", "Failed"]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.subscription = WebhookSubscription.objects.get()
+        self.assertEqual(response.json()["data"]["secret"], self.subscription.secret)
+
+    def test_status_changes_are_pushed_in_one_signed_batch(self):
+        done, failed, suppressed = (schedule.id for schedule in self.schedules)
+        record_send_results([done], [failed], [suppressed])
+        self.assertEqual(deliver_webhooks(), 2)
+
+        ((signature, body),) = WebhookReceiver.requests
+        self.assertEqual(signature, sign(self.subscription.secret, body))
+        self.assertEqual(
+            [
+                (event["schedule_id"], event["status"])
+                for event in json.loads(body)["events"]
+            ],
+            [(done, "Done"), (failed, "Failed")],
+        )
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_failed_delivery_backs_off_and_keeps_the_events(self):
+        WebhookReceiver.status_code = 503
+        record_send_results([self.schedules[0].id], [])
+        self.assertEqual(deliver_webhooks(), 0)
+        self.subscription.refresh_from_db()
+        self.assertEqual(self.subscription.failures, 1)
+        self.assertIsNotNone(self.subscription.retry_at)
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+        # In backoff: not retried before retry_at.
+        self.assertEqual(deliver_webhooks(), 0)
+        self.assertEqual(len(WebhookReceiver.requests), 1)
+
+    def test_secret_is_only_returned_on_create(self):
+        detail = self.client.get(
+            reverse("user:webhook-detail", args=[self.subscription.id])
+        )
+        listing = self.client.get(reverse("user:webhook-create"))
+        self.assertNotIn("secret", detail.json()["data"])
+        self.assertNotIn("secret", str(listing.json()["data"]))
+
+    @override_settings(WEBHOOK_COMMIT_LAG_MS=5000)
+    def test_cursor_stops_at_events_that_may_not_have_committed(self):
+        done = WebhookEvent.STATUS_CODES["Done"]
+        settled = datetime.now(timezone.utc) - timedelta(seconds=10)
+        # The middle event was queued last, by a transaction still open a moment ago.
+        first, young, late = (
+            WebhookEvent.objects.create(
+                schedule_id=schedule.id, status=done, occurred_at=occurred_at
+            )
+            for schedule, occurred_at in zip(
+                self.schedules, [settled, datetime.now(timezone.utc), settled]
+            )
+        )
+        self.assertEqual(deliver_webhooks(), 1)
+        self.subscription.refresh_from_db()
+        self.assertEqual(self.subscription.last_event_id, first.id)
+
+        with override_settings(WEBHOOK_COMMIT_LAG_MS=0):
+            self.assertEqual(deliver_webhooks(), 2)
+        self.assertEqual(
+            [
+                event["id"]
+                for _, body in WebhookReceiver.requests
+                for event in json.loads(body)["events"]
+            ],
+            [first.id, young.id, late.id],
+        )
+
+    def test_posts_run_outside_transactions_and_skip_leased_subscribers(self):
+        record_send_results([self.schedules[0].id], [])
+        depth = len(connection.savepoint_ids)
+        post = mock.Mock(
+            side_effect=lambda *args: self.assertEqual(
+                len(connection.savepoint_ids), depth
+            )
+            or True
+        )
+        with override_settings(WEBHOOK_COMMIT_LAG_MS=0), mock.patch(
+            "user.webhooks._post", post
+        ):
+            WebhookSubscription.objects.update(
+                claimed_until=datetime.now(timezone.utc) + timedelta(minutes=1)
+            )
+            self.assertEqual(deliver_webhooks(), 0)
+            post.assert_not_called()
+
+            WebhookSubscription.objects.update(claimed_until=None)
+            self.assertEqual(deliver_webhooks(), 1)
+        post.assert_called_once()
+        self.subscription.refresh_from_db()
+        self.assertIsNone(self.subscription.claimed_until)
+        self.assertGreater(self.subscription.last_event_id, 0)
+
+    def test_delivery_scheduling_is_coalesced_in_the_database(self):
+        with mock.patch.object(deliver_webhooks, "apply_async") as apply_async:
+            schedule_webhook_delivery(1)
+            schedule_webhook_delivery(1)
+        apply_async.assert_called_once()
+        self.subscription.refresh_from_db()
+        self.assertIsNotNone(self.subscription.delivery_scheduled_at)
+
+
+class MetricsTest(TestCase):
+    def test_metrics_of_all_processes_are_exposed(self):
+        directory = tempfile.mkdtemp()
+        with override_settings(METRICS_DIR=directory):
+            emails_total.inc("sent", amount=2)
+            email_send_seconds.observe(0.02, "smtp")
+            registry.dump()
+            # An exited worker that sent as many emails as this one, whose pid is
+            # now reused by this process.
+            with open(os.path.join(directory, f"{registry.process}.json")) as snapshot:
+                other_process = json.load(snapshot)
+            host, pid, _ = parse_identity(f"{registry.process}.json")
+            exited = os.path.join(directory, f"{host}-{pid}-0.json")
+            with open(exited, "w") as snapshot:
+                json.dump(other_process, snapshot)
+            sent = emails_total.values[("sent",)]
+
+            body = self.client.get(reverse("core:metrics")).content.decode()
+            again = self.client.get(reverse("core:metrics")).content.decode()
+
+        self.assertFalse(os.path.exists(exited))
+        self.assertIn(f'emails_total{{result="sent"}} {2 * sent}', body)
+        self.assertIn(f'emails_total{{result="sent"}} {2 * sent}', again)
+        self.assertIn("# TYPE email_send_seconds histogram", body)
+        self.assertIn('email_send_seconds_bucket{backend="smtp",le="0.025"}', body)
+        self.assertIn("outbox_pending 0", body)
+
+    @override_settings(METRICS_ALLOWED_IPS=["10.0.0.1"])
+    def test_metrics_are_only_served_to_allowed_addresses(self):
+        url = reverse("core:metrics")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(url, REMOTE_ADDR="10.0.0.1").status_code, 200)
+
+    def test_metrics_middleware_stays_async_under_asgi(self):
+        async def view(request):
+            return HttpResponse(status=204)
+
+        middleware = MetricsMiddleware(view)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        observed = lambda: sum(
+            http_request_seconds.values.get(("unmatched", "GET", "204"), [[]])[0]
+        )
+        before = observed()
+        response = asyncio.run(middleware(RequestFactory().get("/")))
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(observed(), before + 1)
+
+
+def busy_send_path(seconds):
+    deadline = clock.monotonic() + seconds
+    while clock.monotonic() < deadline:
+        pass
+
+
+@override_settings(PROFILING_FLAG_SECONDS=0, PROFILING_INTERVAL_MS=1)
+class ProfilingTest(TestCase):
+    def setUp(self):
+        # Re-read the flag now instead of within PROFILING_FLAG_SECONDS.
+        profiler._rate_expires = 0
+        self.addCleanup(setattr, profiler, "_rate_expires", 0)
+        self.addCleanup(cache.delete, RATE_CACHE_KEY)
+        self.addCleanup(profiler.stacks.clear)
+
+    def test_disabled_by_default_and_switched_by_the_cache_flag(self):
+        self.assertIsNone(profiler.start("task test"))
+        cache.set(RATE_CACHE_KEY, 1.0)
+        directory = tempfile.mkdtemp()
+        with override_settings(PROFILING_DIR=directory):
+            sampler = profiler.start("task test")
+            busy_send_path(0.05)
+            profiler.stop(sampler)
+            profiler.write()
+
+        with open(os.path.join(directory, f"{os.getpid()}.collapsed")) as profile:
+            stacks = profile.read().splitlines()
+        self.assertTrue(stacks)
+        self.assertTrue(all(stack.startswith("task test;") for stack in stacks))
+        self.assertTrue(any("busy_send_path (tests.py:" in stack for stack in stacks))
+
+    def test_profiling_middleware_stays_async_under_asgi(self):
+        async def view(request):
+            busy_send_path(0.05)
+            return HttpResponse()
+
+        middleware = ProfilingMiddleware(view)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        cache.set(RATE_CACHE_KEY, 1.0)
+        with override_settings(PROFILING_DIR=tempfile.mkdtemp()):
+            asyncio.run(middleware(RequestFactory().get("/")))
+        self.assertTrue(
+            any(
+                stack.startswith("request GET;") and "busy_send_path" in stack
+                for stack in profiler.stacks
+            )
+        )
+
+
+class QueryBudgetMixin:
+    """
+    Assertions on the number of SQL queries a route runs.
+
+    `assertQueryBudget` grows the data set through `seed(size)` for every size and
+    requests the route each time. The query count must stay within the route's budget
+    (see `utils.querybudget`) and must not grow with the size, so an N+1 query fails even
+    when it happens to fit the budget at small sizes.
+    """
+
+    sizes = (1, 5, 20)
+
+    def count_request(self, make_request):
+        with count_queries() as counter:
+            response = make_request()
+            if response.streaming:
+                b"".join(response.streaming_content)
+        return response, counter.count
+
+    def assertQueryBudget(self, view_name, make_request, seed, method=None):
+        counts = {}
+        for size in self.sizes:
+            seed(size)
+            response, counts[size] = self.count_request(make_request)
+            self.assertLess(response.status_code, 500, view_name)
+            self.assertLessEqual(
+                counts[size],
+                budget_for(view_name, method),
+                f"{method or ''} {view_name} is over its query budget at {size} rows.",
+            )
+        smallest = counts[self.sizes[0]]
+        self.assertTrue(
+            all(count <= smallest for count in counts.values()),
+            f"The queries of {view_name} grow with the data: {counts}",
+        )
+
+
+class FakeAsyncResult:
+    # The eager test app has no result backend to look jobs up in.
+    def __init__(self, job_id):
+        self.state, self.info = "PENDING", None
+
+
+@override_settings(API_CACHE_ENABLED=False, TRACKING_FLUSH_MS=0, EMAIL_BATCH_SIZE=50)
+class QueryBudgetTest(QueryBudgetMixin, TransactionTestCase):
+    def setUp(self):
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, "task_always_eager", False)
+
+    def seed(self, size):
+        """
+        Grow every table listed by the API to `size` rows.
+        """
+        # Numbered on from the rows seeded before, which a DELETE may have removed.
+        start = EmailScheduleHistory.objects.count()
+        for index in range(start, start + size - User.objects.count()):
+            user = User.objects.create(
+                name=f"user{index}", email=f"user{index}@example.com"
+            )
+            for scheduled_date in (date(2030, 1, 1), date(2020, 1, 1)):
+                EmailSchedule.objects.create(
+                    user=user, scheduled_time=time(8), scheduled_date=scheduled_date
+                )
+            EmailScheduleHistory.objects.create(
+                id=10**9 + index,
+                user_id=user.id,
+                scheduled_date=date(2020, 1, 1),
+                scheduled_time=time(8),
+                status=EmailScheduleHistory.STATUS_CODES["Done"],
+            )
+            RecurringSchedule.objects.create(
+                user=user,
+                rule="FREQ=DAILY",
+                starts_at=datetime(2030, 1, 1, tzinfo=timezone.utc),
+                next_run_at=datetime(2030, 1, 1, tzinfo=timezone.utc),
+            )
+            Campaign.objects.create(
+                name=f"campaign{index}",
+                segment={},
+                send_at=datetime(2030, 1, 1, tzinfo=timezone.utc),
+            )
+            WebhookSubscription.objects.create(
+                url=f"https://example.com/{index}", active=False
+            )
+
+    def seed_subscriber(self, size):
+        """
+        Seed, with the earliest webhook subscription active so that it can be cancelled.
+        """
+        self.seed(size)
+        WebhookSubscription.objects.filter(
+            pk=WebhookSubscription.objects.earliest("id").pk
+        ).update(active=True)
+
+    def clear(self):
+        for model in (
+            EmailOutbox,
+            WebhookEvent,
+            WebhookSubscription,
+            Campaign,
+            RecurringSchedule,
+            EmailScheduleHistory,
+            EmailSchedule,
+        ):
+            model.objects.all().delete()
+        User.all_objects.all().delete()
+
+    def requests(self):
+        """
+        One request per route of `user.urls` and method it serves, by (method, URL name).
+        """
+        get, post, delete = self.client.get, self.client.post, self.client.delete
+        first = {
+            "user": lambda: User.objects.earliest("id").pk,
+            "schedule": lambda: EmailSchedule.objects.earliest("id").pk,
+            "recurring": lambda: RecurringSchedule.objects.earliest("id").pk,
+            "campaign": lambda: Campaign.objects.earliest("id").pk,
+            "webhook": lambda: WebhookSubscription.objects.earliest("id").pk,
+        }
+
+        def upload(rows):
+            return {"file": ContentFile("\n".join(rows).encode(), name="rows.csv")}
+
+        def create(name, payload):
+            return lambda: post(
+                reverse(f"user:{name}-create"),
+                payload(),
+                content_type="application/json",
+            )
+
+        created = {
+            "user": lambda: {
+                "name": "posted",
+                "email": f"posted{User.all_objects.count()}@example.com",
+            },
+            "schedule": lambda: {
+                "user": first["user"](),
+                "scheduled_date": "2030-01-03",
+                "scheduled_time": "10:00",
+            },
+            "recurring": lambda: {
+                "user": first["user"](),
+                "rule": "FREQ=DAILY",
+                "timezone": "UTC",
+                "starts_at": "2030-01-01T00:00:00Z",
+            },
+            "campaign": lambda: {
+                "name": "posted",
+                "send_at": "2030-01-01T00:00:00Z",
+                "segment": {"email_domain": "example.com"},
+            },
+            "webhook": lambda: {
+                "url": "https://example.com/posted",
+                "events": ["Done"],
+            },
+        }
+
+        return {
+            ("GET", "track-open"): lambda: get(
+                reverse("user:track-open", args=[make_token(first["schedule"]())])
+            ),
+            ("GET", "track-click"): lambda: get(
+                reverse(
+                    "user:track-click",
+                    args=[make_token(first["schedule"](), "https://example.com/")],
+                )
+            ),
+            ("POST", "user-import"): lambda: post(
+                reverse("user:user-import"),
+                upload(
+                    ["name,email"]
+                    + [
+                        f"new{i},new{i}@example.com"
+                        for i in range(User.objects.count())
+                    ]
+                ),
+            ),
+            ("POST", "schedule-import"): lambda: post(
+                reverse("user:schedule-import"),
+                upload(
+                    ["user,scheduled_date,scheduled_time"]
+                    + [
+                        f"{pk},2030-01-02,09:00"
+                        for pk in User.objects.values_list("pk", flat=True)
+                    ]
+                ),
+            ),
+            ("POST", "trigger-emails"): lambda: post(reverse("user:trigger-emails")),
+            ("POST", "async-trigger-emails"): lambda: post(
+                reverse("user:async-trigger-emails")
+            ),
+            ("GET", "job-status"): lambda: get(
+                reverse("user:job-status", args=["unknown"])
+            ),
+            **{
+                (method, f"{name}-detail"): (
+                    lambda send=send, name=name, pk=pk: send(
+                        reverse(f"user:{name}-detail", args=[pk()])
+                    )
+                )
+                for name, pk in first.items()
+                for method, send in (("GET", get), ("DELETE", delete))
+            },
+            **{
+                ("POST", f"{name}-create"): create(name, payload)
+                for name, payload in created.items()
+            },
+            **{
+                ("GET", name): (lambda name=name: get(reverse(f"user:{name}")))
+                for name in (
+                    "user-create",
+                    "user-export",
+                    "schedule-create",
+                    "schedule-export",
+                    "recurring-create",
+                    "campaign-create",
+                    "webhook-create",
+                    "schedule-history",
+                    "cache-stats",
+                    "async-user-list",
+                    "async-schedule-list",
+                )
+            },
+        }
+
+    @mock.patch("user.views.AsyncResult", FakeAsyncResult)
+    def test_every_route_keeps_a_flat_query_budget(self):
+        bulk_insert_returns_ids = connection.features.can_return_rows_from_bulk_insert
+        requests = self.requests()
+        self.assertEqual(
+            {name for _, name in requests}, {pattern.name for pattern in urlpatterns}
+        )
+        seeds = {("DELETE", "webhook-detail"): self.seed_subscriber}
+        for (method, name), make_request in requests.items():
+            with self.subTest(route=name, method=method):
+                if name == "schedule-import" and not bulk_insert_returns_ids:
+                    self.skipTest("Schedules are saved one by one to get their ids.")
+                seed = seeds.get((method, name), self.seed)
+                self.assertQueryBudget(
+                    f"user:{name}", make_request, seed, method=method
+                )
+            self.clear()
+
+    def test_responses_report_their_queries_and_offenders_are_logged(self):
+        self.seed(3)
+        response = self.client.get(reverse("user:schedule-create"))
+        self.assertEqual(response["X-Query-Count"], "1")
+        self.assertIn("X-Query-Time-Ms", response)
+
+        with override_settings(QUERY_BUDGETS={"user:schedule-create": 0}):
+            with self.assertLogs("utils.querybudget", "WARNING") as logs:
+                self.client.get(reverse("user:schedule-create"))
+        self.assertIn("user:schedule-create ran 1 queries", logs.output[0])
+
+    def test_query_budget_middleware_stays_async_under_asgi(self):
+        async def view(request):
+            await sync_to_async(User.objects.count)()
+            await sync_to_async(EmailSchedule.objects.count)()
+            return HttpResponse()
+
+        middleware = QueryBudgetMiddleware(view)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        response = asyncio.run(middleware(RequestFactory().get("/")))
+        self.assertEqual(response["X-Query-Count"], "2")
+
+
+class SendBenchmarkTest(TestCase):
+    def run_benchmark(self, **options):
+        path = os.path.join(tempfile.mkdtemp(), "results.json")
+        call_command(
+            "benchmark_send",
+            users=3,
+            schedules=8,
+            output=path,
+            stdout=io.StringIO(),
+            **options,
+        )
+        with open(path) as results:
+            return json.load(results)
+
+    def test_sends_through_the_sink_and_cleans_up(self):
+        results = self.run_benchmark(latency_ms=1)
+        self.assertEqual((results["sent"], results["failed"]), (8, 0))
+        self.assertEqual(results["sink"]["accepted"], 8)
+        self.assertLess(results["queries_per_email"], 2)
+        self.assertIsNotNone(results["lateness_p99_ms"])
+        self.assertFalse(User.all_objects.exists())
+        self.assertFalse(EmailSchedule.objects.exists())
+
+    def test_injected_errors_fail_or_bounce(self):
+        results = self.run_benchmark(fail_rate=1.0)
+        self.assertEqual((results["sent"], results["failed"]), (0, 8))
+        results = self.run_benchmark(reject_rate=1.0)
+        self.assertEqual(results["suppressed"], 8)
+
+
+class ApiBenchmarkTest(TestCase):
+    def test_times_every_operation_at_every_size(self):
+        path = os.path.join(tempfile.mkdtemp(), "results.json")
+        call_command(
+            "benchmark_api",
+            sizes="10,30",
+            requests=3,
+            batch_size=10,
+            output=path,
+            stdout=io.StringIO(),
+        )
+        with open(path) as output:
+            results = json.load(output)
+
+        self.assertEqual(list(results["sizes"]), ["10", "30"])
+        self.assertEqual(EmailSchedule.objects.count(), 30)
+        for size, operations in results["sizes"].items():
+            self.assertEqual(len(operations), 8)
+            for name, summary in operations.items():
+                with self.subTest(size=size, operation=name):
+                    self.assertEqual(summary["errors"], 0)
+                    self.assertEqual(summary["requests"], 3)
@@ -0,0 +1,283 @@
+"""
+Module containing the open and click tracking of sent emails.
+
+Tracking links carry a signed token (`django.core.signing`, HMAC with SECRET_KEY), so a hit
+is verified without any database lookup. Hits are then only counted in `engagement_buffer`,
+a per-process dict of counters per schedule. A daemon thread of each process flushes the
+aggregated counters every TRACKING_FLUSH_MS milliseconds with one multi-row upsert
+(`INSERT ... ON CONFLICT DO UPDATE`) into `email_engagement`, so thousands of hits on the
+same email cost a single row write. The buffer is also flushed once it holds
+TRACKING_BUFFER_MAX_KEYS schedules and at exit; counts of a killed process are lost.
+
+Classes:
+- EngagementBuffer: Per-process open/click counters flushed in bulk.
+
+Functions:
+- make_token: Sign a schedule id and optional redirect URL.
+- read_token: Verify a token and return its schedule id and URL.
+- open_pixel_url / click_url: Absolute tracking URLs to embed in an email.
+- tracked_html: HTML alternative of a plain-text body with tracking placeholders.
+- tracking_substitutions: The per-recipient values of those placeholders.
+- fill_placeholders: Render the placeholders locally, for backends without substitutions.
+
+Sent emails carry an HTML alternative built by `tracked_html`: its links point at
+`click_url` and it ends with the `open_pixel_url` image. The URLs differ per schedule, so
+the HTML holds placeholders and every message gets its values as substitutions, which lets
+the API backends keep sending one template for a whole batch.
+"""
+
+import atexit
+import logging
+import os
+import re
+import threading
+import time
+from html import escape
+
+from django.conf import settings
+from django.core import signing
+from django.db import connection
+from django.db.models import DateTimeField, F, Value
+from django.db.models.functions import Coalesce
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import EmailEngagement
+
+logger = logging.getLogger(__name__)
+
+TOKEN_SALT = "user.tracking"
+UPSERT_BATCH_SIZE = 500
+OPEN_PLACEHOLDER = "-open_pixel-"
+LINK_PATTERN = re.compile(r"https?://[^\s<>\"']+")
+
+
+def make_token(schedule_id, url=None):
+    """
+    Sign a schedule id and, for click tracking, the redirect URL.
+    """
+    payload = [schedule_id, url] if url else [schedule_id]
+    return signing.Signer(salt=TOKEN_SALT).sign_object(payload, compress=True)
+
+
+def read_token(token):
+    """
+    Verify a tracking token.
+
+    Returns:
+    tuple: The schedule id and the redirect URL (None for open pixels).
+
+    Raises:
+    BadSignature: If the token was not issued by this deployment.
+    """
+    payload = signing.Signer(salt=TOKEN_SALT).unsign_object(token)
+    if not isinstance(payload, list) or not isinstance(payload[0], int):
+        raise signing.BadSignature("Malformed tracking token.")
+    return payload[0], payload[1] if len(payload) > 1 else None
+
+
+def open_pixel_url(schedule_id):
+    """
+    Absolute URL of the open-tracking pixel of a schedule.
+    """
+    path = reverse("user:track-open", args=[make_token(schedule_id)])
+    return f"{settings.TRACKING_BASE_URL.rstrip('/')}{path}"
+
+
+def click_url(schedule_id, url):
+    """
+    Absolute tracking URL redirecting to `url`.
+    """
+    path = reverse("user:track-click", args=[make_token(schedule_id, url)])
+    return f"{settings.TRACKING_BASE_URL.rstrip('/')}{path}"
+
+
+def tracked_html(text):
+    """
+    Build the HTML alternative of a plain-text body.
+
+    Every link becomes an anchor whose href is the placeholder `-click<n>-` and an open
+    pixel with the placeholder OPEN_PLACEHOLDER is appended.
+
+    Returns:
+    tuple: The HTML and the list of original link URLs, in placeholder order.
+    """
+    parts, links, position = [], [], 0
+    for match in LINK_PATTERN.finditer(text):
+        links.append(match.group(0))
+        parts.append(escape(text[position : match.start()]))
+        parts.append(f'<a href="-click{len(links)}-">{escape(match.group(0))}</a>')
+        position = match.end()
+    parts.append(escape(text[position:]))
+    body = "".join(parts).replace("\n", "<br>\n")
+    pixel = f'<img src="{OPEN_PLACEHOLDER}" width="1" height="1" alt="">'
+    return f"<html><body><p>{body}</p>{pixel}</body></html>", links
+
+
+def tracking_substitutions(schedule_id, links):
+    """
+    Return the values of the `tracked_html` placeholders for one schedule.
+    """
+    substitutions = {OPEN_PLACEHOLDER: open_pixel_url(schedule_id)}
+    for number, url in enumerate(links, 1):
+        substitutions[f"-click{number}-"] = click_url(schedule_id, url)
+    return substitutions
+
+
+def fill_placeholders(html, substitutions):
+    """
+    Replace the placeholders of `html`, for backends that do not substitute themselves.
+    """
+    for placeholder, value in substitutions.items():
+        html = html.replace(placeholder, escape(str(value)))
+    return html
+
+
+class EngagementBuffer:
+    """
+    Per-process open and click counters written to `email_engagement` in bulk.
+
+    Attributes:
+        flush_ms (int): Interval of the background flusher, 0 disables it.
+        max_keys (int): Flush as soon as this many schedules are buffered.
+
+    Methods:
+        add: Count one open or click.
+        flush: Upsert and reset the buffered counters.
+    """
+
+    OPEN, CLICK = 0, 1
+
+    def __init__(self, flush_ms=None, max_keys=None):
+        self.flush_ms = flush_ms
+        self.max_keys = max_keys
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._pid = None
+        self._flusher = None
+        atexit.register(self.flush)
+
+    def add(self, schedule_id, kind):
+        """
+        Count one hit of `kind` (OPEN or CLICK) for the schedule.
+        """
+        now = timezone.now()
+        with self._lock:
+            if self._pid != os.getpid():
+                # First hit in this process (or a forked child): start its own flusher.
+                self._counts, self._pid = {}, os.getpid()
+                self._start_flusher()
+            counts = self._counts.get(schedule_id)
+            if counts is None:
+                counts = self._counts[schedule_id] = [0, 0, None, now]
+            counts[kind] += 1
+            if kind == self.OPEN and counts[2] is None:
+                counts[2] = now
+            counts[3] = now
+            full = len(self._counts) >= self._max_keys()
+        if full:
+            self.flush()
+
+    def _max_keys(self):
+        return self.max_keys or int(settings.TRACKING_BUFFER_MAX_KEYS)
+
+    def _start_flusher(self):
+        interval = self.flush_ms
+        if interval is None:
+            interval = int(settings.TRACKING_FLUSH_MS)
+        if interval <= 0:
+            return
+        self._flusher = threading.Thread(
+            target=self._run_flusher, args=(interval / 1000,), daemon=True
+        )
+        self._flusher.start()
+
+    def _run_flusher(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            finally:
+                # The flusher thread has its own connection; don't keep it open idle.
+                connection.close()
+
+    def flush(self):
+        """
+        Add the buffered counters to `email_engagement` and reset them.
+
+        Failures are logged and the counts dropped, so tracking never breaks a request.
+
+        Returns:
+            int: The number of schedules written.
+        """
+        with self._lock:
+            counts, self._counts = self._counts, {}
+        if not counts:
+            return 0
+        rows = [(schedule_id, *values) for schedule_id, values in counts.items()]
+        try:
+            for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+                upsert_engagement(rows[start : start + UPSERT_BATCH_SIZE])
+        except Exception:
+            logger.exception("Dropped tracking counts of %d schedules.", len(rows))
+            return 0
+        return len(rows)
+
+
+def upsert_engagement(rows):
+    """
+    Add counters to `email_engagement`, creating missing rows.
+
+    Parameters:
+    rows (list): Tuples of (schedule_id, opens, clicks, first_opened_at, last_event_at).
+    """
+    if connection.vendor in ("postgresql", "sqlite"):
+        qn = connection.ops.quote_name
+        table = qn(EmailEngagement._meta.db_table)
+        latest = "GREATEST" if connection.vendor == "postgresql" else "MAX"
+        adapt = connection.ops.adapt_datetimefield_value
+        placeholders = ", ".join(["(%s, %s, %s, %s, %s)"] * len(rows))
+        params = []
+        for schedule_id, opens, clicks, first_opened_at, last_event_at in rows:
+            params += [
+                schedule_id,
+                opens,
+                clicks,
+                adapt(first_opened_at),
+                adapt(last_event_at),
+            ]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} "
+                "(schedule_id, opens, clicks, first_opened_at, last_event_at) "
+                f"VALUES {placeholders} ON CONFLICT (schedule_id) DO UPDATE SET "
+                f"opens = {table}.opens + EXCLUDED.opens, "
+                f"clicks = {table}.clicks + EXCLUDED.clicks, "
+                f"first_opened_at = COALESCE({table}.first_opened_at, EXCLUDED.first_opened_at), "
+                f"last_event_at = {latest}({table}.last_event_at, EXCLUDED.last_event_at)",
+                params,
+            )
+        return
+    existing = set(
+        EmailEngagement.objects.filter(
+            schedule_id__in=[row[0] for row in rows]
+        ).values_list("schedule_id", flat=True)
+    )
+    EmailEngagement.objects.bulk_create(
+        [EmailEngagement(*row) for row in rows if row[0] not in existing],
+        ignore_conflicts=True,
+    )
+    for schedule_id, opens, clicks, first_opened_at, last_event_at in rows:
+        if schedule_id in existing:
+            EmailEngagement.objects.filter(schedule_id=schedule_id).update(
+                opens=F("opens") + opens,
+                clicks=F("clicks") + clicks,
+                first_opened_at=Coalesce(
+                    "first_opened_at",
+                    Value(first_opened_at, output_field=DateTimeField()),
+                ),
+                last_event_at=last_event_at,
+            )
+
+
+engagement_buffer = EngagementBuffer()
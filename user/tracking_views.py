@@ -0,0 +1,59 @@
+"""
+Module containing the open-pixel and click-redirect tracking endpoints.
+
+These are the most frequently hit URLs of the application, so they are plain Django views
+(no DRF request parsing, content negotiation or renderer): the token is verified in memory
+(see `user.tracking`), the hit is counted in the per-process buffer and the response is
+returned without touching the database.
+
+Functions:
+- track_open: Serve the 1x1 pixel and count an open.
+- track_click: Count a click and redirect to the signed URL.
+"""
+
+from django.core import signing
+from django.http import Http404, HttpResponse, HttpResponseRedirect
+from django.views.decorators.http import require_GET
+
+from .tracking import engagement_buffer, read_token
+
+PIXEL = (
+    b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00"
+    b"\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;"
+)
+
+
+@require_GET
+def track_open(request, token):
+    """
+    Serve a transparent 1x1 GIF and count an open of the token's schedule.
+
+    An invalid token still gets the pixel, so broken links never show as broken images,
+    but is not counted.
+    """
+    try:
+        schedule_id, _ = read_token(token)
+    except signing.BadSignature:
+        pass
+    else:
+        engagement_buffer.add(schedule_id, engagement_buffer.OPEN)
+    response = HttpResponse(PIXEL, content_type="image/gif")
+    response["Cache-Control"] = "no-store, max-age=0"
+    return response
+
+
+@require_GET
+def track_click(request, token):
+    """
+    Count a click of the token's schedule and redirect to the signed URL.
+
+    Only URLs signed into the token are redirected to, so the endpoint is no open redirect.
+    """
+    try:
+        schedule_id, url = read_token(token)
+    except signing.BadSignature:
+        raise Http404
+    if not url:
+        raise Http404
+    engagement_buffer.add(schedule_id, engagement_buffer.CLICK)
+    return HttpResponseRedirect(url)
@@ -6,16 +6,74 @@ and generate the HTTP response.
 
 from django.urls import path
 
-from .views import ScheduleAPIView, SendScheduledEmailAPIView, UserAPIView
+from .async_views import (
+    async_schedule_list,
+    async_send_scheduled_email,
+    async_user_list,
+)
+from .tracking_views import track_click, track_open
+from .views import (
+    CacheStatsAPIView,
+    CampaignAPIView,
+    JobStatusAPIView,
+    RecurringScheduleAPIView,
+    ScheduleAPIView,
+    ScheduleExportAPIView,
+    ScheduleHistoryAPIView,
+    ScheduleImportAPIView,
+    SendScheduledEmailAPIView,
+    UserAPIView,
+    UserExportAPIView,
+    UserImportAPIView,
+    WebhookSubscriptionAPIView,
+)
 
 app_name = "user"
 
 urlpatterns = [
+    path("t/o/<str:token>/", track_open, name="track-open"),
+    path("t/c/<str:token>/", track_click, name="track-click"),
     path("api/users/", UserAPIView.as_view(), name="user-create"),
     path("api/users/<int:pk>/", UserAPIView.as_view(), name="user-detail"),
+    path("api/users/import/", UserImportAPIView.as_view(), name="user-import"),
+    path("api/users/export/", UserExportAPIView.as_view(), name="user-export"),
     path("api/schedule/", ScheduleAPIView.as_view(), name="schedule-create"),
     path("api/schedule/<int:pk>/", ScheduleAPIView.as_view(), name="schedule-detail"),
+    path(
+        "api/schedule/import/", ScheduleImportAPIView.as_view(), name="schedule-import"
+    ),
+    path(
+        "api/schedule/export/", ScheduleExportAPIView.as_view(), name="schedule-export"
+    ),
+    path("api/recurring/", RecurringScheduleAPIView.as_view(), name="recurring-create"),
+    path(
+        "api/recurring/<int:pk>/",
+        RecurringScheduleAPIView.as_view(),
+        name="recurring-detail",
+    ),
+    path("api/campaigns/", CampaignAPIView.as_view(), name="campaign-create"),
+    path("api/campaigns/<int:pk>/", CampaignAPIView.as_view(), name="campaign-detail"),
+    path("api/webhooks/", WebhookSubscriptionAPIView.as_view(), name="webhook-create"),
+    path(
+        "api/webhooks/<int:pk>/",
+        WebhookSubscriptionAPIView.as_view(),
+        name="webhook-detail",
+    ),
+    path(
+        "api/schedule/history/",
+        ScheduleHistoryAPIView.as_view(),
+        name="schedule-history",
+    ),
+    path("api/cache/stats/", CacheStatsAPIView.as_view(), name="cache-stats"),
+    path("api/jobs/<str:job_id>/", JobStatusAPIView.as_view(), name="job-status"),
     path(
         "api/email/trigger/", SendScheduledEmailAPIView.as_view(), name="trigger-emails"
     ),
+    path("api/async/users/", async_user_list, name="async-user-list"),
+    path("api/async/schedule/", async_schedule_list, name="async-schedule-list"),
+    path(
+        "api/async/email/trigger/",
+        async_send_scheduled_email,
+        name="async-trigger-emails",
+    ),
 ]
@@ -5,25 +5,49 @@ Each view encapsulates the logic for processing requests, such as retrieving dat
 performing calculations, and rendering templates or returning data in various formats (e.g., JSON, HTML).
 """
 
-from datetime import datetime, timedelta
+from contextlib import nullcontext
 
+from celery.result import AsyncResult
 from django.conf import settings
-from django.db.models import Q
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from rest_framework import status
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from user.tasks import send_scheduled_email
+from user.tasks import purge_user, relay_outbox
+from utils.cache import api_cache, cache_query_key
+from utils.conditional import (
+    generation_etag,
+    is_not_modified,
+    make_etag,
+    not_modified_response,
+)
 from utils.custom_response import APIResponse
+from utils.db_router import is_pinned, read_database, read_from_replica
+from utils.pagination import KeysetPaginator
 
-from .models import EmailSchedule, User
+from .archive import ScheduleRecords
+from .exporters import CONTENT_TYPES, export_schedules, export_users
+from .filters import ScheduleFilter
+from .importers import detect_format, import_schedules, import_users, iter_rows
+from .models import (
+    Campaign,
+    EmailSchedule,
+    RecurringSchedule,
+    User,
+    WebhookSubscription,
+)
 from .serializers import (
+    CampaignSerializer,
     EmailScheduleCreateSerializer,
     EmailScheduleDetailSerializer,
+    RecurringScheduleSerializer,
     UserCreateSerializer,
     UserDetailSerializer,
+    WebhookSubscriptionSerializer,
 )
 
 
@@ -41,10 +65,61 @@ class UserAPIView(APIView):
         Exception: If there is an unknown error occurred in fetching, creating, or deleting the user.
     """
 
+    def get_detail_data(self, pk):
+        """
+        Serialize a single user.
+        """
+        return UserDetailSerializer(get_object_or_404(User.objects, pk=pk)).data
+
+    def get_list_data(self, request, replica=True):
+        """
+        Serialize one keyset page of users, read from a replica unless `replica` is False.
+        """
+        with read_from_replica() if replica else nullcontext():
+            users, next_cursor = KeysetPaginator(ordering=("id",)).paginate(
+                User.objects.all(), request
+            )
+        serializer = UserDetailSerializer(users, many=True)
+        return {"results": serializer.data, "next_cursor": next_cursor}
+
+    def get_cached_list(self, request):
+        """
+        Return one page of users through the read cache.
+
+        Cached pages are built from the primary: a page read from a lagging replica right
+        after a write would be stored under the new generation and served to everyone for
+        API_CACHE_TTL. Without the cache, or when pinned, the page is read directly.
+        """
+        if is_pinned() or not api_cache.enabled:
+            return self.get_list_data(request)
+        return api_cache.get_or_build(
+            f"users:list:{cache_query_key(request)}",
+            ["users"],
+            lambda: self.get_list_data(request, replica=False),
+        )
+
+    def get_etag(self, request, pk=None):
+        """
+        Return the ETag of a user (from its `updated_at`) or of a user list page (from the
+        generation of the "users" cache namespace), or None for a missing user or a list
+        while the read cache is disabled.
+        """
+        if not pk:
+            return generation_etag(f"users:list:{cache_query_key(request)}", ["users"])
+        updated_at = User.objects.filter(pk=pk).values_list("updated_at", flat=True)
+        if not updated_at:
+            return None
+        return make_etag("user", pk, updated_at[0])
+
     def get(self, request, pk=None):
         """
         Handle GET requests to list users or retrieve a specific user.
 
+        Lists are keyset paginated: pass the returned `next_cursor` as `cursor` to fetch the
+        next page, and `page_size` to change the number of rows per page. Payloads are served
+        through the read-through cache in `utils.cache`. Responses carry an ETag; a request
+        whose `If-None-Match` matches it gets an empty 304 without any serialization.
+
         Returns:
             APIResponse: A response containing the user data with status code and message.
         Raises:
@@ -53,17 +128,23 @@ class UserAPIView(APIView):
         """
 
         try:
+            etag = self.get_etag(request, pk)
+            if etag and is_not_modified(request, etag):
+                return not_modified_response(etag)
             if pk:
-                user = get_object_or_404(User, pk=pk)
-                serializer = UserDetailSerializer(user)
+                data = api_cache.get_or_build(
+                    f"user:{pk}", [f"user:{pk}"], lambda: self.get_detail_data(pk)
+                )
             else:
-                users = User.objects.all()
-                serializer = UserDetailSerializer(users, many=True)
-            return APIResponse(
-                data=serializer.data,
+                data = self.get_cached_list(request)
+            response = APIResponse(
+                data=data,
                 status_code=status.HTTP_200_OK,
                 message="Fetched User Data",
             )
+            if etag:
+                response["ETag"] = etag
+            return response
         except settings.LAZY_EXCEPTIONS as ce:
             return APIResponse(
                 status_code=ce.status_code,
@@ -124,20 +205,38 @@ class UserAPIView(APIView):
         """
         Handle DELETE requests to delete a specific user.
 
+        The user is soft-deleted at once, which hides it from the API and excludes its
+        schedules from dispatch; its schedules and finally the user row are removed in
+        bounded chunks by the `purge_user` task. The response carries the task id, which
+        can be polled at `api/jobs/<job_id>/`.
+
         Returns:
-            APIResponse: A response indicating the success or failure of the deletion operation.
+            APIResponse: A 202 response with the purge job id, or a 404 if there is no such user.
         Raises:
             LazySettingsException: If there is an exception related to lazy settings.
             Exception: If there is an unknown error occurred in deleting the user.
         """
 
         try:
-            user = get_object_or_404(User, pk=pk)
-            user.delete()
+            now = timezone.now()
+            soft_deleted = User.objects.filter(pk=pk).update(
+                deleted_at=now, purge_queued_at=now, updated_at=now
+            )
+            if not soft_deleted:
+                raise Http404
+            api_cache.bump(f"user:{pk}", "users", "schedules")
+            job = purge_user.delay(pk)
             return APIResponse(
-                status_code=status.HTTP_200_OK,
+                data={"job_id": job.id},
+                status_code=status.HTTP_202_ACCEPTED,
                 message=f"User with id : {pk} deleted successfully.",
             )
+        except Http404:
+            return APIResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                for_error=True,
+                message=f"User with id : {pk} not found.",
+            )
         except settings.LAZY_EXCEPTIONS as ce:
             return APIResponse(
                 status_code=ce.status_code,
@@ -154,6 +253,125 @@ class UserAPIView(APIView):
             )
 
 
+class UserImportAPIView(APIView):
+    """
+    API view to bulk import users from an uploaded CSV or NDJSON file.
+
+    The file is sent as the multipart field `file`; the format is taken from the `file_format`
+    query parameter, or else from the file name / content type. Rows are streamed and
+    processed in chunks, so memory stays bounded whatever the size of the file.
+
+    Methods:
+        post: Handles POST requests to import users.
+
+    Raises:
+        LazySettingsException: If there is an exception related to lazy settings.
+        Exception: If there is an unknown error occurred in importing the users.
+    """
+
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        """
+        Handle POST requests to import users.
+
+        Returns:
+            APIResponse: A response containing the per-row import report with status code and message.
+        Raises:
+            LazySettingsException: If there is an exception related to lazy settings.
+            Exception: If there is an unknown error occurred in importing the users.
+        """
+
+        try:
+            upload = request.FILES.get("file")
+            if upload is None:
+                return APIResponse(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    for_error=True,
+                    message="No file uploaded in the `file` field.",
+                )
+            file_format = detect_format(upload, request.query_params.get("file_format"))
+            if file_format not in ("csv", "ndjson"):
+                return APIResponse(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    for_error=True,
+                    message=f"Unsupported import format: {file_format}",
+                )
+            report = import_users(iter_rows(upload, file_format))
+            return APIResponse(
+                data=report,
+                status_code=status.HTTP_200_OK,
+                message=f"{report['created']} User(s) imported, {report['failed']} row(s) failed.",
+            )
+        except settings.LAZY_EXCEPTIONS as ce:
+            return APIResponse(
+                status_code=ce.status_code,
+                errors=ce.error_data(),
+                message=ce.message,
+                for_error=True,
+            )
+
+        except Exception as ce:
+            return APIResponse(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                for_error=True,
+                message=f"Unknown error occured in importing User(s): {ce}",
+            )
+
+
+class UserExportAPIView(APIView):
+    """
+    API view to stream users as a CSV or NDJSON download.
+
+    The format is taken from the `file_format` query parameter (csv by default). Rows are read
+    with a server-side cursor and written as they arrive, so exports of any size run in
+    constant memory.
+
+    Methods:
+        get: Handles GET requests to export users.
+
+    Raises:
+        LazySettingsException: If there is an exception related to lazy settings.
+        Exception: If there is an unknown error occurred in exporting the users.
+    """
+
+    def get(self, request):
+        """
+        Handle GET requests to export users.
+
+        Returns:
+            StreamingHttpResponse: The streaming download.
+        Raises:
+            LazySettingsException: If there is an exception related to lazy settings.
+            Exception: If there is an unknown error occurred in exporting the users.
+        """
+
+        try:
+            file_format = request.query_params.get("file_format", "csv").lower()
+            if file_format not in CONTENT_TYPES:
+                return APIResponse(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    for_error=True,
+                    message=f"Unsupported export format: {file_format}",
+                )
+            # Streamed after the view returns, so the replica is bound to the queryset.
+            return export_users(User.objects.using(read_database()), file_format)
+        except settings.LAZY_EXCEPTIONS as ce:
+            return APIResponse(
+                status_code=ce.status_code,
+                errors=ce.error_data(),
+                message=ce.message,
+                for_error=True,
+            )
+
+        except Exception as ce:
+            return APIResponse(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                for_error=True,
+                message=f"Unknown error occured in exporting User(s): {ce}",
+            )
+
+
 class ScheduleAPIView(APIView):
     """
     API view to handle CRUD operations for email schedules.
@@ -176,10 +394,82 @@ class ScheduleAPIView(APIView):
         Exception: If there is an unknown error occurred in handling email schedules.
     """
 
+    def get_detail_data(self, pk):
+        """
+        Serialize a single email schedule with its user.
+        """
+        schedule = get_object_or_404(
+            EmailSchedule.objects.select_related("user").filter(
+                user__deleted_at__isnull=True
+            ),
+            pk=pk,
+        )
+        return EmailScheduleDetailSerializer(schedule).data
+
+    def get_list_data(self, request, explain=False, replica=True):
+        """
+        Serialize one filtered keyset page of email schedules, optionally with its query plan.
+        It is read from a replica unless `replica` is False.
+        """
+        schedule_filter = ScheduleFilter(request.query_params)
+        paginator = KeysetPaginator(ordering=schedule_filter.ordering)
+        filtered = schedule_filter.filter_queryset(
+            EmailSchedule.objects.select_related("user").filter(
+                user__deleted_at__isnull=True
+            )
+        )
+        with read_from_replica() if replica else nullcontext():
+            schedules, next_cursor = paginator.paginate(filtered, request)
+        serializer = EmailScheduleDetailSerializer(schedules, many=True)
+        data = {"results": serializer.data, "next_cursor": next_cursor}
+        if explain:
+            page_query = paginator.page_queryset(filtered, request)
+            data["query"] = str(page_query.query)
+            data["query_plan"] = page_query.explain()
+        return data
+
+    def get_cached_list(self, request):
+        """
+        Return one filtered page of email schedules through the read cache.
+
+        Cached pages are built from the primary, see `UserAPIView.get_cached_list`.
+        """
+        if is_pinned() or not api_cache.enabled:
+            return self.get_list_data(request)
+        return api_cache.get_or_build(
+            f"schedules:list:{cache_query_key(request)}",
+            ["schedules", "users"],
+            lambda: self.get_list_data(request, replica=False),
+        )
+
+    def get_etag(self, request, pk=None):
+        """
+        Return the ETag of a schedule (from its own and its user's `updated_at`) or of a list
+        page (from the generations of the "schedules" and "users" cache namespaces), or None
+        for a missing schedule or a list while the read cache is disabled.
+        """
+        if not pk:
+            return generation_etag(
+                f"schedules:list:{cache_query_key(request)}", ["schedules", "users"]
+            )
+        versions = EmailSchedule.objects.filter(pk=pk).values_list(
+            "updated_at", "user__updated_at"
+        )
+        if not versions:
+            return None
+        return make_etag("schedule", pk, *versions[0])
+
     def get(self, request, pk=None):
         """
         Handle GET requests to list users or retrieve a specific user.
 
+        Lists are keyset paginated: pass the returned `next_cursor` as `cursor` to fetch the
+        next page, and `page_size` to change the number of rows per page. Payloads are served
+        through the read-through cache in `utils.cache` and carry an ETag answered with a 304
+        on a matching `If-None-Match`. Lists are narrowed
+        and sorted by the declared filters of `user.filters.ScheduleFilter`; with DEBUG on,
+        `explain=1` adds the generated SQL and its query plan to the response.
+
         Returns:
             APIResponse: A response containing the user data with status code and message.
 
@@ -188,29 +478,29 @@ class ScheduleAPIView(APIView):
             Exception: If there is an unknown error occurred in fetching the user.
         """
         try:
-
+            explain = settings.DEBUG and request.query_params.get("explain")
+            etag = None if explain else self.get_etag(request, pk)
+            if etag and is_not_modified(request, etag):
+                return not_modified_response(etag)
             if pk:
-                schedule = get_object_or_404(EmailSchedule, pk=pk)
-                serializer = EmailScheduleDetailSerializer(schedule)
+                data = api_cache.get_or_build(
+                    f"schedule:{pk}",
+                    [f"schedule:{pk}"],
+                    lambda: self.get_detail_data(pk),
+                    dependencies=lambda data: [f"user:{data['user']['id']}"],
+                )
+            elif explain:
+                data = self.get_list_data(request, explain=True)
             else:
-                query_params = request.query_params
-                if query_params:
-                    email_status = query_params.get("status")
-                    date = query_params.get("date")
-                    if email_status and date:
-                        query = Q(email_status=email_status) & Q(scheduled_date=date)
-                    else:
-                        query = Q(email_status=email_status) | Q(scheduled_date=date)
-                    schedule = EmailSchedule.objects.filter(query)
-                    serializer = EmailScheduleDetailSerializer(schedule, many=True)
-                else:
-                    schedule = EmailSchedule.objects.all()
-                    serializer = EmailScheduleDetailSerializer(schedule, many=True)
-            return APIResponse(
-                data=serializer.data,
+                data = self.get_cached_list(request)
+            response = APIResponse(
+                data=data,
                 status_code=status.HTTP_200_OK,
                 message="Fetched Email Schedule Data",
             )
+            if etag:
+                response["ETag"] = etag
+            return response
         except settings.LAZY_EXCEPTIONS as ce:
             return APIResponse(
                 status_code=ce.status_code,
@@ -309,63 +599,723 @@ class ScheduleAPIView(APIView):
             )
 
 
-class SendScheduledEmailAPIView(APIView):
+class ScheduleImportAPIView(APIView):
     """
-    API view to trigger sending scheduled emails based on certain conditions.
-
-    This class defines a method to handle POST requests for triggering the sending of scheduled emails.
-    It calculates the current date and time, determines the end time based on the EMAIL_LIMIT setting,
-    and filters email schedules that are 'Failed' or 'Pending' and fall within the specified time range.
-    For each eligible schedule, it triggers the sending of the email asynchronously.
-    The class returns a response indicating the successful triggering of emails.
+    API view to bulk import email schedules from an uploaded CSV or NDJSON file.
 
-    Attributes:
-        APIView: A class from Django REST framework for creating API views.
+    The file is sent as the multipart field `file`; the format is taken from the `file_format`
+    query parameter, or else from the file name / content type. Rows are streamed and
+    processed in chunks, so memory stays bounded whatever the size of the file.
 
     Methods:
-        post: Handles POST requests to trigger sending scheduled emails.
+        post: Handles POST requests to import email schedules.
 
     Raises:
-        None.
+        LazySettingsException: If there is an exception related to lazy settings.
+        Exception: If there is an unknown error occurred in importing the email schedules.
     """
 
+    parser_classes = [MultiPartParser]
+
     def post(self, request):
         """
-        Handle POST requests to trigger sending scheduled emails.
+        Handle POST requests to import email schedules.
 
-        This method retrieves the current date and time, calculates the end time based on the EMAIL_LIMIT setting,
-        and filters email schedules that are 'Failed' or 'Pending' and fall within the specified time range.
-        For each eligible schedule, it triggers the sending of the email asynchronously using a celery task.
-        Finally, it returns a response indicating the successful triggering of emails.
+        Returns:
+            APIResponse: A response containing the per-row import report with status code and message.
+        Raises:
+            LazySettingsException: If there is an exception related to lazy settings.
+            Exception: If there is an unknown error occurred in importing the email schedules.
+        """
+
+        try:
+            upload = request.FILES.get("file")
+            if upload is None:
+                return APIResponse(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    for_error=True,
+                    message="No file uploaded in the `file` field.",
+                )
+            file_format = detect_format(upload, request.query_params.get("file_format"))
+            if file_format not in ("csv", "ndjson"):
+                return APIResponse(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    for_error=True,
+                    message=f"Unsupported import format: {file_format}",
+                )
+            report = import_schedules(iter_rows(upload, file_format))
+            return APIResponse(
+                data=report,
+                status_code=status.HTTP_200_OK,
+                message=f"{report['created']} Email Schedule(s) imported, {report['failed']} row(s) failed.",
+            )
+        except settings.LAZY_EXCEPTIONS as ce:
+            return APIResponse(
+                status_code=ce.status_code,
+                errors=ce.error_data(),
+                message=ce.message,
+                for_error=True,
+            )
+
+        except Exception as ce:
+            return APIResponse(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                for_error=True,
+                message=f"Unknown error occured in importing Email Schedule(s): {ce}",
+            )
 
-        Parameters:
-            request (Request): The HTTP POST request object.
+
+class ScheduleExportAPIView(APIView):
+    """
+    API view to stream email schedules as a CSV or NDJSON download.
+
+    The format is taken from the `file_format` query parameter (csv by default). Rows are read
+    with a server-side cursor and written as they arrive, so exports of any size run in
+    constant memory.
+    The filters of `user.filters.ScheduleFilter` narrow the export.
+
+    Methods:
+        get: Handles GET requests to export email schedules.
+
+    Raises:
+        LazySettingsException: If there is an exception related to lazy settings.
+        Exception: If there is an unknown error occurred in exporting the email schedules.
+    """
+
+    def get(self, request):
+        """
+        Handle GET requests to export email schedules.
 
         Returns:
-            APIResponse: A response indicating the status of the email triggering operation.
+            StreamingHttpResponse: The streaming download.
+        Raises:
+            LazySettingsException: If there is an exception related to lazy settings.
+            Exception: If there is an unknown error occurred in exporting the email schedules.
+        """
+
+        try:
+            file_format = request.query_params.get("file_format", "csv").lower()
+            if file_format not in CONTENT_TYPES:
+                return APIResponse(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    for_error=True,
+                    message=f"Unsupported export format: {file_format}",
+                )
+            schedules = ScheduleFilter(request.query_params).filter_queryset(
+                EmailSchedule.objects.using(read_database()).filter(
+                    user__deleted_at__isnull=True
+                )
+            )
+            return export_schedules(schedules, file_format)
+        except settings.LAZY_EXCEPTIONS as ce:
+            return APIResponse(
+                status_code=ce.status_code,
+                errors=ce.error_data(),
+                message=ce.message,
+                for_error=True,
+            )
+
+        except Exception as ce:
+            return APIResponse(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                for_error=True,
+                message=f"Unknown error occured in exporting Email Schedule(s): {ce}",
+            )
+
+
+class RecurringScheduleAPIView(APIView):
+    """
+    API view for recurring email schedules.
+
+    A recurring schedule stores a recurrence rule and time zone instead of one row per
+    email; its occurrences are expanded by the dispatcher only when they become due (see
+    `user.recurrence`).
+
+    Methods:
+        get: Handles GET requests to list recurring schedules or retrieve one.
+        post: Handles POST requests to create a recurring schedule.
+        delete: Handles DELETE requests to cancel a recurring schedule.
+
+    Raises:
+        LazySettingsException: If there is an exception related to lazy settings.
+        Exception: If there is an unknown error occurred in handling recurring schedules.
+    """
+
+    def get(self, request, pk=None):
+        """
+        Handle GET requests to list recurring schedules (keyset paginated) or retrieve one.
 
+        Returns:
+            APIResponse: A response containing the recurring schedule data with status code and message.
         Raises:
-            None.
+            LazySettingsException: If there is an exception related to lazy settings.
+            Exception: If there is an unknown error occurred in fetching the recurring schedules.
         """
 
-        now = datetime.now()
-        current_date = now.date()
-        current_time = now.time()
+        try:
+            if pk:
+                recurring = get_object_or_404(RecurringSchedule, pk=pk)
+                data = RecurringScheduleSerializer(recurring).data
+            else:
+                recurrences, next_cursor = KeysetPaginator(ordering=("id",)).paginate(
+                    RecurringSchedule.objects.all(), request
+                )
+                serializer = RecurringScheduleSerializer(recurrences, many=True)
+                data = {"results": serializer.data, "next_cursor": next_cursor}
+            return APIResponse(
+                data=data,
+                status_code=status.HTTP_200_OK,
+                message="Fetched Recurring Schedule Data",
+            )
+        except settings.LAZY_EXCEPTIONS as ce:
+            return APIResponse(
+                status_code=ce.status_code,
+                errors=ce.error_data(),
+                message=ce.message,
+                for_error=True,
+            )
+
+        except Exception as ce:
+            return APIResponse(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                for_error=True,
+                message=f"Unknown error occured in fetching Recurring Schedule: {ce}",
+            )
 
-        # EMAIL_LIMIT is a variable used to define the span of time within which emails can be sent.
-        # If EMAIL_LIMIT is set to 1 and the endpoint is triggered at 5:00, it will cover all emails sent between 5:00 and 6:00.
-        # If EMAIL_LIMIT is set to 2, it will cover emails sent from 5:00 to 7:00.
-        email_limit = int(settings.EMAIL_LIMIT)
-        email_limit_time = (now + timedelta(hours=email_limit)).time()
-        email_schedules = EmailSchedule.objects.filter(
-            Q(email_status="Failed") | Q(email_status="Pending"),
-            scheduled_date=current_date,
-            scheduled_time__gte=current_time,  # Including current time
-            scheduled_time__lt=email_limit_time,
-        )
-        for schedule in email_schedules:
-            send_scheduled_email.delay(email_schedule_id=schedule.id)
+    def post(self, request):
+        """
+        Handle POST requests to create a recurring schedule.
+
+        Returns:
+            APIResponse: A response containing the created recurring schedule with status code and message.
+        Raises:
+            LazySettingsException: If there is an exception related to lazy settings.
+            Exception: If there is an unknown error occurred in creating the recurring schedule.
+        """
+
+        try:
+            serializer = RecurringScheduleSerializer(data=request.data)
+            if not serializer.is_valid():
+                return APIResponse(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    errors=serializer.errors,
+                    for_error=True,
+                    message="Invalid Recurring Schedule.",
+                )
+            serializer.save()
+            return APIResponse(
+                data=serializer.data,
+                status_code=status.HTTP_201_CREATED,
+                message="Recurring Schedule created Successfully.",
+            )
+        except settings.LAZY_EXCEPTIONS as ce:
+            return APIResponse(
+                status_code=ce.status_code,
+                errors=ce.error_data(),
+                message=ce.message,
+                for_error=True,
+            )
+
+        except Exception as ce:
+            return APIResponse(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                for_error=True,
+                message=f"Unknown error occured in creating Recurring Schedule: {ce}",
+            )
+
+    def delete(self, request, pk):
+        """
+        Handle DELETE requests to cancel a recurring schedule.
+
+        Occurrences already expanded into email schedules are kept.
+
+        Returns:
+            APIResponse: A response indicating the success or failure of the cancellation.
+        Raises:
+            LazySettingsException: If there is an exception related to lazy settings.
+            Exception: If there is an unknown error occurred in cancelling the recurring schedule.
+        """
+
+        try:
+            cancelled = RecurringSchedule.objects.filter(pk=pk).update(
+                active=False, next_run_at=None, updated_at=timezone.now()
+            )
+            if not cancelled:
+                raise Http404
+            return APIResponse(
+                status_code=status.HTTP_200_OK,
+                message=f"Recurring Schedule with id : {pk} cancelled successfully.",
+            )
+        except Http404:
+            return APIResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                for_error=True,
+                message=f"Recurring Schedule with id : {pk} not found.",
+            )
+        except settings.LAZY_EXCEPTIONS as ce:
+            return APIResponse(
+                status_code=ce.status_code,
+                errors=ce.error_data(),
+                message=ce.message,
+                for_error=True,
+            )
+
+        except Exception as ce:
+            return APIResponse(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                for_error=True,
+                message=f"Unknown error occured in cancelling Recurring Schedule: {ce}",
+            )
+
+
+class CampaignAPIView(APIView):
+    """
+    API view for campaigns sent to a segment of users.
+
+    Creating a campaign only stores its segment and send time; the recipients are resolved
+    chunk by chunk when it is dispatched (see `user.tasks.dispatch_campaigns`), and its
+    counters report the progress.
+
+    Methods:
+        get: Handles GET requests to list campaigns or retrieve one with its progress.
+        post: Handles POST requests to create a campaign.
+        delete: Handles DELETE requests to cancel a campaign not yet fully dispatched.
+
+    Raises:
+        LazySettingsException: If there is an exception related to lazy settings.
+        Exception: If there is an unknown error occurred in handling campaigns.
+    """
+
+    def get(self, request, pk=None):
+        """
+        Handle GET requests to list campaigns (keyset paginated) or retrieve one.
+
+        Returns:
+            APIResponse: A response containing the campaign data with status code and message.
+        Raises:
+            LazySettingsException: If there is an exception related to lazy settings.
+            Exception: If there is an unknown error occurred in fetching the campaigns.
+        """
+
+        try:
+            if pk:
+                campaign = get_object_or_404(Campaign, pk=pk)
+                data = CampaignSerializer(campaign).data
+            else:
+                campaigns, next_cursor = KeysetPaginator(ordering=("-id",)).paginate(
+                    Campaign.objects.all(), request
+                )
+                serializer = CampaignSerializer(campaigns, many=True)
+                data = {"results": serializer.data, "next_cursor": next_cursor}
+            return APIResponse(
+                data=data,
+                status_code=status.HTTP_200_OK,
+                message="Fetched Campaign Data",
+            )
+        except Http404:
+            return APIResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                for_error=True,
+                message=f"Campaign with id : {pk} not found.",
+            )
+        except settings.LAZY_EXCEPTIONS as ce:
+            return APIResponse(
+                status_code=ce.status_code,
+                errors=ce.error_data(),
+                message=ce.message,
+                for_error=True,
+            )
+
+        except Exception as ce:
+            return APIResponse(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                for_error=True,
+                message=f"Unknown error occured in fetching Campaign: {ce}",
+            )
+
+    def post(self, request):
+        """
+        Handle POST requests to create a campaign.
+
+        Returns:
+            APIResponse: A response containing the created campaign with status code and message.
+        Raises:
+            LazySettingsException: If there is an exception related to lazy settings.
+            Exception: If there is an unknown error occurred in creating the campaign.
+        """
+
+        try:
+            serializer = CampaignSerializer(data=request.data)
+            if not serializer.is_valid():
+                return APIResponse(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    errors=serializer.errors,
+                    for_error=True,
+                    message="Invalid Campaign.",
+                )
+            serializer.save()
+            return APIResponse(
+                data=serializer.data,
+                status_code=status.HTTP_201_CREATED,
+                message="Campaign created Successfully.",
+            )
+        except settings.LAZY_EXCEPTIONS as ce:
+            return APIResponse(
+                status_code=ce.status_code,
+                errors=ce.error_data(),
+                message=ce.message,
+                for_error=True,
+            )
+
+        except Exception as ce:
+            return APIResponse(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                for_error=True,
+                message=f"Unknown error occured in creating Campaign: {ce}",
+            )
+
+    def delete(self, request, pk):
+        """
+        Handle DELETE requests to cancel a campaign that is not fully dispatched yet.
+
+        Send tasks already published for earlier chunks still run.
+
+        Returns:
+            APIResponse: A response indicating the success or failure of the cancellation.
+        Raises:
+            LazySettingsException: If there is an exception related to lazy settings.
+            Exception: If there is an unknown error occurred in cancelling the campaign.
+        """
+
+        try:
+            cancelled = Campaign.objects.filter(
+                pk=pk, status__in=Campaign.PENDING_STATUSES
+            ).update(status="Cancelled", updated_at=timezone.now())
+            if not cancelled:
+                raise Http404
+            return APIResponse(
+                status_code=status.HTTP_200_OK,
+                message=f"Campaign with id : {pk} cancelled successfully.",
+            )
+        except Http404:
+            return APIResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                for_error=True,
+                message=f"Pending Campaign with id : {pk} not found.",
+            )
+        except settings.LAZY_EXCEPTIONS as ce:
+            return APIResponse(
+                status_code=ce.status_code,
+                errors=ce.error_data(),
+                message=ce.message,
+                for_error=True,
+            )
+
+        except Exception as ce:
+            return APIResponse(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                for_error=True,
+                message=f"Unknown error occured in cancelling Campaign: {ce}",
+            )
+
+
+class WebhookSubscriptionAPIView(APIView):
+    """
+    API view for webhook subscriptions pushing schedule status changes to downstream systems.
+
+    Methods:
+        get: Handles GET requests to list subscriptions or retrieve one.
+        post: Handles POST requests to subscribe a URL.
+        delete: Handles DELETE requests to cancel a subscription.
+
+    Raises:
+        LazySettingsException: If there is an exception related to lazy settings.
+        Exception: If there is an unknown error occurred in handling webhook subscriptions.
+    """
+
+    def get(self, request, pk=None):
+        """
+        Handle GET requests to list subscriptions (keyset paginated) or retrieve one.
+
+        Returns:
+            APIResponse: A response containing the subscription data with status code and message.
+        Raises:
+            LazySettingsException: If there is an exception related to lazy settings.
+            Exception: If there is an unknown error occurred in fetching the subscriptions.
+        """
+
+        try:
+            if pk:
+                subscription = get_object_or_404(WebhookSubscription, pk=pk)
+                data = WebhookSubscriptionSerializer(subscription).data
+            else:
+                subscriptions, next_cursor = KeysetPaginator(ordering=("id",)).paginate(
+                    WebhookSubscription.objects.all(), request
+                )
+                serializer = WebhookSubscriptionSerializer(subscriptions, many=True)
+                data = {"results": serializer.data, "next_cursor": next_cursor}
+            return APIResponse(
+                data=data,
+                status_code=status.HTTP_200_OK,
+                message="Fetched Webhook Subscription Data",
+            )
+        except Http404:
+            return APIResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                for_error=True,
+                message=f"Webhook Subscription with id : {pk} not found.",
+            )
+        except settings.LAZY_EXCEPTIONS as ce:
+            return APIResponse(
+                status_code=ce.status_code,
+                errors=ce.error_data(),
+                message=ce.message,
+                for_error=True,
+            )
+
+        except Exception as ce:
+            return APIResponse(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                for_error=True,
+                message=f"Unknown error occured in fetching Webhook Subscription: {ce}",
+            )
+
+    def post(self, request):
+        """
+        Handle POST requests to subscribe a URL to schedule status changes.
+
+        Returns:
+            APIResponse: A response containing the subscription, including its signing secret.
+        Raises:
+            LazySettingsException: If there is an exception related to lazy settings.
+            Exception: If there is an unknown error occurred in creating the subscription.
+        """
+
+        try:
+            serializer = WebhookSubscriptionSerializer(data=request.data)
+            if not serializer.is_valid():
+                return APIResponse(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    errors=serializer.errors,
+                    for_error=True,
+                    message="Invalid Webhook Subscription.",
+                )
+            subscription = serializer.save()
+            return APIResponse(
+                # The secret is shown once, at creation; reads never return it.
+                data={**serializer.data, "secret": subscription.secret},
+                status_code=status.HTTP_201_CREATED,
+                message="Webhook Subscription created Successfully.",
+            )
+        except settings.LAZY_EXCEPTIONS as ce:
+            return APIResponse(
+                status_code=ce.status_code,
+                errors=ce.error_data(),
+                message=ce.message,
+                for_error=True,
+            )
+
+        except Exception as ce:
+            return APIResponse(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                for_error=True,
+                message=f"Unknown error occured in creating Webhook Subscription: {ce}",
+            )
+
+    def delete(self, request, pk):
+        """
+        Handle DELETE requests to cancel a subscription.
+
+        Returns:
+            APIResponse: A response indicating the success or failure of the cancellation.
+        Raises:
+            LazySettingsException: If there is an exception related to lazy settings.
+            Exception: If there is an unknown error occurred in cancelling the subscription.
+        """
+
+        try:
+            cancelled = WebhookSubscription.objects.filter(pk=pk, active=True).update(
+                active=False, updated_at=timezone.now()
+            )
+            if not cancelled:
+                raise Http404
+            return APIResponse(
+                status_code=status.HTTP_200_OK,
+                message=f"Webhook Subscription with id : {pk} cancelled successfully.",
+            )
+        except Http404:
+            return APIResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                for_error=True,
+                message=f"Active Webhook Subscription with id : {pk} not found.",
+            )
+        except settings.LAZY_EXCEPTIONS as ce:
+            return APIResponse(
+                status_code=ce.status_code,
+                errors=ce.error_data(),
+                message=ce.message,
+                for_error=True,
+            )
+
+        except Exception as ce:
+            return APIResponse(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                for_error=True,
+                message=f"Unknown error occured in cancelling Webhook Subscription: {ce}",
+            )
+
+
+class ScheduleHistoryAPIView(APIView):
+    """
+    API view listing live and archived email schedules together.
+
+    Reads go through `user.archive.ScheduleRecords`, the union of `email_schedules` and the
+    `email_schedule_history` archive, with the same filters, orderings and keyset
+    pagination as the schedule list. Rows are flat (`user_id` instead of a nested user) and
+    carry an `archived` flag.
+
+    Methods:
+        get: Handles GET requests to list schedules across both tables.
+
+    Raises:
+        LazySettingsException: If there is an exception related to lazy settings.
+        Exception: If there is an unknown error occurred in fetching the schedules.
+    """
+
+    def get(self, request):
+        """
+        Handle GET requests to list schedules across the live and archived tables.
+
+        Returns:
+            APIResponse: A response containing one page of schedules and the next cursor.
+        Raises:
+            LazySettingsException: If there is an exception related to lazy settings.
+            Exception: If there is an unknown error occurred in fetching the schedules.
+        """
+
+        try:
+            schedule_filter = ScheduleFilter(request.query_params)
+            paginator = KeysetPaginator(ordering=schedule_filter.ordering)
+            with read_from_replica():
+                rows, next_cursor = paginator.paginate(
+                    schedule_filter.filter_queryset(ScheduleRecords()), request
+                )
+            return APIResponse(
+                data={"results": rows, "next_cursor": next_cursor},
+                status_code=status.HTTP_200_OK,
+                message="Fetched Email Schedule History",
+            )
+        except settings.LAZY_EXCEPTIONS as ce:
+            return APIResponse(
+                status_code=ce.status_code,
+                errors=ce.error_data(),
+                message=ce.message,
+                for_error=True,
+            )
+
+        except Exception as ce:
+            return APIResponse(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                for_error=True,
+                message=f"Unknown error occured in fetching Email Schedule History: {ce}",
+            )
+
+
+class SendScheduledEmailAPIView(APIView):
+    """
+    API view to trigger sending scheduled emails based on certain conditions.
+
+    This class defines a method to handle POST requests for triggering the sending of scheduled emails.
+    It determines the time window based on the EMAIL_LIMIT setting and queues a relay of every
+    unpublished outbox row that becomes available within that window (including missed and failed
+    schedules). The class returns 202 with the id of the relay task, see `JobStatusAPIView`.
+
+    Attributes:
+        APIView: A class from Django REST framework for creating API views.
+
+    Methods:
+        post: Handles POST requests to trigger sending scheduled emails.
+
+    Raises:
+        None.
+    """
+
+    def post(self, request):
+        """
+        Handle POST requests to trigger sending scheduled emails.
+
+        This method calculates the time window based on the EMAIL_LIMIT setting and queues the outbox
+        relay for it as a celery task, so a large window never blocks a web worker. The relay claims
+        outbox rows in batches inside a transaction, publishes them as batched celery tasks and marks
+        them as published, so a crash part way through never loses a send.
+
+        Parameters:
+            request (Request): The HTTP POST request object.
+
+        Returns:
+            APIResponse: A 202 response carrying the task id of the queued relay.
+
+        Raises:
+            None.
+        """
+
+        # EMAIL_LIMIT is a variable used to define the span of time within which emails can be sent.
+        # If EMAIL_LIMIT is set to 1 and the endpoint is triggered at 5:00, it will cover all emails sent between 5:00 and 6:00.
+        # If EMAIL_LIMIT is set to 2, it will cover emails sent from 5:00 to 7:00.
+        email_limit = int(settings.EMAIL_LIMIT)
+        result = relay_outbox.apply_async(kwargs={"window_minutes": email_limit * 60})
+        return APIResponse(
+            data={"task_id": result.id},
+            status_code=status.HTTP_202_ACCEPTED,
+            message="Email(s) Trigger Queued",
+        )
+
+
+class CacheStatsAPIView(APIView):
+    """
+    API view exposing the hit and miss counters of the API read cache of this process.
+
+    Methods:
+        get: Handles GET requests to fetch the cache statistics.
+    """
+
+    def get(self, request):
+        """
+        Handle GET requests to fetch the cache statistics.
+
+        Returns:
+            APIResponse: A response containing the cache counters with status code and message.
+        """
+
+        return APIResponse(
+            data=api_cache.get_stats(),
+            status_code=status.HTTP_200_OK,
+            message="Fetched Cache Statistics",
+        )
+
+
+class JobStatusAPIView(APIView):
+    """
+    API view reporting the state of a background job, e.g. the purge of a deleted user.
+
+    Methods:
+        get: Handles GET requests to fetch the state of a job.
+    """
+
+    def get(self, request, job_id):
+        """
+        Handle GET requests to fetch the state of a job.
+
+        Returns:
+            APIResponse: A response containing the celery state and progress or result of the job.
+        """
+
+        result = AsyncResult(job_id)
+        info = result.info
+        if isinstance(info, Exception):
+            info = str(info)
         return APIResponse(
+            data={"job_id": job_id, "state": result.state, "info": info},
             status_code=status.HTTP_200_OK,
-            message=f"Email(s) Triggered",
+            message="Fetched Job Status",
         )
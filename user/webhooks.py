@@ -0,0 +1,221 @@
+"""
+Module containing the batched delivery of schedule status changes to webhook subscribers.
+
+`record_send_results` appends one `WebhookEvent` per status change, in the same transaction
+as the change, and asks for a delivery WEBHOOK_FLUSH_MS later; further changes within that
+time join the same delivery. Each subscriber then receives its pending events as JSON POSTs
+of at most WEBHOOK_BATCH_SIZE events, sent over the pooled keep-alive session of the worker
+(`utils.email_backends.get_http_session`), which retries refused and throttled calls with
+backoff. A subscriber that still fails is retried with exponential backoff up to
+WEBHOOK_MAX_BACKOFF_SECONDS; its cursor only advances on a 2xx answer, so no event is lost.
+A run holds a WEBHOOK_LEASE_SECONDS lease on the subscriber instead of a row lock, so no
+transaction stays open while posting.
+
+Event ids are handed out before the transactions commit, so a lower id can become visible
+after a higher one. The cursor therefore only moves over events older than
+WEBHOOK_COMMIT_LAG_MS and stops at the first younger one; a transaction that stays open
+longer than the lag after queueing its events can still be passed over.
+
+Payload:
+    {"events": [{"id": 1, "schedule_id": 42, "status": "Done", "occurred_at": "..."}]}
+signed with `X-Webhook-Signature: sha256=<hex HMAC of the body with the secret>`.
+
+Functions:
+- queue_events: Append the status changes of one send result.
+- claim: Lease a due subscriber for one delivery run.
+- deliver: Push the pending events of one subscriber.
+- purge_delivered_events: Remove events every active subscriber has received.
+"""
+
+import hashlib
+import hmac
+import json
+from datetime import timedelta
+from itertools import takewhile
+
+import requests
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from utils.email_backends import get_http_session
+
+from .models import WebhookEvent, WebhookSubscription
+
+STATUS_NAMES = {code: name for name, code in WebhookEvent.STATUS_CODES.items()}
+
+
+def queue_events(transitions):
+    """
+    Append one event per status change if anyone is subscribed.
+
+    Parameters:
+    transitions (iterable): Tuples of (schedule_id, status name).
+
+    Returns:
+    int: The number of events queued.
+    """
+    if not WebhookSubscription.objects.filter(active=True).exists():
+        return 0
+    now = timezone.now()
+    events = WebhookEvent.objects.bulk_create(
+        WebhookEvent(
+            schedule_id=schedule_id,
+            status=WebhookEvent.STATUS_CODES[status],
+            occurred_at=now,
+        )
+        for schedule_id, status in transitions
+    )
+    return len(events)
+
+
+def sign(secret, body):
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def claim(subscription_id):
+    """
+    Lease a due subscriber for one delivery run.
+
+    The lease is taken with a single conditional UPDATE, so concurrent runs never post to
+    the same subscriber and no row lock is held while posting.
+
+    Parameters:
+    subscription_id (int): The subscriber to claim.
+
+    Returns:
+    WebhookSubscription: The leased subscriber, or None if it is not due or already
+    leased by another run.
+    """
+    now = timezone.now()
+    lease = now + timedelta(seconds=int(settings.WEBHOOK_LEASE_SECONDS))
+    claimed = (
+        WebhookSubscription.objects.filter(pk=subscription_id, active=True)
+        .filter(Q(retry_at__isnull=True) | Q(retry_at__lte=now))
+        .filter(Q(claimed_until__isnull=True) | Q(claimed_until__lte=now))
+        .update(claimed_until=lease)
+    )
+    if not claimed:
+        return None
+    return WebhookSubscription.objects.filter(
+        pk=subscription_id, claimed_until=lease
+    ).first()
+
+
+def deliver(subscription, batch_size=None):
+    """
+    Push the settled events after the subscriber's cursor in batches.
+
+    The POSTs run outside any transaction. After each one the new cursor, or the
+    backoff, is stored together with a renewed lease, and the lease is released at the
+    end. If the lease ran out meanwhile the run stops without storing anything, and the
+    next holder may post the batch again.
+
+    Parameters:
+    subscription (WebhookSubscription): The subscriber, leased with `claim`.
+    batch_size (int, optional): Events per POST, defaults to WEBHOOK_BATCH_SIZE.
+
+    Returns:
+    int: The number of events delivered.
+    """
+    batch_size = int(batch_size or settings.WEBHOOK_BATCH_SIZE)
+    session = get_http_session(retries=int(settings.WEBHOOK_RETRIES))
+    wanted = {WebhookEvent.STATUS_CODES[name] for name in subscription.events}
+    settled_before = timezone.now() - timedelta(
+        milliseconds=int(settings.WEBHOOK_COMMIT_LAG_MS)
+    )
+    delivered = 0
+    while True:
+        events = list(
+            WebhookEvent.objects.filter(id__gt=subscription.last_event_id)
+            .order_by("id")
+            .values_list("id", "schedule_id", "status", "occurred_at")[:batch_size]
+        )
+        fetched = len(events)
+        # Stop at the first event whose transaction may not have settled yet.
+        events = list(takewhile(lambda event: event[3] < settled_before, events))
+        if not events:
+            break
+        payload = [
+            {
+                "id": event_id,
+                "schedule_id": schedule_id,
+                "status": STATUS_NAMES[status],
+                "occurred_at": occurred_at,
+            }
+            for event_id, schedule_id, status, occurred_at in events
+            if status in wanted
+        ]
+        if payload and not _post(session, subscription, payload):
+            subscription.failures += 1
+            backoff = min(
+                2**subscription.failures, int(settings.WEBHOOK_MAX_BACKOFF_SECONDS)
+            )
+            subscription.retry_at = timezone.now() + timedelta(seconds=backoff)
+            break
+        subscription.last_event_id = events[-1][0]
+        subscription.failures, subscription.retry_at = 0, None
+        if not _store(subscription, renew=True):
+            return delivered
+        delivered += len(payload)
+        if len(events) < fetched or fetched < batch_size:
+            break
+    _store(subscription, renew=False)
+    return delivered
+
+
+def _store(subscription, renew):
+    # Conditional on the lease still being ours, so a run that outlived it cannot move
+    # the cursor of the run that took over.
+    held = subscription.claimed_until
+    now = timezone.now()
+    subscription.claimed_until = (
+        now + timedelta(seconds=int(settings.WEBHOOK_LEASE_SECONDS)) if renew else None
+    )
+    stored = WebhookSubscription.objects.filter(
+        pk=subscription.pk, claimed_until=held
+    ).update(
+        last_event_id=subscription.last_event_id,
+        failures=subscription.failures,
+        retry_at=subscription.retry_at,
+        claimed_until=subscription.claimed_until,
+        updated_at=now,
+    )
+    return stored == 1
+
+
+def _post(session, subscription, payload):
+    body = json.dumps({"events": payload}, cls=DjangoJSONEncoder).encode()
+    try:
+        response = session.post(
+            subscription.url,
+            data=body,
+            headers={
+                "Content-Type": "application/json",
+                "X-Webhook-Signature": sign(subscription.secret, body),
+            },
+            timeout=int(settings.WEBHOOK_TIMEOUT),
+        )
+    except requests.RequestException:
+        return False
+    return 200 <= response.status_code < 300
+
+
+def purge_delivered_events():
+    """
+    Remove the events every active subscriber has received.
+
+    Returns:
+    int: The number of removed events.
+    """
+    delivered_up_to = WebhookSubscription.objects.filter(active=True).aggregate(
+        cursor=Min("last_event_id")
+    )["cursor"]
+    if delivered_up_to is None:
+        delivered_up_to = (
+            WebhookEvent.objects.order_by("-id").values_list("id", flat=True).first()
+            or 0
+        )
+    deleted, _ = WebhookEvent.objects.filter(id__lte=delivered_up_to).delete()
+    return deleted
@@ -0,0 +1,38 @@
+"""
+Module containing helpers for running ORM and broker code from async views.
+
+Django 3.2 has no async ORM, so async views hand each unit of database work to a worker
+thread. `database_sync_to_async` runs it outside the single thread-sensitive executor (so
+concurrent requests do not queue behind each other) and closes stale connections around it,
+the way Django does around every synchronous request.
+
+Functions:
+- database_sync_to_async: Wrap a synchronous, database-touching function for use with await.
+"""
+
+import functools
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+
+def database_sync_to_async(func):
+    """
+    Wrap `func` so it can be awaited and runs in a worker thread with fresh connections.
+
+    Parameters:
+    func (callable): Synchronous function using the ORM or the celery producer.
+
+    Returns:
+    callable: Coroutine function with the same arguments.
+    """
+
+    @functools.wraps(func)
+    def inner(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(inner, thread_sensitive=False)
@@ -0,0 +1,86 @@
+"""
+Module containing a compact in-memory Bloom filter.
+
+A Bloom filter answers "definitely not present" or "possibly present" for a set of strings
+using a fixed bit array, so membership checks cost a single hash and a few bit lookups no
+matter how large the set is.
+
+Classes:
+- BloomFilter: Fixed-capacity Bloom filter over strings with a configurable error rate.
+"""
+
+import math
+from hashlib import blake2b
+
+
+class BloomFilter:
+    """
+    Bloom filter over strings backed by a bytearray.
+
+    The k bit positions of an item are derived from one 128-bit blake2b digest using
+    double hashing, so adding or checking an item costs one hash call.
+
+    Attributes:
+        capacity (int): Number of items the filter is sized for.
+        error_rate (float): False positive rate expected at full capacity.
+        size (int): Number of bits in the filter.
+        hash_count (int): Number of bit positions per item.
+        count (int): Number of items added so far.
+
+    Methods:
+        add: Add an item to the filter.
+        update: Add several items to the filter.
+        __contains__: Check whether an item may be in the filter.
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = max(int(capacity), 1)
+        self.error_rate = error_rate
+        self.size = max(
+            int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)), 8
+        )
+        self.hash_count = max(int(round(self.size / self.capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        size = self.size
+        return [(first + i * second) % size for i in range(self.hash_count)]
+
+    def add(self, item):
+        """
+        Add an item to the filter.
+        """
+        bits = self.bits
+        for position in self._positions(item):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def update(self, items):
+        """
+        Add several items to the filter.
+        """
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item):
+        digest = blake2b(item.encode(), digest_size=16).digest()
+        position = int.from_bytes(digest[:8], "little")
+        step = int.from_bytes(digest[8:], "little") | 1
+        bits, size = self.bits, self.size
+        for _ in range(self.hash_count):
+            index = position % size
+            if not bits[index >> 3] & (1 << (index & 7)):
+                return False
+            position += step
+        return True
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def is_full(self):
+        return self.count >= self.capacity
@@ -0,0 +1,113 @@
+"""
+Module containing an in-memory buffer that writes model rows in bulk.
+
+Writing a log row per event costs a round trip and a transaction each. `BufferedBulkWriter`
+collects the rows in memory and writes them with one `bulk_create` once `max_rows` rows are
+buffered or the oldest one has waited `max_delay_ms`, whichever comes first. The buffer is
+flushed once more at interpreter exit; long-running workers should also flush it from their
+shutdown hooks (see `user.delivery`).
+
+Rows still buffered when a process is killed are lost, so the writer is meant for
+diagnostics, never for state the application depends on.
+
+Classes:
+- BufferedBulkWriter: Thread-safe, per-process buffer flushed with bulk_create.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedBulkWriter:
+    """
+    Buffer of unsaved model instances written with `bulk_create`.
+
+    Attributes:
+        model (Model): The model of the buffered instances.
+        max_rows (int): Flush as soon as this many rows are buffered.
+        max_delay_ms (int): Flush once the oldest buffered row is this old.
+
+    Methods:
+        add: Buffer one instance.
+        extend: Buffer several instances.
+        flush_if_due: Flush if the oldest buffered row is older than max_delay_ms.
+        flush: Write every buffered row now.
+    """
+
+    def __init__(self, model, max_rows=500, max_delay_ms=1000):
+        self.model = model
+        self.max_rows = max_rows
+        self.max_delay_ms = max_delay_ms
+        self._rows = []
+        self._first_at = None
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def add(self, instance):
+        """
+        Buffer one instance, flushing if a limit is reached.
+        """
+        self.extend([instance])
+
+    def extend(self, instances):
+        """
+        Buffer several instances, flushing if a limit is reached.
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked child: the rows belong to the parent, which flushes them itself.
+                self._rows, self._first_at, self._pid = [], None, os.getpid()
+            if self._first_at is None:
+                self._first_at = time.monotonic()
+            self._rows.extend(instances)
+            due = len(self._rows) >= self.max_rows or self._expired()
+        if due:
+            self.flush()
+
+    def _expired(self):
+        return (
+            self._first_at is not None
+            and (time.monotonic() - self._first_at) * 1000 >= self.max_delay_ms
+        )
+
+    def flush_if_due(self):
+        """
+        Flush if the oldest buffered row is older than max_delay_ms.
+
+        Returns:
+            int: The number of rows written.
+        """
+        with self._lock:
+            due = self._expired()
+        return self.flush() if due else 0
+
+    def flush(self):
+        """
+        Write every buffered row with one `bulk_create`.
+
+        Failures are logged and the rows dropped, so logging never breaks the caller.
+
+        Returns:
+            int: The number of rows written.
+        """
+        with self._lock:
+            rows, self._rows, self._first_at = self._rows, [], None
+        if not rows:
+            return 0
+        try:
+            self.model.objects.bulk_create(rows, batch_size=self.max_rows)
+        except Exception:
+            logger.exception(
+                "Dropped %d buffered %s rows.", len(rows), self.model.__name__
+            )
+            return 0
+        return len(rows)
+
+    def __len__(self):
+        return len(self._rows)
@@ -0,0 +1,219 @@
+"""
+Module containing a read-through cache for serialized API payloads.
+
+Entries live in Django's cache framework behind a small per-process L1 with a short TTL. The
+backing cache must be shared by the web and worker processes (Redis or Memcached), since the
+workers bump generations the web processes validate against; API_CACHE_ENABLED is off by
+default, and refused outside tests, with a process-local backend. Every entry records the generation tokens of the namespaces
+it depends on (e.g. "user:42", "users"); bumping a namespace replaces its token, so exactly
+the dependent entries stop validating without having to find or delete them.
+
+Classes:
+- ReadThroughCache: Generation-validated cache with an L1, stampede protection and hit stats.
+
+Functions:
+- cache_query_key: Canonical query string of a request for list cache keys.
+
+Objects:
+- api_cache: The shared instance used by the API views and the model signals.
+"""
+
+import threading
+import time
+import uuid
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+
+MISSING = object()
+
+
+class ReadThroughCache:
+    """
+    Read-through cache validated by namespace generation tokens.
+
+    Methods:
+        get_or_build: Return the cached payload for a key or build and store it.
+        bump: Invalidate every entry depending on the given namespaces.
+        clear: Drop the L1 and the backing cache.
+        get_stats: Return hit and miss counters of this process.
+    """
+
+    def __init__(self, prefix="api"):
+        self.prefix = prefix
+        self.local = {}
+        self.local_bumps = {}
+        self.lock = threading.Lock()
+        self.stats = {"l1_hits": 0, "hits": 0, "misses": 0, "stampede_waits": 0}
+
+    @property
+    def backend(self):
+        return caches[settings.API_CACHE_ALIAS]
+
+    @property
+    def enabled(self):
+        return settings.API_CACHE_ENABLED
+
+    def _key(self, key):
+        return f"{self.prefix}:entry:{key}"
+
+    def _generation_key(self, namespace):
+        return f"{self.prefix}:gen:{namespace}"
+
+    def _count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def generations(self, namespaces):
+        """
+        Return the current token of every namespace, creating missing ones.
+        """
+        keys = {self._generation_key(namespace): namespace for namespace in namespaces}
+        found = self.backend.get_many(list(keys))
+        tokens = {}
+        for key, namespace in keys.items():
+            token = found.get(key)
+            if token is None:
+                self.backend.add(key, uuid.uuid4().hex, timeout=None)
+                token = self.backend.get(key)
+            tokens[namespace] = token
+        return tokens
+
+    def bump(self, *namespaces):
+        """
+        Invalidate every entry depending on one of the given namespaces.
+        """
+        if not namespaces:
+            return
+        now = time.monotonic()
+        with self.lock:
+            for namespace in namespaces:
+                self.local_bumps[namespace] = now
+        self.backend.set_many(
+            {
+                self._generation_key(namespace): uuid.uuid4().hex
+                for namespace in namespaces
+            },
+            timeout=None,
+        )
+
+    def _local_get(self, key):
+        entry = self.local.get(key)
+        if entry is None:
+            return MISSING
+        stored_at, namespaces, payload = entry
+        if time.monotonic() - stored_at > settings.API_CACHE_L1_TTL or any(
+            self.local_bumps.get(namespace, 0) >= stored_at for namespace in namespaces
+        ):
+            self.local.pop(key, None)
+            return MISSING
+        return payload
+
+    def _local_set(self, key, namespaces, payload):
+        if settings.API_CACHE_L1_TTL <= 0:
+            return
+        if len(self.local) >= settings.API_CACHE_L1_SIZE:
+            self.local.clear()
+        self.local[key] = (time.monotonic(), tuple(namespaces), payload)
+
+    def _shared_get(self, key, namespaces):
+        entry = self.backend.get(self._key(key))
+        if entry is None:
+            return MISSING, None
+        tokens = self.generations(entry["deps"].keys() | set(namespaces))
+        if any(
+            tokens[namespace] != token for namespace, token in entry["deps"].items()
+        ):
+            return MISSING, tokens
+        return entry["data"], tokens
+
+    def get_or_build(self, key, namespaces, builder, dependencies=None):
+        """
+        Return the cached payload for `key`, or build, store and return it.
+
+        Parameters:
+            key (str): Identifies the payload, e.g. "user:42" or "users:list:<query>".
+            namespaces (iterable): Namespaces the payload is known to depend on up front.
+            builder (callable): Builds the payload on a miss.
+            dependencies (callable, optional): Returns further namespaces from the built
+                payload, e.g. the user of a schedule.
+
+        Returns:
+            The payload.
+        """
+        if not self.enabled:
+            return builder()
+        namespaces = tuple(namespaces)
+        payload = self._local_get(key)
+        if payload is not MISSING:
+            self._count("l1_hits")
+            return payload
+        payload, tokens = self._shared_get(key, namespaces)
+        if payload is not MISSING:
+            self._count("hits")
+            self._local_set(key, namespaces, payload)
+            return payload
+
+        lock_key = f"{self.prefix}:lock:{key}"
+        owner = self.backend.add(lock_key, 1, timeout=settings.API_CACHE_LOCK_TIMEOUT)
+        if not owner:
+            # Another worker is building this entry: wait briefly for it instead of
+            # sending the same query to the database.
+            self._count("stampede_waits")
+            deadline = time.monotonic() + settings.API_CACHE_LOCK_TIMEOUT
+            while time.monotonic() < deadline:
+                time.sleep(0.01)
+                payload, _ = self._shared_get(key, namespaces)
+                if payload is not MISSING:
+                    self._count("hits")
+                    self._local_set(key, namespaces, payload)
+                    return payload
+        self._count("misses")
+        try:
+            tokens = self.generations(namespaces)
+            payload = builder()
+            extra = tuple(dependencies(payload)) if dependencies else ()
+            if extra:
+                tokens.update(self.generations(extra))
+            self.backend.set(
+                self._key(key),
+                {"deps": tokens, "data": payload},
+                timeout=settings.API_CACHE_TTL,
+            )
+            self._local_set(key, namespaces + extra, payload)
+        finally:
+            if owner:
+                self.backend.delete(lock_key)
+        return payload
+
+    def clear(self):
+        """
+        Drop the L1 of this process and the backing cache.
+        """
+        with self.lock:
+            self.local.clear()
+            self.local_bumps.clear()
+        self.backend.clear()
+
+    def get_stats(self):
+        """
+        Return the hit and miss counters of this process.
+        """
+        with self.lock:
+            stats = dict(self.stats)
+        lookups = stats["l1_hits"] + stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = (
+            round((stats["l1_hits"] + stats["hits"]) / lookups, 4) if lookups else None
+        )
+        return stats
+
+
+def cache_query_key(request):
+    """
+    Return a canonical form of the query string of a request for use in cache keys.
+    """
+    return urlencode(sorted(request.query_params.lists()), doseq=True)
+
+
+api_cache = ReadThroughCache()
@@ -0,0 +1,79 @@
+"""
+Module containing ETag helpers for conditional GET requests.
+
+An ETag is derived from cheap version information instead of the serialized payload: the
+`updated_at` of a single row for detail endpoints, or the generation tokens of the cache
+namespaces (see `utils.cache`) plus the canonical query string for list endpoints, which
+only get one while the shared read cache is enabled. Clients
+sending a matching `If-None-Match` get a 304 before anything is fetched or serialized.
+
+Functions:
+- make_etag: Build a strong ETag from version parts.
+- generation_etag: Build an ETag from cache namespace generations.
+- is_not_modified: Check an ETag against the If-None-Match header of a request.
+- not_modified_response: Return an empty 304 response carrying the ETag.
+"""
+
+import hashlib
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from utils.cache import api_cache
+
+
+def make_etag(*parts):
+    """
+    Build a strong ETag from version parts.
+
+    Parameters:
+    parts: Values identifying the version of a representation, e.g. timestamps or tokens.
+
+    Returns:
+    str: The quoted ETag.
+    """
+    digest = hashlib.blake2b(
+        "|".join(str(part) for part in parts).encode(), digest_size=16
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+def generation_etag(key, namespaces):
+    """
+    Build an ETag from the generation tokens of the namespaces a payload depends on.
+
+    Returns None while the read cache is disabled: generations are only bumped reliably
+    for every writer when the cache is shared (see `utils.cache`), and a stale token
+    would answer 304 for a changed list.
+    """
+    if not api_cache.enabled:
+        return None
+    tokens = api_cache.generations(namespaces)
+    return make_etag(key, *(tokens[namespace] for namespace in sorted(tokens)))
+
+
+def is_not_modified(request, etag):
+    """
+    Return True if the If-None-Match header of the request matches the ETag.
+    """
+    header = request.META.get("HTTP_IF_NONE_MATCH")
+    if not header:
+        return False
+    candidates = {candidate.strip() for candidate in header.split(",")}
+    if "*" in candidates:
+        return True
+    # If-None-Match uses the weak comparison (RFC 7232, section 3.2).
+    candidates = {
+        candidate[2:] if candidate.startswith("W/") else candidate
+        for candidate in candidates
+    }
+    return etag in candidates
+
+
+def not_modified_response(etag):
+    """
+    Return an empty 304 response carrying the ETag.
+    """
+    response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    response["ETag"] = etag
+    return response
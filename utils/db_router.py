@@ -0,0 +1,156 @@
+"""
+Module containing the read-replica database router.
+
+Reads go to the primary (`default`) unless code opts in with `read_from_replica()` or
+`read_database()`, which the list, export and admin changelist reads do. Writes always go to
+the primary, and any write pins the rest of the request to it. `ReplicaStickinessMiddleware`
+then keeps the client on the primary for REPLICA_STICKY_SECONDS through a cookie, so clients
+read their own writes even while replicas lag behind.
+
+Replicas are configured with DATABASE_REPLICAS (see settings.py); without any, every call
+here resolves to `default`.
+
+Classes:
+- ReplicaRouter: Django database router sending opted-in reads to a replica.
+- ReplicaStickinessMiddleware: Pins clients to the primary for a while after a write.
+
+Functions:
+- read_database: Return the alias the next replica-tolerant read should use.
+- read_from_replica: Context manager routing the enclosed reads to a replica.
+- pin_primary: Send every further read of this request/context to the primary.
+- is_pinned: Whether the reads of this request/context are pinned to the primary.
+"""
+
+import asyncio
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+PRIMARY = "default"
+
+_replica_reads = ContextVar("replica_reads", default=False)
+_pinned = ContextVar("pinned_to_primary", default=False)
+_wrote = ContextVar("wrote_to_primary", default=False)
+
+
+def pin_primary():
+    """
+    Send every further read of the current request (or context) to the primary.
+    """
+    _pinned.set(True)
+    _wrote.set(True)
+
+
+def is_pinned():
+    """
+    Return True if the reads of the current request (or context) must see the primary.
+    """
+    return _pinned.get()
+
+
+def read_database():
+    """
+    Return the alias a read that tolerates replication lag should use.
+    """
+    replicas = settings.REPLICA_ALIASES
+    if not replicas or _pinned.get():
+        return PRIMARY
+    return random.choice(replicas)
+
+
+@contextmanager
+def read_from_replica():
+    """
+    Route the reads of the enclosed block to a replica, unless pinned to the primary.
+    """
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Database router for one primary and any number of read replicas.
+
+    Methods:
+        db_for_read: Replica inside `read_from_replica()`, otherwise the primary.
+        db_for_write: Always the primary; pins the rest of the request to it.
+        allow_relation: Objects of all aliases share the same data.
+        allow_migrate: Only the primary is migrated; replicas follow by replication.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get():
+            return read_database()
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        pin_primary()
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Keeps a client on the primary for REPLICA_STICKY_SECONDS after it wrote something.
+
+    A request carrying the sticky cookie is pinned to the primary; a request that writes
+    (any `db_for_write` call) sets the cookie on its response. Under ASGI the request
+    stays async; the context variables set here are seen by the views run through
+    `sync_to_async`, and their writes are copied back when those return.
+    """
+
+    sync_capable = True
+    async_capable = True
+    cookie_name = "db_pin_primary"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Marks the instance as async for Django, like MiddlewareMixin does.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        tokens = self.start(request)
+        try:
+            return self.finish(self.get_response(request))
+        finally:
+            self.reset(tokens)
+
+    async def __acall__(self, request):
+        tokens = self.start(request)
+        try:
+            return self.finish(await self.get_response(request))
+        finally:
+            self.reset(tokens)
+
+    def start(self, request):
+        return _pinned.set(self.cookie_name in request.COOKIES), _wrote.set(False)
+
+    def finish(self, response):
+        if _wrote.get() and settings.REPLICA_ALIASES:
+            response.set_cookie(
+                self.cookie_name,
+                "1",
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    @staticmethod
+    def reset(tokens):
+        pinned_token, wrote_token = tokens
+        _wrote.reset(wrote_token)
+        _pinned.reset(pinned_token)
@@ -0,0 +1,217 @@
+"""
+Module containing Django email backends that deliver through HTTP transactional APIs.
+
+The backends keep one pooled, keep-alive HTTP session per worker process (and thread),
+so consecutive sends reuse the same TCP/TLS connection instead of paying a handshake
+for every email.
+
+Classes:
+- SendGridEmailBackend: Delivers messages through the SendGrid v3 `mail/send` API,
+  packing many recipients into a single call using personalizations.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import requests
+from django.conf import settings
+from django.core.mail.backends.base import BaseEmailBackend
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+_local = threading.local()
+
+
+def get_http_session(pool_size=10, retries=3):
+    """
+    Return the pooled HTTP session of the current worker process and thread.
+
+    The session is created lazily and re-created after a fork, so Celery prefork
+    children never share a socket with their parent. Callers asking for a different
+    pool size or retry policy get their own session.
+
+    Only calls the server cannot have acted on are retried: connection failures and
+    429 answers. A POST that timed out or got a 5xx may already have been delivered,
+    so it is never re-sent here; the caller decides whether to retry the batch.
+
+    Parameters:
+    pool_size (int): Number of keep-alive connections kept per host.
+    retries (int): Number of retries with backoff for refused or throttled calls.
+
+    Returns:
+    requests.Session: The session bound to the current process and thread.
+    """
+    if getattr(_local, "pid", None) != os.getpid():
+        _local.sessions = {}
+        _local.pid = os.getpid()
+    session = _local.sessions.get((pool_size, retries))
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=Retry(
+                total=retries,
+                connect=retries,
+                read=0,
+                other=0,
+                status=retries,
+                backoff_factor=0.5,
+                status_forcelist=(429,),
+                allowed_methods=frozenset(["POST"]),
+                raise_on_status=False,
+            ),
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _local.sessions[(pool_size, retries)] = session
+    return session
+
+
+class SendGridEmailBackend(BaseEmailBackend):
+    """
+    Email backend for the SendGrid v3 transactional API.
+
+    Messages that share sender, subject and content are grouped and sent as one API
+    call, with one personalization (recipients plus substitutions) per message.
+    Per-recipient substitutions are read from an optional ``substitutions`` dict set
+    on the EmailMessage.
+
+    After `send_messages` every message carries:
+    send_status (bool): True if the API accepted the message.
+    send_response (str): The API message id on success, the error otherwise.
+
+    Settings:
+    SENDGRID_API_KEY (str): API key used for authentication.
+    SENDGRID_API_URL (str): Endpoint URL, overridable to point at a local mock server.
+    EMAIL_BATCH_SIZE (int): Maximum number of personalizations per API call.
+    """
+
+    reports_message_status = True
+
+    def __init__(
+        self, api_key=None, api_url=None, batch_size=None, timeout=None, **kwargs
+    ):
+        super().__init__(**kwargs)
+        self.api_key = api_key or settings.SENDGRID_API_KEY
+        self.api_url = api_url or settings.SENDGRID_API_URL
+        self.batch_size = min(int(batch_size or settings.EMAIL_BATCH_SIZE), 1000)
+        self.timeout = timeout or settings.EMAIL_TIMEOUT or 10
+        self.session = None
+
+    def open(self):
+        """
+        Bind the pooled session of this worker. Returns True if a new binding was made.
+        """
+        if self.session is not None:
+            return False
+        self.session = get_http_session()
+        return True
+
+    def close(self):
+        """
+        Release the binding; the pooled connections stay open for the next send.
+        """
+        self.session = None
+
+    def send_messages(self, email_messages):
+        """
+        Send the given messages in as few API calls as possible.
+
+        Returns:
+        int: The number of messages accepted by the API.
+        """
+        if not email_messages:
+            return 0
+        new_session = self.open()
+        sent = 0
+        try:
+            for group in self._group_messages(email_messages).values():
+                for start in range(0, len(group), self.batch_size):
+                    sent += self._send_batch(group[start : start + self.batch_size])
+        finally:
+            if new_session:
+                self.close()
+        return sent
+
+    def _group_messages(self, email_messages):
+        groups = OrderedDict()
+        for message in email_messages:
+            if not message.recipients():
+                message.send_status = False
+                message.send_response = "No recipients"
+                continue
+            html = next(
+                (
+                    content
+                    for content, mimetype in getattr(message, "alternatives", [])
+                    if mimetype == "text/html"
+                ),
+                None,
+            )
+            key = (
+                message.from_email,
+                message.subject,
+                message.body,
+                html,
+                tuple(message.reply_to),
+            )
+            groups.setdefault(key, []).append(message)
+        return groups
+
+    def _build_payload(self, batch):
+        first = batch[0]
+        content = [{"type": "text/plain", "value": first.body}]
+        for value, mimetype in getattr(first, "alternatives", []):
+            if mimetype == "text/html":
+                content.append({"type": "text/html", "value": value})
+        personalizations = []
+        for message in batch:
+            personalization = {"to": [{"email": address} for address in message.to]}
+            if message.cc:
+                personalization["cc"] = [{"email": address} for address in message.cc]
+            if message.bcc:
+                personalization["bcc"] = [{"email": address} for address in message.bcc]
+            substitutions = getattr(message, "substitutions", None)
+            if substitutions:
+                personalization["substitutions"] = {
+                    key: str(value) for key, value in substitutions.items()
+                }
+            personalizations.append(personalization)
+        payload = {
+            "personalizations": personalizations,
+            "from": {"email": first.from_email},
+            "subject": first.subject,
+            "content": content,
+        }
+        if first.reply_to:
+            payload["reply_to"] = {"email": first.reply_to[0]}
+        return payload
+
+    def _send_batch(self, batch):
+        try:
+            response = self.session.post(
+                self.api_url,
+                json=self._build_payload(batch),
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            self._mark(batch, False, str(e))
+            if not self.fail_silently:
+                raise
+            return 0
+        if response.status_code in (200, 202):
+            self._mark(batch, True, response.headers.get("X-Message-Id", ""))
+            return len(batch)
+        self._mark(batch, False, f"{response.status_code}: {response.text[:200]}")
+        if not self.fail_silently:
+            response.raise_for_status()
+        return 0
+
+    @staticmethod
+    def _mark(batch, status, response):
+        for message in batch:
+            message.send_status = status
+            message.send_response = response
@@ -6,3 +6,13 @@ Module containing custom exceptions related to company setup, Object does not ex
 from django.utils.translation import gettext_lazy as _
 
 from utils.exceptions import base_exceptions
+
+
+class InvalidCursorException(base_exceptions.APIBaseException):
+    def __init__(self, item="cursor", message=_("Invalid pagination cursor.")):
+        super().__init__(item, message)
+
+
+class InvalidFilterException(base_exceptions.APIBaseException):
+    def __init__(self, item, message):
+        super().__init__(item, message)
@@ -0,0 +1,179 @@
+"""
+Module containing a small asyncio HTTP load generator for the benchmark commands.
+
+It opens `concurrency` keep-alive HTTP/1.1 connections and has each of them send requests
+back to back until the duration is over. Slow clients can be simulated by pausing before
+reading every response, which keeps the server side of the request open the way a slow
+mobile client does. Only the standard library is used so it runs wherever the project does.
+
+Classes:
+- LoadResult: Latencies, status codes and errors of one run.
+
+Functions:
+- run_load: Run a load test against one URL and return its LoadResult.
+"""
+
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+class LoadResult:
+    """
+    Outcome of one load run.
+
+    Attributes:
+        latencies (list): Seconds per successful request.
+        statuses (dict): Count of responses per HTTP status.
+        errors (int): Connection errors and timeouts.
+        elapsed (float): Wall clock duration of the run in seconds.
+
+    Methods:
+        summary: Return throughput and latency percentiles as a dict.
+    """
+
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+        self.elapsed = 0.0
+
+    @staticmethod
+    def percentile(values, fraction):
+        if not values:
+            return None
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+    def summary(self):
+        requests = sum(self.statuses.values())
+        to_ms = lambda value: round(value * 1000, 2) if value is not None else None
+        return {
+            "requests": requests,
+            "errors": self.errors,
+            "statuses": {
+                str(code): count for code, count in sorted(self.statuses.items())
+            },
+            "rps": round(requests / self.elapsed, 1) if self.elapsed else 0.0,
+            "p50_ms": to_ms(self.percentile(self.latencies, 0.50)),
+            "p95_ms": to_ms(self.percentile(self.latencies, 0.95)),
+            "p99_ms": to_ms(self.percentile(self.latencies, 0.99)),
+            "mean_ms": to_ms(
+                statistics.mean(self.latencies) if self.latencies else None
+            ),
+        }
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed")
+    status_code = int(status_line.split()[1])
+    length, chunked, close = 0, False, False
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "transfer-encoding" and "chunked" in value:
+            chunked = True
+        elif name == "connection" and value == "close":
+            close = True
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length:
+        await reader.readexactly(length)
+    return status_code, close
+
+
+async def client(url, method, body, headers, deadline, slow_delay, timeout, result):
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    path = parts.path or "/"
+    if parts.query:
+        path = f"{path}?{parts.query}"
+    head = [f"{method} {path} HTTP/1.1", f"Host: {parts.netloc}"]
+    head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    head.append(f"Content-Length: {len(body)}")
+    request = ("\r\n".join(head) + "\r\n\r\n").encode() + body
+    writer = None
+    while time.monotonic() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(
+                        parts.hostname, port, ssl=parts.scheme == "https" or None
+                    ),
+                    timeout,
+                )
+            started = time.monotonic()
+            writer.write(request)
+            await writer.drain()
+            if slow_delay:
+                await asyncio.sleep(slow_delay)
+            status_code, close = await asyncio.wait_for(read_response(reader), timeout)
+            result.latencies.append(time.monotonic() - started)
+            result.statuses[status_code] = result.statuses.get(status_code, 0) + 1
+            if close:
+                writer.close()
+                writer = None
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            result.errors += 1
+            if writer is not None:
+                writer.close()
+                writer = None
+    if writer is not None:
+        writer.close()
+
+
+def run_load(
+    url,
+    concurrency=10,
+    duration=10.0,
+    method="GET",
+    body=b"",
+    headers=None,
+    slow_delay=0.0,
+    timeout=30.0,
+):
+    """
+    Run a load test against one URL.
+
+    Parameters:
+    url (str): Target URL, http or https.
+    concurrency (int): Number of concurrent keep-alive connections.
+    duration (float): Seconds to keep sending requests.
+    method (str): HTTP method.
+    body (bytes): Request body sent with every request.
+    headers (dict, optional): Extra request headers.
+    slow_delay (float): Seconds each client waits before reading a response.
+    timeout (float): Seconds before a connect or response counts as an error.
+
+    Returns:
+    LoadResult: The collected latencies, statuses and errors.
+    """
+
+    async def main():
+        result = LoadResult()
+        deadline = time.monotonic() + duration
+        started = time.monotonic()
+        await asyncio.gather(
+            *(
+                client(
+                    url, method, body, headers, deadline, slow_delay, timeout, result
+                )
+                for _ in range(concurrency)
+            )
+        )
+        result.elapsed = time.monotonic() - started
+        return result
+
+    return asyncio.run(main())
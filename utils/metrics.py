@@ -0,0 +1,418 @@
+"""
+Module containing a small in-process metrics registry with Prometheus text exposition.
+
+Metrics are plain counters and fixed-bucket histograms held in process memory; recording one
+is a dict lookup and an addition under a lock, cheap enough to stay on in production.
+
+Celery prefork children and web workers are separate processes. When METRICS_DIR is set,
+every process writes a snapshot of its own metrics to
+`<METRICS_DIR>/<host>-<pid>-<start>.json` at most every METRICS_FLUSH_SECONDS (checked
+while recording) and at exit, with an atomic rename; `<start>` is the start time of the
+process, so a reused pid never overwrites the totals of the exited process. The `/metrics`
+endpoint sums the snapshots of all processes with its own live values, so the exposed
+counters cover the whole host. Snapshots of exited processes of this host are folded into
+`exited.json` and removed while collecting, so totals do not drop when a worker is
+recycled and the directory does not grow. A forked child starts with empty metrics.
+
+Classes:
+- Counter: Monotonic counter with optional labels.
+- Histogram: Fixed-bucket histogram with optional labels.
+- Registry: Holds the metrics, dumps and merges snapshots, renders the text format.
+- MetricsMiddleware: Records the latency and status of every HTTP request.
+
+Functions:
+- timed: Context manager observing the elapsed seconds into a histogram.
+"""
+
+import asyncio
+import atexit
+import fcntl
+import glob
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+EXITED_SNAPSHOT = "exited.json"
+
+
+class Counter:
+    """
+    Monotonic counter; `labelnames` values are passed positionally to `inc`.
+    """
+
+    kind = "counter"
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def inc(self, *labels, amount=1):
+        with self.registry.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+        self.registry.maybe_dump()
+
+    def snapshot(self, values=None):
+        values = self.values if values is None else values
+        return [[list(labels), value] for labels, value in values.items()]
+
+    def merge(self, values, snapshot):
+        for labels, value in snapshot:
+            labels = tuple(labels)
+            values[labels] = values.get(labels, 0) + value
+
+    def samples(self, values):
+        for labels, value in sorted(values.items()):
+            yield self.name, self.label_pairs(labels), value
+
+    def label_pairs(self, labels, extra=()):
+        return tuple(zip(self.labelnames, labels)) + tuple(extra)
+
+
+class Histogram(Counter):
+    """
+    Histogram with fixed upper bounds; values above the last bound only count to +Inf.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self, registry, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS
+    ):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self.registry.lock:
+            state = self.values.get(labels)
+            if state is None:
+                state = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+        self.registry.maybe_dump()
+
+    def snapshot(self, values=None):
+        values = self.values if values is None else values
+        return [
+            [list(labels), [list(counts), total]]
+            for labels, (counts, total) in values.items()
+        ]
+
+    def merge(self, values, snapshot):
+        for labels, (counts, total) in snapshot:
+            labels = tuple(labels)
+            state = values.setdefault(labels, [[0] * (len(self.buckets) + 1), 0.0])
+            state[0] = [mine + theirs for mine, theirs in zip(state[0], counts)]
+            state[1] += total
+
+    def samples(self, values):
+        bounds = [*map(str, self.buckets), "+Inf"]
+        for labels, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket",
+                    self.label_pairs(labels, [("le", bound)]),
+                    cumulative,
+                )
+            yield f"{self.name}_sum", self.label_pairs(labels), total
+            yield f"{self.name}_count", self.label_pairs(labels), cumulative
+
+
+class Registry:
+    """
+    Registry of the metrics of this process.
+
+    Methods:
+        counter / histogram: Declare a metric.
+        maybe_dump: Write this process' snapshot if METRICS_FLUSH_SECONDS have passed.
+        dump: Write this process' snapshot to METRICS_DIR.
+        collect: Sum the snapshots of all processes with the live values, folding the
+            snapshots of exited processes.
+        render: The collected metrics in the Prometheus text format.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self._next_dump = 0.0
+        self.process = process_identity(os.getpid())
+        atexit.register(self.dump)
+        # A forked child starts empty: what it inherited is counted by its parent.
+        os.register_at_fork(after_in_child=self.reset)
+
+    def reset(self):
+        self.lock = threading.Lock()
+        self._next_dump = 0.0
+        self.process = process_identity(os.getpid())
+        for metric in self.metrics.values():
+            metric.values = {}
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(self, name, documentation, labelnames, buckets))
+
+    def _add(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    @staticmethod
+    def directory():
+        return getattr(settings, "METRICS_DIR", "")
+
+    def maybe_dump(self):
+        now = time.monotonic()
+        if now < self._next_dump:
+            return
+        self._next_dump = now + int(settings.METRICS_FLUSH_SECONDS)
+        self.dump()
+
+    def snapshot(self):
+        with self.lock:
+            return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    def dump(self):
+        directory = self.directory()
+        if not directory:
+            return
+        path = os.path.join(directory, f"{self.process}.json")
+        try:
+            os.makedirs(directory, exist_ok=True)
+            write_snapshot(path, self.snapshot())
+        except OSError:
+            logger.exception("Could not write the metrics snapshot %s.", path)
+
+    def collect(self):
+        """
+        Sum the snapshots of all processes with the live values of this one.
+
+        Returns:
+            dict: Metric name to merged values.
+        """
+        snapshots = [self.snapshot()]
+        directory = self.directory()
+        if directory:
+            own = os.path.join(directory, f"{self.process}.json")
+            self.fold_exited(directory)
+            for path in glob.glob(os.path.join(directory, "*.json")):
+                if path == own:
+                    continue
+                snapshot = read_snapshot(path)
+                if snapshot is not None:
+                    snapshots.append(snapshot)
+        return self.merge(snapshots)
+
+    def merge(self, snapshots):
+        merged = {name: {} for name in self.metrics}
+        for snapshot in snapshots:
+            for name, values in snapshot.items():
+                if name in self.metrics:
+                    self.metrics[name].merge(merged[name], values)
+        return merged
+
+    def fold_exited(self, directory):
+        """
+        Add the snapshots of exited processes of this host to `exited.json` and remove
+        them. Runs under an exclusive lock, so concurrent scrapes fold each file once.
+
+        Parameters:
+            directory (str): The METRICS_DIR.
+        """
+        host = socket.gethostname()
+        exited = []
+        for path in glob.glob(os.path.join(directory, "*.json")):
+            identity = parse_identity(path)
+            if identity and identity[0] == host and not process_alive(*identity[1:]):
+                exited.append(path)
+        if not exited:
+            return
+        try:
+            with open(os.path.join(directory, "exited.lock"), "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                # Another scrape may have folded some of them while we waited.
+                folded = [
+                    (path, snapshot)
+                    for path, snapshot in zip(exited, map(read_snapshot, exited))
+                    if snapshot is not None
+                ]
+                if not folded:
+                    return
+                target = os.path.join(directory, EXITED_SNAPSHOT)
+                merged = self.merge(
+                    [read_snapshot(target) or {}] + [snapshot for _, snapshot in folded]
+                )
+                write_snapshot(
+                    target,
+                    {
+                        name: self.metrics[name].snapshot(values)
+                        for name, values in merged.items()
+                    },
+                )
+                for path, _ in folded:
+                    os.remove(path)
+        except OSError:
+            logger.exception("Could not fold the metrics snapshots of %s.", directory)
+
+    def render(self, extra=()):
+        """
+        The collected metrics in the Prometheus text exposition format.
+
+        Parameters:
+            extra (iterable): (name, documentation, value) gauges computed at scrape time.
+
+        Returns:
+            str: The exposition text.
+        """
+        lines = []
+        for name, values in self.collect().items():
+            metric = self.metrics[name]
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for sample, labels, value in metric.samples(values):
+                lines.append(f"{sample}{format_labels(labels)} {value}")
+        for name, documentation, value in extra:
+            if value is None:
+                continue
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def process_start(pid):
+    """
+    Start time of a process in clock ticks since boot, None if it is not running or
+    /proc is not available.
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            data = stat.read()
+    except OSError:
+        return None
+    # The command name in parentheses may contain spaces; starttime is field 22.
+    return data[data.rindex(")") + 2 :].split()[19]
+
+
+def process_identity(pid):
+    start = process_start(pid) or str(time.time_ns())
+    return f"{socket.gethostname()}-{pid}-{start}"
+
+
+def parse_identity(path):
+    """
+    The (host, pid, start) of a snapshot file name, None for other files.
+    """
+    parts = os.path.basename(path)[: -len(".json")].rsplit("-", 2)
+    if len(parts) != 3 or not parts[1].isdigit():
+        return None
+    return parts[0], int(parts[1]), parts[2]
+
+
+def process_alive(pid, start):
+    current = process_start(pid)
+    if current is not None:
+        return current == start
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def read_snapshot(path):
+    try:
+        with open(path) as snapshot:
+            return json.load(snapshot)
+    except (OSError, ValueError):
+        return None
+
+
+def write_snapshot(path, snapshot):
+    with open(f"{path}.tmp", "w") as output:
+        json.dump(snapshot, output)
+    os.replace(f"{path}.tmp", path)
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    pairs = (f'{name}="{escape_label(value)}"' for name, value in labels)
+    return "{" + ",".join(pairs) + "}"
+
+
+@contextmanager
+def timed(histogram, *labels):
+    """
+    Observe the seconds spent in the block into `histogram`.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - started, *labels)
+
+
+registry = Registry()
+
+http_request_seconds = registry.histogram(
+    "http_request_seconds", "Latency of HTTP requests.", ("view", "method", "status")
+)
+
+
+class MetricsMiddleware:
+    """
+    Records the latency of every request by URL name, method and status code.
+
+    Under ASGI the request stays async, so the timing covers the awaited view.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Marks the instance as async for Django, like MiddlewareMixin does.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        return self.record(request, self.get_response(request), started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        return self.record(request, await self.get_response(request), started)
+
+    def record(self, request, response, started):
+        match = getattr(request, "resolver_match", None)
+        http_request_seconds.observe(
+            time.perf_counter() - started,
+            match.view_name if match else "unmatched",
+            request.method,
+            str(response.status_code),
+        )
+        return response
@@ -0,0 +1,128 @@
+"""
+Module containing keyset (cursor) pagination for list endpoints.
+
+Instead of OFFSET, every page continues strictly after the ordering key of the last row of the
+previous page. Backed by an index on the ordering fields, each page is one index range scan
+whose cost does not depend on how deep into the table it is.
+
+Classes:
+- KeysetPaginator: Paginates a queryset over a unique ordering with opaque cursors.
+"""
+
+import base64
+import json
+from datetime import date, datetime, time
+
+from django.conf import settings
+from django.db.models import Q
+
+from utils.exceptions.exception import InvalidCursorException
+
+
+class KeysetPaginator:
+    """
+    Keyset paginator over a unique ordering.
+
+    Cursors are the URL-safe base64 encoding of the ordering values of the last row of a
+    page; clients pass them back untouched in the `cursor` query parameter. The page size
+    is read from the `page_size` query parameter, bounded by API_MAX_PAGE_SIZE.
+
+    Attributes:
+        ordering (tuple): Field names, optionally prefixed with "-"; the last one must be unique.
+
+    Methods:
+        page_queryset: Return the queryset of one page.
+        paginate: Return one page of rows and the cursor of the next page.
+    """
+
+    def __init__(self, ordering=("id",)):
+        self.ordering = tuple(ordering)
+        self.fields = tuple(field.lstrip("-") for field in self.ordering)
+
+    def get_page_size(self, request):
+        default = int(settings.API_PAGE_SIZE)
+        try:
+            page_size = int(request.query_params.get("page_size", default))
+        except (TypeError, ValueError):
+            page_size = default
+        return min(max(page_size, 1), int(settings.API_MAX_PAGE_SIZE))
+
+    @staticmethod
+    def encode_cursor(values):
+        raw = json.dumps(
+            [
+                (
+                    value.isoformat()
+                    if isinstance(value, (date, datetime, time))
+                    else value
+                )
+                for value in values
+            ],
+            separators=(",", ":"),
+        )
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (TypeError, ValueError):
+            raise InvalidCursorException()
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise InvalidCursorException()
+        return values
+
+    def after(self, values):
+        """
+        Build the filter selecting rows strictly after the given ordering values.
+        """
+        condition = Q()
+        for index in reversed(range(len(self.ordering))):
+            field = self.fields[index]
+            lookup = "lt" if self.ordering[index].startswith("-") else "gt"
+            step = Q(**{f"{field}__{lookup}": values[index]})
+            if index < len(self.ordering) - 1:
+                step |= Q(**{field: values[index]}) & condition
+            condition = step
+        return condition
+
+    def page_queryset(self, queryset, request):
+        """
+        Return the ordered, sliced queryset of the requested page plus one look-ahead row.
+        """
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params.get("cursor")
+        if cursor:
+            queryset = queryset.filter(self.after(self.decode_cursor(cursor)))
+        return queryset[: self.get_page_size(request) + 1]
+
+    def paginate(self, queryset, request):
+        """
+        Return one page of the queryset and the cursor of the next page.
+
+        Parameters:
+            queryset (QuerySet): The filtered rows to paginate.
+            request (Request): The request holding the `cursor` and `page_size` parameters.
+
+        Returns:
+            tuple: The list of rows of the page and the next cursor (None on the last page).
+        """
+        page_size = self.get_page_size(request)
+        rows = list(self.page_queryset(queryset, request))
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            next_cursor = self.encode_cursor(
+                [self._value(last, field) for field in self.fields]
+            )
+        return rows, next_cursor
+
+    @staticmethod
+    def _value(row, field):
+        if isinstance(row, dict):
+            return row[field]
+        value = row
+        for part in field.split("__"):
+            value = getattr(value, part)
+        return value
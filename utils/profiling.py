@@ -0,0 +1,233 @@
+"""
+Module containing an opt-in sampling profiler for celery tasks and API requests.
+
+A configurable fraction of the tasks and requests is profiled by sampling the stack of the
+thread running it every PROFILING_INTERVAL_MS milliseconds. Samples are aggregated per
+process into collapsed stacks (`root;caller;callee count`, the input format of
+flamegraph.pl, speedscope and similar tools) whose root frame names the task or view, and
+written to `<PROFILING_DIR>/<pid>.collapsed` every PROFILING_WRITE_SECONDS and at exit. The
+files of all processes can simply be concatenated into one flamegraph.
+
+The sample rate is PROFILING_SAMPLE_RATE, overridden at runtime by the `profiling:rate`
+cache key (Redis when CACHE_BACKEND points at it), e.g. through
+`python manage.py profiling --rate 0.05`. The key is re-read every PROFILING_FLAG_SECONDS;
+in between, an unsampled task or request only costs a clock read and a comparison.
+
+Classes:
+- StackSampler: Samples the stack of one thread until stopped.
+- Profiler: Decides what to sample and aggregates and writes the stacks.
+- ProfilingMiddleware: Profiles a sample of the HTTP requests.
+
+Functions:
+- start_task_profile / stop_task_profile: Celery signal handlers profiling a sample of tasks.
+"""
+
+import asyncio
+import atexit
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from celery.signals import task_postrun, task_prerun
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+RATE_CACHE_KEY = "profiling:rate"
+MAX_DEPTH = 128
+
+
+def frame_name(code):
+    filename = os.path.basename(code.co_filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Samples the stack of one thread from a daemon thread until stopped.
+
+    Attributes:
+        label (str): Root frame of the stacks, e.g. "task user.tasks.relay_outbox".
+        stacks (Counter): Collapsed stack (below the root frame) to number of samples.
+    """
+
+    def __init__(self, label, thread_id, interval):
+        self.label = label
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None and len(names) < MAX_DEPTH:
+                names.append(frame_name(frame.f_code))
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+
+class Profiler:
+    """
+    Per-process sampling decisions and aggregated stacks.
+
+    Methods:
+        rate: The current sample rate, refreshed from the cache flag periodically.
+        start: Start sampling the current thread, if this unit is sampled.
+        stop: Stop a sampler and add its stacks to the aggregate.
+        write: Write the aggregated stacks of this process to PROFILING_DIR.
+    """
+
+    def __init__(self):
+        self.stacks = Counter()
+        self._rate = 0.0
+        self._rate_expires = 0.0
+        self._next_write = 0.0
+        self._lock = threading.Lock()
+        atexit.register(self.write)
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self.stacks = Counter()
+        self._lock = threading.Lock()
+        self._rate_expires = 0.0
+
+    def rate(self):
+        now = time.monotonic()
+        if now >= self._rate_expires:
+            self._rate_expires = now + float(settings.PROFILING_FLAG_SECONDS)
+            try:
+                flag = cache.get(RATE_CACHE_KEY)
+            except Exception:
+                flag = None
+            if flag is None:
+                flag = settings.PROFILING_SAMPLE_RATE
+            self._rate = float(flag)
+        return self._rate
+
+    def start(self, label):
+        """
+        Start sampling the current thread if this task or request is sampled.
+
+        Returns:
+            StackSampler: The running sampler, or None if not sampled.
+        """
+        rate = self.rate()
+        if not rate or random.random() >= rate:
+            return None
+        interval = int(settings.PROFILING_INTERVAL_MS) / 1000
+        return StackSampler(label, threading.get_ident(), interval).start()
+
+    def stop(self, sampler):
+        """
+        Stop the sampler and add its stacks to the aggregate of this process.
+        """
+        stacks = sampler.stop()
+        root = sampler.label.replace(";", ":").replace("\n", " ")
+        with self._lock:
+            for stack, count in stacks.items():
+                self.stacks[f"{root};{stack}"] += count
+        now = time.monotonic()
+        if now >= self._next_write:
+            self._next_write = now + int(settings.PROFILING_WRITE_SECONDS)
+            self.write()
+
+    def write(self):
+        """
+        Write the aggregated stacks of this process as `<PROFILING_DIR>/<pid>.collapsed`.
+        """
+        directory = settings.PROFILING_DIR
+        with self._lock:
+            lines = [f"{stack} {count}\n" for stack, count in self.stacks.items()]
+        if not lines or not directory:
+            return
+        path = os.path.join(directory, f"{os.getpid()}.collapsed")
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(f"{path}.tmp", "w") as output:
+                output.writelines(lines)
+            os.replace(f"{path}.tmp", path)
+        except OSError:
+            logger.exception("Could not write the profile %s.", path)
+
+
+profiler = Profiler()
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a sample of the HTTP requests, labelled by URL name.
+
+    Under ASGI the request stays async and the sampler follows the event loop thread, so
+    the time a view spends in `sync_to_async` threads shows up as the await it is in.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Marks the instance as async for Django, like MiddlewareMixin does.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        sampler = profiler.start(f"request {request.method}")
+        if sampler is None:
+            return self.get_response(request)
+        try:
+            return self.get_response(request)
+        finally:
+            self.stop(request, sampler)
+
+    async def __acall__(self, request):
+        sampler = profiler.start(f"request {request.method}")
+        if sampler is None:
+            return await self.get_response(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            self.stop(request, sampler)
+
+    @staticmethod
+    def stop(request, sampler):
+        match = getattr(request, "resolver_match", None)
+        if match:
+            sampler.label = f"view {match.view_name}"
+        profiler.stop(sampler)
+
+
+_task_samplers = {}
+
+
+@task_prerun.connect
+def start_task_profile(task_id=None, task=None, **kwargs):
+    sampler = profiler.start(f"task {getattr(task, 'name', 'unknown')}")
+    if sampler is not None:
+        _task_samplers[task_id] = sampler
+
+
+@task_postrun.connect
+def stop_task_profile(task_id=None, **kwargs):
+    sampler = _task_samplers.pop(task_id, None)
+    if sampler is not None:
+        profiler.stop(sampler)
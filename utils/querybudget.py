@@ -0,0 +1,211 @@
+"""
+Module containing per-request and per-task SQL query budgets.
+
+While QUERY_BUDGET_ENABLED is set (by default in DEBUG and under `manage.py test`), every
+database connection gets an execute wrapper that counts the queries and their duration for
+the request or celery task being handled. The wrapper finds the current counter through a
+context variable, so queries run in `sync_to_async` worker threads are counted for the
+request that awaited them.
+
+A request or task running more queries than its budget is logged as a warning. The budget
+is looked up in QUERY_BUDGETS by method and URL name (e.g. "DELETE user:user-detail"),
+then by URL name (e.g. "user:schedule-create") or by "task <name>", falling back to
+QUERY_BUDGET_DEFAULT. Responses carry the figures in the
+`X-Query-Count` and `X-Query-Time-Ms` headers. Queries made while a streaming response
+is consumed happen after the headers were sent and are not included. The queries of
+celery tasks are also added to the `celery_task_queries_total` metric, which is how the
+send benchmark reads them from its worker processes.
+
+Classes:
+- QueryCount: Number and total duration of the queries of one unit of work.
+- QueryBudgetMiddleware: Counts the queries of every request and adds the headers.
+
+Functions:
+- count_queries: Context manager counting the queries run within it.
+- budget_for: The query budget of a URL name or task label.
+- check_budget: Log a unit of work that went over its budget.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from celery.signals import task_postrun, task_prerun
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar("query_count", default=None)
+
+task_queries_total = registry.counter(
+    "celery_task_queries_total",
+    "SQL queries run by celery tasks while query budgets are enabled.",
+    ("task",),
+)
+
+
+class QueryCount:
+    """
+    Number and total duration of the queries of one request or task.
+
+    Attributes:
+        count (int): The number of queries.
+        seconds (float): Their total duration.
+        parent (QueryCount): The enclosing counter, which counts the same queries.
+    """
+
+    def __init__(self, parent=None):
+        self.count = 0
+        self.seconds = 0.0
+        self.parent = parent
+
+    @property
+    def milliseconds(self):
+        return self.seconds * 1000
+
+
+def record_query(execute, sql, params, many, context):
+    counter = _current.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        while counter is not None:
+            counter.count += 1
+            counter.seconds += elapsed
+            counter = counter.parent
+
+
+def install_wrapper(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def install_wrapper_if_enabled(connection, **kwargs):
+    if settings.QUERY_BUDGET_ENABLED:
+        install_wrapper(connection)
+
+
+connection_created.connect(install_wrapper_if_enabled)
+
+
+@contextmanager
+def count_queries():
+    """
+    Count the queries run within the block, on any database alias.
+
+    Returns:
+        QueryCount: The counter, complete once the block has exited.
+    """
+    for connection in connections.all():
+        install_wrapper(connection)
+    counter = QueryCount(parent=_current.get())
+    token = _current.set(counter)
+    try:
+        yield counter
+    finally:
+        _current.reset(token)
+
+
+def budget_for(label, method=None):
+    """
+    Return the query budget of a URL name or "task <name>" label; an entry for
+    "<method> <label>" takes precedence.
+    """
+    budgets = settings.QUERY_BUDGETS
+    if method and f"{method} {label}" in budgets:
+        return budgets[f"{method} {label}"]
+    return budgets.get(label, settings.QUERY_BUDGET_DEFAULT)
+
+
+def check_budget(label, counter, method=None):
+    """
+    Log a warning if the request or task `label` ran more queries than its budget.
+
+    Returns:
+        bool: True if the budget was kept.
+    """
+    budget = budget_for(label, method)
+    if counter.count <= budget:
+        return True
+    logger.warning(
+        "%s ran %d queries in %.1f ms, over its budget of %d.",
+        f"{method} {label}" if method else label,
+        counter.count,
+        counter.milliseconds,
+        budget,
+    )
+    return False
+
+
+class QueryBudgetMiddleware:
+    """
+    Counts the queries of every request, reports them in headers and logs offenders.
+
+    Under ASGI the request stays async; the counter is found through the context
+    variable in the `sync_to_async` threads the view runs its queries in.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Marks the instance as async for Django, like MiddlewareMixin does.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not settings.QUERY_BUDGET_ENABLED:
+            return self.get_response(request)
+        with count_queries() as counter:
+            response = self.get_response(request)
+        return self.report(request, response, counter)
+
+    async def __acall__(self, request):
+        if not settings.QUERY_BUDGET_ENABLED:
+            return await self.get_response(request)
+        with count_queries() as counter:
+            response = await self.get_response(request)
+        return self.report(request, response, counter)
+
+    @staticmethod
+    def report(request, response, counter):
+        match = getattr(request, "resolver_match", None)
+        if match:
+            check_budget(match.view_name, counter, request.method)
+        response["X-Query-Count"] = str(counter.count)
+        response["X-Query-Time-Ms"] = f"{counter.milliseconds:.1f}"
+        return response
+
+
+_task_counters = {}
+
+
+@task_prerun.connect
+def start_task_count(task_id=None, task=None, **kwargs):
+    if settings.QUERY_BUDGET_ENABLED:
+        context = count_queries()
+        _task_counters[task_id] = (task, context, context.__enter__())
+
+
+@task_postrun.connect
+def stop_task_count(task_id=None, **kwargs):
+    entry = _task_counters.pop(task_id, None)
+    if entry is not None:
+        task, context, counter = entry
+        context.__exit__(None, None, None)
+        name = getattr(task, "name", "unknown")
+        task_queries_total.inc(name, amount=counter.count)
+        check_budget(f"task {name}", counter)
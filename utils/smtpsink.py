@@ -0,0 +1,136 @@
+"""
+Module containing a local SMTP sink for the send benchmarks.
+
+The sink speaks enough ESMTP for `smtplib` and Django's SMTP backend (EHLO/HELO, MAIL,
+RCPT, DATA, RSET, NOOP, QUIT), accepts every connection on its own thread and throws the
+messages away. Latency and errors can be injected to model a slow or unreliable relay:
+every accepted message is delayed by `latency_ms`, a `reject_rate` fraction of the
+recipients is refused permanently (550, a hard bounce) and a `fail_rate` fraction of the
+messages fails transiently after DATA (451). Only the standard library is used.
+
+Classes:
+- SMTPSink: Threaded SMTP server counting what it received.
+"""
+
+import random
+import socketserver
+import threading
+import time
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        sink = self.server.sink
+        self.reply("220 smtpsink ESMTP ready")
+        recipients = 0
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("ascii", "replace").strip()
+            verb = command[:4].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250-smtpsink" if verb == "EHLO" else "250 smtpsink")
+                if verb == "EHLO":
+                    self.reply("250-8BITMIME")
+                    self.reply("250 SIZE 0")
+            elif verb == "MAIL":
+                recipients = 0
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                if sink.roll(sink.reject_rate):
+                    sink.count("rejected")
+                    self.reply("550 5.1.1 Mailbox unavailable")
+                else:
+                    recipients += 1
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                if not recipients:
+                    self.reply("554 No valid recipients")
+                    continue
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                if sink.latency:
+                    time.sleep(sink.latency)
+                if sink.roll(sink.fail_rate):
+                    sink.count("failed")
+                    self.reply("451 4.3.0 Temporary failure")
+                else:
+                    sink.count("accepted")
+                    self.reply("250 OK queued")
+            elif verb == "RSET":
+                recipients = 0
+                self.reply("250 OK")
+            elif verb == "NOOP":
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class SMTPSinkServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    """
+    Local SMTP server discarding messages, with optional latency and errors.
+
+    Attributes:
+        host (str): Address the sink listens on.
+        port (int): Port the sink listens on (an ephemeral one when created with 0).
+        counts (dict): Number of "accepted", "rejected" and "failed" messages/recipients.
+
+    Methods:
+        start / stop: Serve on a background thread / shut the server down.
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        latency_ms=0,
+        reject_rate=0.0,
+        fail_rate=0.0,
+        seed=None,
+    ):
+        self.latency = latency_ms / 1000
+        self.reject_rate = reject_rate
+        self.fail_rate = fail_rate
+        self.counts = {"accepted": 0, "rejected": 0, "failed": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = SMTPSinkServer((host, port), SMTPSinkHandler)
+        self._server.sink = self
+        self.host, self.port = self._server.server_address[:2]
+
+    def roll(self, rate):
+        if not rate:
+            return False
+        with self._lock:
+            return self._random.random() < rate
+
+    def count(self, outcome):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()